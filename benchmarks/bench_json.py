@@ -0,0 +1,64 @@
+'''Time to decode large `annotate` and `candidates` responses with the standard library and with orjson
+(`pip install spacy-dbpedia-spotlight[fast]`), and the cost of the debug message of the component: the decoding of a
+response by the component (`_save_response`) with `debug` off, where the message is skipped by the `self.debug` gate,
+and with `debug` on, where the response is formatted even though loguru does not show DEBUG messages.
+
+The payloads are generated by the stub server, or read from recorded responses passed on the command line
+(JSON files saved from DBpedia Spotlight, the process is detected from their content).
+
+Usage: `python benchmarks/bench_json.py [recorded.json ...]`
+'''
+import json
+import sys
+import time
+
+import spacy
+from loguru import logger
+
+from spacy_dbpedia_spotlight import util
+from stub_server import build_response
+
+TEXT = 'Google LLC is an American company. Joe Biden visited Texas and the White House with Boris Johnson. '
+REPEAT = 20
+
+
+def bench(label, fn, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'  {label:<32} {elapsed * 1000:10.2f} ms')
+
+
+def get_payloads(paths):
+    if paths:
+        for path in paths:
+            with open(path, 'rb') as f:
+                yield path, f.read()
+        return
+    text = TEXT * 2000
+    for process in ['annotate', 'candidates']:
+        yield process, json.dumps(build_response(process, {'text': text})).encode('utf-8')
+
+
+def main(*paths):
+    # DEBUG messages are not shown
+    logger.remove()
+    logger.add(sys.stdout, level='INFO')
+    nlp = spacy.blank('en')
+    # no cache and no stats: only the decoding and the debug message are timed
+    quiet = nlp.add_pipe('dbpedia_spotlight', name='quiet', config={'debug': False})
+    verbose = nlp.add_pipe('dbpedia_spotlight', name='verbose', config={'debug': True})
+    for name, payload in get_payloads(paths):
+        print(f'{name}: {len(payload) / 1e6:.1f} MB')
+        bench('json.loads', lambda: json.loads(payload))
+        if util.get_orjson() is not None:
+            bench('orjson.loads', lambda: util.get_orjson().loads(payload))
+        else:
+            print('  orjson not installed')
+        bench('component, debug off', lambda: quiet._save_response(name, payload))
+        bench('component, debug on (not shown)', lambda: verbose._save_response(name, payload))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,49 @@
+'''Requests per second against a local stub server: one connection per request (the previous behaviour, module-level
+`requests.post`) versus the pooled keep-alive sessions of `EntityLinker`.
+
+Usage: `python benchmarks/bench_session.py [n_docs]`
+'''
+import sys
+import time
+
+import requests
+import spacy
+
+from stub_server import StubSpotlightServer
+
+TEXT = 'Google LLC is an American multinational technology company.'
+
+
+def bench(label, fn, n_docs):
+    start = time.perf_counter()
+    fn(n_docs)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<32} {n_docs / elapsed:10.1f} req/s')
+
+
+def main(n_docs=2000):
+    with StubSpotlightServer() as server:
+        nlp = spacy.blank('en')
+        linker = nlp.add_pipe('dbpedia_spotlight', config={'dbpedia_rest_endpoint': server.url})
+        doc = nlp.make_doc(TEXT)
+
+        def unpooled(n):
+            for _ in range(n):
+                requests.post(f'{server.url}/annotate', headers={'accept': 'application/json'},
+                              data={'text': TEXT}).json()
+
+        def pooled(n):
+            for _ in range(n):
+                linker.get_remote_response(doc)
+
+        def pooled_pipe(n):
+            for _ in nlp.pipe([TEXT] * n):
+                pass
+
+        bench('requests.post (no pooling)', unpooled, n_docs)
+        bench('EntityLinker.__call__ (pooled)', pooled, n_docs)
+        bench('EntityLinker.pipe (pooled)', pooled_pipe, n_docs)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,75 @@
+'''Time to add the entities of a response to large documents: one `doc.char_span` per entity with a scan of all the
+tokens for the misaligned ones (the previous behaviour) versus the token index of `process_single_doc_after_call`;
+and keeping only the places by filtering the spans afterwards versus with `filter_types`, before the spans are created.
+
+Usage: `python benchmarks/bench_spans.py [n_sentences] [repeat]`
+'''
+import sys
+import time
+
+import spacy
+from spacy.tokens import Span
+
+SENTENCE = 'Google LLC and someone@bbc.co.uk met Barack Obama in Berlin. '
+SURFACE_FORMS = ['Google LLC', 'bbc', 'Barack Obama', 'Berlin']
+TYPES = {'Google LLC': 'DBpedia:Organisation,DBpedia:Company', 'bbc': 'DBpedia:Organisation,DBpedia:Broadcaster',
+         'Barack Obama': 'DBpedia:Agent,DBpedia:Person', 'Berlin': 'DBpedia:Location,DBpedia:Place'}
+
+
+def make_data(n_sentences):
+    resources = []
+    for i in range(n_sentences):
+        for sf in SURFACE_FORMS:
+            offset = i * len(SENTENCE) + SENTENCE.index(sf)
+            resources.append({'@URI': f'http://dbpedia.org/resource/{sf}', '@surfaceForm': sf, '@offset': str(offset),
+                              '@types': TYPES[sf]})
+    return {'@text': SENTENCE * n_sentences, 'Resources': resources}
+
+
+def char_span_per_entity(doc, data):
+    spans = []
+    for ent in data['Resources']:
+        start_ch = int(ent['@offset'])
+        end_ch = start_ch + len(ent['@surfaceForm'])
+        span = doc.char_span(start_ch, end_ch, 'DBPEDIA_ENT', ent['@URI'])
+        if not span:
+            tokens = [t for t in doc if t.idx + len(t) > start_ch and t.idx < end_ch]
+            span = Span(doc, tokens[0].i, tokens[-1].i + 1, 'DBPEDIA_ENT', ent['@URI'])
+        spans.append(span)
+    doc.ents = spans
+
+
+def filter_after(linker, doc, data):
+    # the spans of all the entities, then only the places are kept
+    linker.process_single_doc_after_call(doc, data)
+    places = [span for span in doc.spans[linker.span_group]
+              if 'DBpedia:Place' in span._.dbpedia_raw_result['@types'].split(',')]
+    doc.spans[linker.span_group] = places
+    doc.ents = places
+
+
+def bench(label, fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'{label:<36} {elapsed * 1000:10.1f} ms/doc')
+
+
+def main(n_sentences=2000, repeat=5):
+    nlp = spacy.blank('en')
+    linker = nlp.add_pipe('dbpedia_spotlight', config={'dbpedia_rest_endpoint': 'http://localhost:2222/rest'})
+    data = make_data(n_sentences)
+    print(f'{len(nlp.make_doc(data["@text"]))} tokens, {len(data["Resources"])} entities')
+    bench('doc.char_span per entity', lambda: char_span_per_entity(nlp.make_doc(data['@text']), data), repeat)
+    bench('process_single_doc_after_call', lambda: linker.process_single_doc_after_call(
+        nlp.make_doc(data['@text']), data), repeat)
+    bench('places: filter the spans after', lambda: filter_after(linker, nlp.make_doc(data['@text']), data), repeat)
+    filtered = spacy.blank('en').add_pipe('dbpedia_spotlight', config={
+        'dbpedia_rest_endpoint': 'http://localhost:2222/rest', 'filter_types': ['DBpedia:Place']})
+    bench('places: filter_types', lambda: filtered.process_single_doc_after_call(
+        nlp.make_doc(data['@text']), data), repeat)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
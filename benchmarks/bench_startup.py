@@ -0,0 +1,66 @@
+'''Startup time of the component, as in a serverless cold start: each measure runs in a new Python process.
+
+- `import`: `import spacy_dbpedia_spotlight`, after spaCy has been imported (its own import time is not counted)
+- `factory`: `nlp.add_pipe('dbpedia_spotlight')` on a blank pipeline
+and the modules loaded by the import on top of the ones loaded by spaCy.
+
+With `--max-import-ms` and `--max-factory-ms`, it exits with status 1 if the median time is above the target.
+
+Usage: `python benchmarks/bench_startup.py --runs 10 --max-import-ms 20 --max-factory-ms 20`
+'''
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+SCRIPT = '''
+import json, sys, time
+import spacy
+before = set(sys.modules)
+start = time.perf_counter()
+import spacy_dbpedia_spotlight
+import_time = time.perf_counter() - start
+modules = sorted(name for name in set(sys.modules) - before if '.' not in name)
+nlp = spacy.blank('en')
+start = time.perf_counter()
+nlp.add_pipe('dbpedia_spotlight')
+factory_time = time.perf_counter() - start
+print(json.dumps({'import': import_time, 'factory': factory_time, 'modules': modules}))
+'''
+
+
+def measure_once() -> dict:
+    output = subprocess.run([sys.executable, '-c', SCRIPT], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(runs: int) -> dict:
+    results = [measure_once() for _ in range(runs)]
+    return {
+        'import_ms': statistics.median(r['import'] for r in results) * 1000,
+        'factory_ms': statistics.median(r['factory'] for r in results) * 1000,
+        'modules': results[-1]['modules'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float, help='target for the median import time')
+    parser.add_argument('--max-factory-ms', type=float, help='target for the median factory time')
+    args = parser.parse_args(argv)
+    result = measure(args.runs)
+    print(f'import  {result["import_ms"]:8.2f} ms (median of {args.runs})')
+    print(f'factory {result["factory_ms"]:8.2f} ms (median of {args.runs})')
+    print(f'modules imported on top of spaCy: {", ".join(result["modules"])}')
+    status = 0
+    for name, target in [('import', args.max_import_ms), ('factory', args.max_factory_ms)]:
+        if target is not None and result[f'{name}_ms'] > target:
+            print(f'SLOW {name}: {result[f"{name}_ms"]:.2f} ms > {target} ms', file=sys.stderr)
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+'''Benchmark suite of the `dbpedia_spotlight` component against the local stub server.
+
+For each process (`annotate`, `spot`, `candidates`) and document size, it measures:
+- `call`: documents annotated one at a time with `nlp(text)`: throughput and p50/p99 latency of each document;
+- `pipe`: `nlp.pipe(texts, batch_size=...)` for each batch size: throughput and p50/p99 latency of the HTTP requests;
+and the peak memory allocated during the run (measured with tracemalloc in a separate, untimed run).
+
+The stub server answers with generated responses, or replays the responses recorded from a real server with `--record`.
+The results are written as JSON, and `--compare` reports the regressions against the results of a previous run.
+
+Usage:
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --output results.json --compare baseline.json --threshold 0.1
+    python benchmarks/run.py --record http://localhost:2222/rest --recordings recordings.jsonl
+    python benchmarks/run.py --recordings recordings.jsonl --latency 0.02 --error-rate 0.01
+    python benchmarks/run.py --slow-rate 0.02 --hedge-after-percentile 95 --hedge-budget 0.1
+'''
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import spacy
+
+import spacy_dbpedia_spotlight
+from stub_server import StubSpotlightServer, load_recordings, record_responses
+
+SENTENCES = [
+    'Google LLC is an American multinational technology company.',
+    'Joe Biden met Boris Johnson at the White House.',
+    'The Justice Department asked Congress about Texas and South Carolina.',
+    'More details are on bbc.co.uk and in the US press.',
+    'Nothing interesting happens in this sentence.',
+]
+
+
+def make_texts(n_docs, doc_chars):
+    '''Returns `n_docs` distinct texts of about `doc_chars` characters (distinct, so that they are not coalesced)'''
+    texts = []
+    for i in range(n_docs):
+        parts = [f'Document {i}.']
+        length = len(parts[0])
+        j = i
+        while length < doc_chars:
+            sentence = SENTENCES[j % len(SENTENCES)]
+            parts.append(sentence)
+            length += len(sentence) + 1
+            j += 1
+        texts.append(' '.join(parts))
+    return texts
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def make_nlp(server, process, args):
+    nlp = spacy.blank('en')
+    nlp.add_pipe('dbpedia_spotlight', config={
+        'dbpedia_rest_endpoint': server.url,
+        'process': process,
+        'max_concurrency': args.max_concurrency,
+        'max_retries': args.max_retries,
+        'backoff_factor': 0.01,
+        'raise_http_errors': False,
+        'collect_stats': True,
+        'hedge_after_percentile': args.hedge_after_percentile,
+        'hedge_budget': args.hedge_budget,
+    })
+    return nlp
+
+
+def run_call(nlp, texts):
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        nlp(text)
+        latencies.append(time.perf_counter() - start)
+    return {'latency_p50': percentile(latencies, 50), 'latency_p99': percentile(latencies, 99)}
+
+
+def run_pipe(nlp, texts, batch_size):
+    # the exact latency of each request (the histograms of the stats have coarse buckets)
+    latencies = []
+    nlp.get_pipe('dbpedia_spotlight').stats_callback = lambda name, value: name == 'request' and latencies.append(value)
+    for _ in nlp.pipe(texts, batch_size=batch_size):
+        pass
+    return {'latency_p50': percentile(latencies, 50), 'latency_p99': percentile(latencies, 99)}
+
+
+def measure(server, process, scenario, texts, batch_size, args):
+    '''Runs the scenario once timed, and once with tracemalloc for the peak memory'''
+    nlp = make_nlp(server, process, args)
+    start = time.perf_counter()
+    if scenario == 'call':
+        result = run_call(nlp, texts)
+    else:
+        result = run_pipe(nlp, texts, batch_size)
+    elapsed = time.perf_counter() - start
+    counters = nlp.get_pipe('dbpedia_spotlight').stats.snapshot()['counters']
+
+    nlp = make_nlp(server, process, args)
+    tracemalloc.start()
+    if scenario == 'call':
+        run_call(nlp, texts)
+    else:
+        run_pipe(nlp, texts, batch_size)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'docs_per_s': len(texts) / elapsed,
+        'elapsed_s': elapsed,
+        **result,
+        'peak_memory_bytes': peak_memory,
+        'requests': counters['requests'],
+        'errors': counters['errors'],
+        'retries': counters['retries'],
+        'hedges': counters['hedges'],
+        'entities': counters['entities'],
+    }
+
+
+def run(args):
+    recordings = load_recordings(args.recordings) if args.recordings else None
+    results = []
+    with StubSpotlightServer(latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                             recordings=recordings, slow_rate=args.slow_rate, slow_latency=args.slow_latency) as server:
+        for process in args.processes:
+            for doc_chars in args.doc_sizes:
+                texts = make_texts(args.n_docs, doc_chars)
+                scenarios = [('call', None)] + [('pipe', batch_size) for batch_size in args.batch_sizes]
+                for scenario, batch_size in scenarios:
+                    result = {'process': process, 'scenario': scenario, 'doc_chars': doc_chars,
+                              'batch_size': batch_size, 'n_docs': len(texts)}
+                    result.update(measure(server, process, scenario, texts, batch_size, args))
+                    results.append(result)
+                    print(f'{process:<10} {scenario:<4} chars={doc_chars:<6} batch={str(batch_size):<5} '
+                          f'{result["docs_per_s"]:9.1f} docs/s  p50={result["latency_p50"] * 1000:7.2f} ms  '
+                          f'p99={result["latency_p99"] * 1000:7.2f} ms  peak={result["peak_memory_bytes"] / 1e6:6.1f} MB',
+                          file=sys.stderr)
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'version': spacy_dbpedia_spotlight.__version__,
+            'spacy_version': spacy.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'record')},
+        },
+        'results': results,
+    }
+
+
+def result_key(result):
+    return result['process'], result['scenario'], result['doc_chars'], result['batch_size']
+
+
+def compare(results, baseline, threshold):
+    '''Returns the descriptions of the results worse than the baseline by more than `threshold` (a fraction)'''
+    baseline_results = {result_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        previous = baseline_results.get(result_key(result))
+        if previous is None:
+            continue
+        checks = [
+            ('docs_per_s', previous['docs_per_s'] / result['docs_per_s'] - 1 if result['docs_per_s'] else float('inf')),
+            ('latency_p99', result['latency_p99'] / previous['latency_p99'] - 1 if previous['latency_p99'] else 0),
+            ('peak_memory_bytes', result['peak_memory_bytes'] / previous['peak_memory_bytes'] - 1
+             if previous['peak_memory_bytes'] else 0),
+        ]
+        for metric, change in checks:
+            if change > threshold:
+                regressions.append(f'{"/".join(str(k) for k in result_key(result))}: {metric} '
+                                   f'{previous[metric]:.4g} -> {result[metric]:.4g} ({change:+.0%} worse)')
+    return regressions
+
+
+def get_parser():
+    def int_list(value):
+        return [int(v) for v in value.split(',')]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='JSON file for the results (default: stdout)')
+    parser.add_argument('--processes', type=lambda v: v.split(','), default=['annotate', 'spot', 'candidates'])
+    parser.add_argument('--doc-sizes', type=int_list, default=[200, 2000, 20000], help='characters of each document')
+    parser.add_argument('--batch-sizes', type=int_list, default=[16, 128])
+    parser.add_argument('--n-docs', type=int, default=200)
+    parser.add_argument('--max-concurrency', type=int, default=16)
+    parser.add_argument('--max-retries', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds of latency of the stub server')
+    parser.add_argument('--latency-jitter', type=float, default=0.005, help='random extra latency, in seconds')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='fraction of requests with --slow-latency')
+    parser.add_argument('--slow-latency', type=float, default=0.5, help='extra latency of the slow requests, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--hedge-after-percentile', type=float, help='hedge the requests slower than this percentile')
+    parser.add_argument('--hedge-budget', type=float, default=0.05, help='maximum fraction of hedged requests')
+    parser.add_argument('--recordings', help='JSONL file of recorded responses to replay')
+    parser.add_argument('--record', metavar='ENDPOINT', help='record the responses of a real server for the benchmark '
+                                                             'texts in --recordings, then exit')
+    parser.add_argument('--compare', help='JSON results of a previous run: exit with status 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='tolerated relative regression (default 20%%)')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.record:
+        if not args.recordings:
+            raise SystemExit('--record requires --recordings')
+        texts = [text for doc_chars in args.doc_sizes for text in make_texts(args.n_docs, doc_chars)]
+        record_responses(args.record, texts, args.processes, args.recordings)
+        return 0
+    results = run(args)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
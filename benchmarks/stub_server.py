@@ -0,0 +1,259 @@
+'''A minimal local stand-in for the DBpedia Spotlight REST API.
+
+It answers `annotate`, `spot` and `candidates` requests by looking up a small dictionary of surface forms in the
+submitted text, so that the results are deterministic and offset-correct for any input text.
+It can also replay responses recorded from a real server (see `record_responses` and `load_recordings`).
+It is used by the tests and by the benchmarks, so that they don't depend on the public endpoint.
+'''
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# surface form -> DBpedia resource
+SURFACE_FORMS = {
+    'Google LLC': 'Google',
+    'Google': 'Google',
+    'American': 'United_States',
+    'US': 'United_States',
+    'Joe Biden': 'Joe_Biden',
+    'Biden': 'Joe_Biden',
+    'Boris Johnson': 'Boris_Johnson',
+    'bbc.co.uk': 'BBC',
+    'Congress': 'United_States_Congress',
+    'Texas': 'Texas',
+    'South Carolina': 'South_Carolina',
+    'Justice Department': 'United_States_Department_of_Justice',
+    'White House': 'White_House',
+}
+
+# DBpedia types of the resources above
+RESOURCE_TYPES = {
+    'Google': 'Wikidata:Q43229,Wikidata:Q24229398,DUL:SocialPerson,DUL:Agent,Schema:Organization,DBpedia:Organisation,DBpedia:Agent,DBpedia:Company',
+    'United_States': 'Wikidata:Q6256,Schema:Place,Schema:Country,DBpedia:PopulatedPlace,DBpedia:Place,DBpedia:Location,DBpedia:Country',
+    'Joe_Biden': 'Wikidata:Q5,Schema:Person,DBpedia:Person,DBpedia:Agent,DBpedia:Politician',
+    'Boris_Johnson': 'Wikidata:Q5,Schema:Person,DBpedia:Person,DBpedia:Agent,DBpedia:Politician',
+    'BBC': 'Schema:Organization,DBpedia:Organisation,DBpedia:Agent,DBpedia:Broadcaster',
+    'Texas': 'Schema:Place,DBpedia:PopulatedPlace,DBpedia:Place,DBpedia:Location,DBpedia:AdministrativeRegion',
+    'South_Carolina': 'Schema:Place,DBpedia:PopulatedPlace,DBpedia:Place,DBpedia:Location,DBpedia:AdministrativeRegion',
+}
+
+
+def _compile(surface_forms):
+    alternatives = sorted(surface_forms, key=len, reverse=True)
+    return re.compile(r'(?<!\w)(' + '|'.join(re.escape(sf) for sf in alternatives) + r')(?!\w)')
+
+
+_DEFAULT_PATTERN = _compile(SURFACE_FORMS)
+
+
+def spot(text, surface_forms=None):
+    '''Returns the list of (offset, surface_form, resource) found in the text'''
+    if surface_forms is None:
+        surface_forms, pattern = SURFACE_FORMS, _DEFAULT_PATTERN
+    else:
+        pattern = _compile(surface_forms)
+    return [(m.start(), m.group(0), surface_forms[m.group(0)]) for m in pattern.finditer(text)]
+
+
+def build_response(process, params, surface_forms=None, utf16_offsets=False):
+    '''Builds the JSON body that DBpedia Spotlight would return for the `process` and the form `params`.
+    With `utf16_offsets`, the offsets are in UTF-16 code units like those of the real server (Java strings), instead
+    of characters: they differ after the characters outside of the Basic Multilingual Plane, e.g. emoji.
+    '''
+    text = params['text']
+    found = spot(text, surface_forms)
+    if utf16_offsets:
+        found = [(len(text[:offset].encode('utf-16-le')) // 2, surface_form, resource)
+                 for offset, surface_form, resource in found]
+    if process == 'annotate':
+        data = {
+            '@text': text,
+            '@confidence': str(params.get('confidence', '0.5')),
+            '@support': str(params.get('support', '0')),
+            '@types': params.get('types', ''),
+            '@sparql': params.get('sparql', ''),
+            '@policy': params.get('policy', 'whitelist'),
+        }
+        if found:
+            data['Resources'] = [{
+                '@URI': f'http://dbpedia.org/resource/{resource}',
+                '@support': str(1000 + 17 * len(resource)),
+                '@types': RESOURCE_TYPES.get(resource, ''),
+                '@surfaceForm': surface_form,
+                '@offset': str(offset),
+                '@similarityScore': '0.9999999999999005',
+                '@percentageOfSecondRank': '1.0E-5',
+            } for offset, surface_form, resource in found]
+        return data
+    if process == 'spot':
+        return {'annotation': {'@text': text, 'surfaceForm': [
+            {'@name': surface_form, '@offset': str(offset)} for offset, surface_form, _ in found]}}
+    if process == 'candidates':
+        surface_form_list = [{
+            '@name': surface_form,
+            '@offset': str(offset),
+            'resource': {
+                '@label': resource.replace('_', ' '),
+                '@uri': resource,
+                '@contextualScore': '0.9',
+                '@percentageOfSecondRank': '0.01',
+                '@support': str(1000 + 17 * len(resource)),
+                '@priorScore': '0.5',
+                '@finalScore': '0.99',
+                '@types': RESOURCE_TYPES.get(resource, ''),
+            }
+        } for offset, surface_form, resource in found]
+        annotation = {'@text': text}
+        if len(surface_form_list) == 1:
+            # DBpedia Spotlight returns an object instead of a list when there is a single surface form
+            annotation['surfaceForm'] = surface_form_list[0]
+        elif surface_form_list:
+            annotation['surfaceForm'] = surface_form_list
+        return {'annotation': annotation}
+    raise ValueError(process)
+
+
+def load_recordings(path):
+    '''Reads the recorded responses from a JSONL file of {"process": ..., "text": ..., "response": ...} objects,
+    and returns them as a dict (process, text) -> response
+    '''
+    recordings = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                recordings[(record['process'], record['text'])] = record['response']
+    return recordings
+
+
+def record_responses(endpoint, texts, processes, path, **params):
+    '''Sends the texts to a real DBpedia Spotlight `endpoint` and appends its responses to the JSONL file `path`'''
+    import requests
+    with open(path, 'a', encoding='utf-8') as f:
+        for process in processes:
+            for text in texts:
+                response = requests.post(f'{endpoint}/{process}', data={'text': text, **params},
+                                         headers={'accept': 'application/json'})
+                response.raise_for_status()
+                record = {'process': process, 'text': text, 'response': response.json()}
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive connections, like the real server
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, avoid waiting for delayed ACKs on reused connections
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connection_count += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, extra_headers={}):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in extra_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        params = {k: v[0] for k, v in parse_qs(body, keep_blank_values=True).items()}
+        with self.server.stats_lock:
+            self.server.request_count += 1
+            fail = (self.server.request_count <= self.server.fail_first
+                    or (self.server.error_rate and random.random() < self.server.error_rate))
+        process = self.path.rstrip('/').rsplit('/', 1)[-1]
+        if process not in ('annotate', 'spot', 'candidates'):
+            return self._send(404, '{"error": "not found"}')
+        latency = self.server.latency
+        if self.server.latency_jitter:
+            latency += random.uniform(0, self.server.latency_jitter)
+        if self.server.slow_rate and random.random() < self.server.slow_rate:
+            latency += self.server.slow_latency
+        if latency:
+            time.sleep(latency)
+        if fail:
+            extra_headers = {'Retry-After': str(self.server.retry_after)} if self.server.retry_after is not None else {}
+            return self._send(self.server.error_status, '{"error": "injected error"}', extra_headers)
+        if not params.get('text'):
+            return self._send(400, '{"error": "No text was specified"}')
+        data = self.server.recordings.get((process, params['text']))
+        if data is None:
+            data = build_response(process, params, self.server.surface_forms, self.server.utf16_offsets)
+        self._send(200, json.dumps(data))
+
+
+class StubSpotlightServer(object):
+    '''Runs the stub server in a background thread. Use `url` as `dbpedia_rest_endpoint`.
+
+    ```python
+    with StubSpotlightServer() as server:
+        nlp.add_pipe('dbpedia_spotlight', config={'dbpedia_rest_endpoint': server.url})
+    ```
+    '''
+
+    def __init__(self, host='127.0.0.1', port=0, surface_forms=None, latency=0.0,
+                 error_rate=0.0, error_status=503, retry_after=None, fail_first=0, recordings=None, latency_jitter=0.0,
+                 slow_rate=0.0, slow_latency=1.0, utf16_offsets=False):
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.surface_forms = surface_forms
+        self._httpd.utf16_offsets = utf16_offsets
+        # (process, text) -> recorded response, replayed instead of the generated one
+        self._httpd.recordings = recordings or {}
+        # seconds waited before answering each request, plus a random time up to `latency_jitter`
+        self._httpd.latency = latency
+        self._httpd.latency_jitter = latency_jitter
+        # the tail latency: a random fraction `slow_rate` of the requests take `slow_latency` more seconds
+        self._httpd.slow_rate = slow_rate
+        self._httpd.slow_latency = slow_latency
+        # errors: a random fraction of the requests, or the first `fail_first` requests, get `error_status`
+        self._httpd.error_rate = error_rate
+        self._httpd.error_status = error_status
+        self._httpd.retry_after = retry_after
+        self._httpd.fail_first = fail_first
+        self._httpd.stats_lock = threading.Lock()
+        self._httpd.request_count = 0
+        self._httpd.connection_count = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/rest'
+
+    @property
+    def request_count(self):
+        return self._httpd.request_count
+
+    @property
+    def connection_count(self):
+        return self._httpd.connection_count
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -4,7 +4,12 @@ from spacy.util import load_model_from_init_py
 from . import entity_linker, util
 from .entity_linker import EntityLinker, create
 
-__version__ = util.pkg_meta["version"]
+
+def __getattr__(name):
+    # read from the package metadata on first access, to keep the import fast
+    if name == '__version__':
+        return util.get_pkg_meta()["version"]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def load(**overrides):
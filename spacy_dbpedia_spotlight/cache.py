@@ -0,0 +1,155 @@
+import collections
+import hashlib
+import json
+import threading
+import time
+import zlib
+
+from .util import json_loads
+
+
+def make_cache_key(*parts) -> str:
+    '''Builds a cache key from the text and the parameters of a request (any JSON-serializable values)'''
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class ResponseCache(object):
+    '''Persistent cache of the DBpedia Spotlight responses, stored in a SQLite file.
+
+    The entries are evicted in least-recently-used order when there are more than `max_entries` or when their total
+    size is above `max_bytes`, and they expire `ttl` seconds after being stored.
+    The cache can be used from several threads, and several processes can share the same file.
+    '''
+
+    def __init__(self, path, max_entries=None, max_bytes=None, ttl=None):
+        import sqlite3
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                           'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, '
+                           'created REAL NOT NULL, accessed REAL NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self._refresh_totals()
+
+    def get(self, key: str):
+        '''Returns the cached JSON response for the key, or None if it is not cached or has expired'''
+        with self._lock:
+            row = self._conn.execute('SELECT value, created FROM responses WHERE key = ?', (key,)).fetchone()
+            now = time.time()
+            if row is not None and self.ttl is not None and row[1] + self.ttl < now:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._count -= 1
+                self._size -= len(row[0])
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+            self.hits += 1
+        return json_loads(zlib.decompress(row[0]))
+
+    def set(self, key: str, data):
+        '''Stores the JSON response for the key, evicting the least recently used entries if the cache is full'''
+        value = zlib.compress(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._conn.execute('INSERT OR REPLACE INTO responses (key, value, size, created, accessed) '
+                               'VALUES (?, ?, ?, ?, ?)', (key, value, len(value), now, now))
+            if old is None:
+                self._count += 1
+                self._size += len(value)
+            else:
+                self._size += len(value) - old[0]
+            if self._is_full():
+                self._evict(now)
+
+    def _is_full(self):
+        return ((self.max_entries is not None and self._count > self.max_entries)
+                or (self.max_bytes is not None and self._size > self.max_bytes))
+
+    def _refresh_totals(self):
+        # other processes may be writing to the same file, so the totals are read again before evicting
+        self._count, self._size = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self._conn.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+        self._refresh_totals()
+        if not self._is_full():
+            return
+        to_delete = []
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed'):
+            if not self._is_full():
+                break
+            to_delete.append((key,))
+            self._count -= 1
+            self._size -= size
+        self._conn.executemany('DELETE FROM responses WHERE key = ?', to_delete)
+
+    def clear(self):
+        '''Removes all the entries and resets the counters'''
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._count = self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+class MemoryCache(object):
+    '''In-process LRU cache of the DBpedia Spotlight responses, holding at most `max_entries` responses.
+    The cached responses are shared by all the documents with the same text, and must not be modified.
+    '''
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data = collections.OrderedDict()
+
+    def get(self, key: str):
+        '''Returns the cached JSON response for the key, or None if it is not cached'''
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def set(self, key: str, data):
+        '''Stores the JSON response for the key, evicting the least recently used one if the cache is full'''
+        with self._lock:
+            self._data[key] = data
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        '''Removes all the entries and resets the counters'''
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,133 @@
+import bisect
+import difflib
+import itertools
+import re
+
+from spacy.tokens import Doc
+
+from .response import get_response_entities, get_response_text, get_surface_form_key, make_response, utf16_offset
+
+# the end of a paragraph (line breaks) or of a sentence (punctuation followed by whitespace), for diff_texts
+SEGMENT_END = re.compile(r'\n\s*|(?<=[.!?])\s+')
+
+
+def split_doc(doc: Doc, max_chars: int, overlap: int = 0) -> list:
+    '''Splits the document in chunks of at most `max_chars` characters, and returns the list of (start_char, end_char).
+
+    The chunks end on the best boundary available within the budget, in order of preference:
+    sentence boundaries (if the doc has sentence annotations), line breaks, whitespace between tokens, any token boundary.
+    A chunk is longer than `max_chars` only if it contains a single token longer than that.
+    With `overlap` > 0, each chunk starts on a token boundary at least `overlap` characters before the end of the previous one,
+    so that the entities across the boundary are found in full by one of the chunks.
+    '''
+    text_length = len(doc.text)
+    if text_length <= max_chars:
+        return [(0, text_length)]
+    token_starts = [t.idx for t in doc]
+    boundary_classes = []
+    if doc.has_annotation('SENT_START'):
+        boundary_classes.append([sent.start_char for sent in doc.sents])
+    boundary_classes.append([t.idx for t in doc if t.i and '\n' in doc[t.i - 1].text_with_ws])
+    boundary_classes.append([t.idx for t in doc if t.i and doc[t.i - 1].whitespace_])
+    boundary_classes.append(token_starts)
+    chunks = []
+    start = 0
+    while start < text_length:
+        limit = start + max_chars
+        if limit >= text_length:
+            chunks.append((start, text_length))
+            break
+        end = None
+        for boundaries in boundary_classes:
+            # the farthest boundary within the budget
+            i = bisect.bisect_right(boundaries, limit) - 1
+            if i >= 0 and boundaries[i] > start:
+                end = boundaries[i]
+                break
+        if end is None:
+            # a single token longer than max_chars: end the chunk after it
+            i = bisect.bisect_right(token_starts, start)
+            end = token_starts[i] if i < len(token_starts) else text_length
+        chunks.append((start, end))
+        next_start = end
+        if overlap:
+            i = bisect.bisect_left(token_starts, end - overlap)
+            if i < len(token_starts) and start < token_starts[i] < end:
+                next_start = token_starts[i]
+        start = next_start
+    return chunks
+
+
+def merge_responses(process: str, text: str, parts: list):
+    '''Merges the JSON responses for parts of the text into a single response for the whole text.
+
+    :param process: the DBpedia Spotlight process that produced the responses
+    :param text: the text of the whole document
+    :param parts: list of (data, request_start, request_end, shift): the response `data` for a request, of which only the
+    entities in the range [request_start, request_end) of the request text belong to the document, and are moved to
+    the position `shift` of the document. The positions are in characters, and are converted to the UTF-16 offsets of
+    DBpedia Spotlight: the merged offsets are the ones of a single request with the whole text.
+    :return: the merged response, or None if any of the responses is None (a failed request, ignored with
+    `raise_http_errors` False): without it, the response would not cover the whole text
+    '''
+    if any(data is None for data, _, _, _ in parts):
+        return None
+    text_key = get_surface_form_key(process)
+    template = None
+    entities = []
+    seen = set()
+    for data, request_start, request_end, shift in parts:
+        if template is None:
+            template = data
+        request_text = get_response_text(process, data)
+        if request_text is not None:
+            request_start = utf16_offset(request_text, request_start)
+            request_end = utf16_offset(request_text, request_end)
+        shift = utf16_offset(text, shift)
+        for ent in get_response_entities(process, data):
+            offset = int(ent['@offset'])
+            if offset < request_start or offset + utf16_offset(ent[text_key], len(ent[text_key])) > request_end:
+                continue
+            offset = offset - request_start + shift
+            # entities found by two overlapping chunks
+            key = (offset, ent[text_key])
+            if key in seen:
+                continue
+            seen.add(key)
+            ent = dict(ent)
+            ent['@offset'] = str(offset)
+            entities.append(ent)
+    if template is None:
+        return None
+    entities.sort(key=lambda ent: int(ent['@offset']))
+    return make_response(process, text, entities, template)
+
+
+def split_segments(text: str) -> list:
+    '''Splits the text in paragraphs and sentences, each one with the whitespace that follows it'''
+    segments = []
+    start = 0
+    for match in SEGMENT_END.finditer(text):
+        if match.end() > start:
+            segments.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        segments.append(text[start:])
+    return segments
+
+
+def diff_texts(old_text: str, new_text: str) -> list:
+    '''Compares two versions of a text by paragraphs and sentences.
+
+    :return: list of (old_start, old_end, new_start, new_end, equal) covering both texts in order: the regions that are
+    the same in both texts (equal is True), and the regions of the new text that replace the old ones (equal is False,
+    and one of the two regions can be empty)
+    '''
+    old_segments = split_segments(old_text)
+    new_segments = split_segments(new_text)
+    # the character offset of each segment
+    old_offsets = [0] + list(itertools.accumulate(len(segment) for segment in old_segments))
+    new_offsets = [0] + list(itertools.accumulate(len(segment) for segment in new_segments))
+    matcher = difflib.SequenceMatcher(None, old_segments, new_segments, autojunk=False)
+    return [(old_offsets[i1], old_offsets[i2], new_offsets[j1], new_offsets[j2], tag == 'equal')
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes()]
@@ -0,0 +1,315 @@
+'''Command line interface: `python -m spacy_dbpedia_spotlight annotate corpus.jsonl annotated.jsonl`,
+and `python -m spacy_dbpedia_spotlight build-index pairCounts index.bin` for the local backend.
+
+The documents are streamed from the input to the output, so the memory use doesn't depend on the size of the corpus,
+and the position reached in the input (with the size of the output) can be saved in a checkpoint file to resume an
+interrupted run.
+'''
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import spacy
+from loguru import logger
+from spacy.tokens import DocBin
+
+from .local_index import build_index, read_tsv
+
+
+def parse_value(value: str):
+    '''The value of a `--set key=value` option: JSON if possible (numbers, booleans, lists), otherwise a string'''
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def read_checkpoint(path) -> dict:
+    '''Returns the checkpoint saved at the last flush of the output: {"lines": the number of lines of the input
+    processed, "offset": the size of the JSONL output or the number of DocBin shards, null for stdout}, or None if there
+    is none yet.
+    The documents are written in the order of the input, so the position in the input is enough to resume: the memory
+    use doesn't depend on the number of documents already processed.
+    '''
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_checkpoint(path, lines: int, offset=None):
+    # written under another name first, so that an interrupted run doesn't leave a truncated checkpoint
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'lines': lines, 'offset': offset}, f)
+    os.replace(path + '.tmp', path)
+
+
+def read_records(path, input_format, text_key='text', id_key='id', start_line=0):
+    '''Yields (line_number, id, text) from a JSONL file (one object per line) or a text file (one document per line),
+    from the line `start_line`. The ID of a document is the value of `id_key` or its line number.
+    The blank lines and the documents with a blank text are skipped, as well as the JSONL records without a text
+    (missing, null or not a string), with a warning.
+    '''
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for line_number, line in enumerate(itertools.islice(f, start_line, None), start_line):
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if input_format == 'text':
+                yield line_number, str(line_number), line
+                continue
+            record = json.loads(line)
+            text = record.get(text_key) if isinstance(record, dict) else None
+            if not isinstance(text, str):
+                logger.warning(f'Skipping the line {line_number + 1}: no text in "{text_key}"')
+                continue
+            if not text.strip():
+                continue
+            yield line_number, str(record.get(id_key, line_number)), text
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def doc_to_record(doc, doc_id, span_group='dbpedia_spotlight', id_key='id', include_text=False) -> dict:
+    '''The JSON record written for an annotated document, with the entities of the span group'''
+    record = {id_key: doc_id}
+    if include_text:
+        record['text'] = doc.text
+    record['entities'] = [{
+        'start_char': span.start_char,
+        'end_char': span.end_char,
+        'text': span.text,
+        'label': span.label_,
+        'kb_id': span.kb_id_,
+        'raw': span._.dbpedia_raw_result,
+    } for span in doc.spans.get(span_group, [])]
+    return record
+
+
+class JsonlWriter(object):
+    '''Appends one JSON record per document to a file (or to stdout).
+    With `offset`, the file is first truncated to that size, to remove the records written after the last checkpoint.
+    '''
+
+    def __init__(self, path, span_group='dbpedia_spotlight', id_key='id', include_text=False, flush_every=1000,
+                 offset=None):
+        if path == '-':
+            self.file = sys.stdout
+            # the size of the output, None for stdout
+            self.offset = None
+        else:
+            if offset is not None and os.path.exists(path):
+                os.truncate(path, offset)
+            self.file = open(path, 'ab')
+            self.offset = self.file.seek(0, os.SEEK_END)
+        self.span_group = span_group
+        self.id_key = id_key
+        self.include_text = include_text
+        self.flush_every = flush_every
+        self._pending_ids = []
+
+    def write(self, doc, doc_id) -> list:
+        '''Writes the document, and returns the IDs of the documents that are now saved (at each flush)'''
+        record = doc_to_record(doc, doc_id, self.span_group, self.id_key, self.include_text)
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        if self.offset is None:
+            self.file.write(line)
+        else:
+            line = line.encode('utf-8')
+            self.file.write(line)
+            self.offset += len(line)
+        self._pending_ids.append(doc_id)
+        if len(self._pending_ids) >= self.flush_every:
+            return self.flush()
+        return []
+
+    def flush(self) -> list:
+        self.file.flush()
+        ids, self._pending_ids = self._pending_ids, []
+        return ids
+
+    def close(self) -> list:
+        ids = self.flush()
+        if self.file is not sys.stdout:
+            self.file.close()
+        return ids
+
+
+class DocBinWriter(object):
+    '''Writes the documents in a directory of DocBin files (`shard-000000.spacy`, ...) of `shard_size` documents,
+    with the ID in `doc.user_data['id']`. A resumed run starts a new shard.
+    With `offset` (the number of shards at the last checkpoint), the shards written after it are removed first: their
+    documents are written again.
+    '''
+
+    def __init__(self, path, shard_size=10000, offset=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.shard_size = shard_size
+        shards = sorted(name for name in os.listdir(path) if name.endswith('.spacy'))
+        if offset is not None:
+            for name in shards[offset:]:
+                os.remove(os.path.join(path, name))
+            shards = shards[:offset]
+        self.shard_index = len(shards)
+        self._doc_bin = DocBin(store_user_data=True)
+        self._pending_ids = []
+
+    @property
+    def offset(self) -> int:
+        # the number of shards written, saved in the checkpoint
+        return self.shard_index
+
+    def write(self, doc, doc_id) -> list:
+        doc.user_data['id'] = doc_id
+        self._doc_bin.add(doc)
+        self._pending_ids.append(doc_id)
+        if len(self._pending_ids) >= self.shard_size:
+            return self.flush()
+        return []
+
+    def flush(self) -> list:
+        if not self._pending_ids:
+            return []
+        shard_path = os.path.join(self.path, f'shard-{self.shard_index:06d}.spacy')
+        # written under another name first, so that an interrupted run doesn't leave a truncated shard
+        self._doc_bin.to_disk(shard_path + '.tmp')
+        os.replace(shard_path + '.tmp', shard_path)
+        self.shard_index += 1
+        self._doc_bin = DocBin(store_user_data=True)
+        ids, self._pending_ids = self._pending_ids, []
+        return ids
+
+    def close(self) -> list:
+        return self.flush()
+
+
+def build_nlp(args):
+    nlp = spacy.load(args.model) if args.model else spacy.blank(args.lang)
+    config = {
+        'process': args.process,
+        'max_concurrency': args.max_concurrency,
+        'raise_http_errors': not args.skip_errors,
+    }
+    if args.endpoint:
+        config['dbpedia_rest_endpoint'] = args.endpoint[0] if len(args.endpoint) == 1 else args.endpoint
+    if args.confidence is not None:
+        config['confidence'] = args.confidence
+    if args.concurrency_budget is not None:
+        config['concurrency_budget'] = args.concurrency_budget
+    for option in args.set or []:
+        key, _, value = option.partition('=')
+        config[key] = parse_value(value)
+    nlp.add_pipe('dbpedia_spotlight', config=config)
+    return nlp
+
+
+def annotate(args):
+    nlp = build_nlp(args)
+    span_group = nlp.get_pipe('dbpedia_spotlight').span_group
+
+    input_format = args.input_format or ('text' if args.input.endswith('.txt') else 'jsonl')
+    output_format = args.output_format or ('jsonl' if args.output == '-' or args.output.endswith('.jsonl') else 'docbin')
+    checkpoint = read_checkpoint(args.checkpoint) or {'lines': 0, 'offset': None}
+    if checkpoint['lines']:
+        logger.info(f'Resuming: skipping the first {checkpoint["lines"]} lines already processed')
+    records = ((text, (line_number, doc_id)) for line_number, doc_id, text
+               in read_records(args.input, input_format, args.text_key, args.id_key, checkpoint['lines']))
+    if args.limit:
+        records = itertools.islice(records, args.limit)
+    if output_format == 'jsonl':
+        writer = JsonlWriter(args.output, span_group, args.id_key, args.include_text, args.flush_every,
+                             checkpoint['offset'])
+    else:
+        writer = DocBinWriter(args.output, args.shard_size, checkpoint['offset'])
+    # the line following the last document written
+    next_line = checkpoint['lines']
+
+    def save_checkpoint(ids):
+        # after a flush, all the documents up to the last one written are saved
+        if args.checkpoint and ids:
+            write_checkpoint(args.checkpoint, next_line, writer.offset)
+
+    start = last_log = time.monotonic()
+    n_docs = n_entities = 0
+    try:
+        for doc, (line_number, doc_id) in nlp.pipe(records, as_tuples=True, batch_size=args.batch_size,
+                                                   n_process=args.n_process):
+            next_line = line_number + 1
+            n_docs += 1
+            n_entities += len(doc.spans.get(span_group, []))
+            save_checkpoint(writer.write(doc, doc_id))
+            now = time.monotonic()
+            if now - last_log >= args.log_every:
+                last_log = now
+                logger.info(f'{n_docs} documents, {n_entities} entities, {n_docs / (now - start):.1f} docs/s')
+    finally:
+        save_checkpoint(writer.close())
+    elapsed = time.monotonic() - start
+    logger.info(f'Done: {n_docs} documents, {n_entities} entities in {elapsed:.1f}s '
+                f'({n_docs / elapsed if elapsed else 0:.1f} docs/s)')
+    return n_docs
+
+
+def build_local_index(args):
+    start = time.monotonic()
+    n_surface_forms = build_index(read_tsv(args.input, args.min_count), args.output)
+    logger.info(f'Done: {n_surface_forms} surface forms written to {args.output} in {time.monotonic() - start:.1f}s')
+    return n_surface_forms
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m spacy_dbpedia_spotlight',
+                                     description='Annotate documents with DBpedia Spotlight')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('annotate', help='annotate a corpus, streaming it from the input to the output')
+    p.add_argument('input', help="JSONL file with one document per line ({\"id\": ..., \"text\": ...}), a text file "
+                                 "with one document per line (.txt), or - for stdin")
+    p.add_argument('output', help='JSONL file (.jsonl, appended), - for stdout, or a directory of DocBin shards')
+    p.add_argument('--input-format', choices=['jsonl', 'text'], help='default from the extension of the input')
+    p.add_argument('--output-format', choices=['jsonl', 'docbin'], help='default from the output path')
+    p.add_argument('--text-key', default='text', help='the field of the JSONL records with the text')
+    p.add_argument('--id-key', default='id', help='the field of the JSONL records with the ID (default: line number)')
+    p.add_argument('--include-text', action='store_true', help='copy the text in the JSONL output')
+    p.add_argument('--checkpoint', help='file with the position reached in the input, saved at each flush of the '
+                                        'output, to resume from it when the command is run again')
+    p.add_argument('--lang', default='en', help='language of the blank pipeline and of the default endpoint')
+    p.add_argument('--model', help='a spaCy pipeline to load instead of a blank one')
+    p.add_argument('--endpoint', nargs='+', help='the DBpedia Spotlight REST endpoint(s)')
+    p.add_argument('--process', default='annotate', choices=['annotate', 'spot', 'candidates'])
+    p.add_argument('--confidence', type=float)
+    p.add_argument('--max-concurrency', type=int, default=16, help='concurrent requests of each process')
+    p.add_argument('--concurrency-budget', type=int, help='concurrent requests of all the processes together')
+    p.add_argument('--batch-size', type=int, default=128)
+    p.add_argument('--n-process', type=int, default=1)
+    p.add_argument('--skip-errors', action='store_true', help='write the documents without entities on HTTP errors '
+                                                              'instead of stopping')
+    p.add_argument('--set', action='append', metavar='KEY=VALUE',
+                   help='other configuration parameters of the component, e.g. --set max_retries=3')
+    p.add_argument('--shard-size', type=int, default=10000, help='documents in each DocBin shard')
+    p.add_argument('--flush-every', type=int, default=1000, help='documents between the flushes of the JSONL output')
+    p.add_argument('--log-every', type=float, default=10, help='seconds between the progress messages')
+    p.add_argument('--limit', type=int, help='stop after this number of documents')
+    p.set_defaults(func=annotate)
+
+    p = subparsers.add_parser('build-index', help='build the surface form index of the local backend')
+    p.add_argument('input', help='TSV file with the columns surface form, URI, count and optionally the types, '
+                                 'like the pairCounts file of a DBpedia Spotlight model')
+    p.add_argument('output', help='the index file to write')
+    p.add_argument('--min-count', type=int, default=1, help='skip the pairs seen fewer times')
+    p.set_defaults(func=build_local_index)
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    # the progress goes to stderr, the output can be stdout
+    logger.remove()
+    logger.add(sys.stderr, level='INFO')
+    args.func(args)
@@ -0,0 +1,140 @@
+import numpy
+from spacy.tokens import Doc, Span
+
+from .response import get_response_entities, get_surface_form_key, make_response
+
+# the key of doc.user_data holding the compact results
+COMPACT_KEY = 'dbpedia_spotlight_compact'
+# the keys of doc.user_data used by the `dbpedia_raw_result` extension attributes (the same as a default extension,
+# so that docs serialized by previous versions can still be read)
+EXTENSION_NAME = 'dbpedia_raw_result'
+
+
+def _extension_key(start=None, end=None):
+    return ('._.', EXTENSION_NAME, start, end)
+
+
+def _to_column(values):
+    # numbers become numpy arrays if they can be converted back to the same JSON strings, otherwise they stay a list
+    if values and all(isinstance(v, str) for v in values):
+        try:
+            ints = [int(v) for v in values]
+            if all(str(i) == v for i, v in zip(ints, values)):
+                return numpy.array(ints, dtype=numpy.int64)
+        except ValueError:
+            pass
+        try:
+            floats = [float(v) for v in values]
+            if all(repr(f) == v for f, v in zip(floats, values)):
+                return numpy.array(floats, dtype=numpy.float64)
+        except ValueError:
+            pass
+    return values
+
+
+def _from_column(column, i):
+    value = column[i]
+    if isinstance(column, numpy.ndarray):
+        return repr(float(value)) if column.dtype.kind == 'f' else str(int(value))
+    return value
+
+
+def compact_response(process: str, text: str, data, span_bounds: list) -> dict:
+    '''Converts the JSON response of DBpedia Spotlight in columns, one per field of the entities.
+
+    Numeric fields (offsets, support, similarity scores, ...) are stored as numpy arrays, the surface forms are not stored
+    when they can be read from the text, and the other fields are lists.
+
+    :param process: the DBpedia Spotlight process that produced the response
+    :param text: the text of the document
+    :param data: the JSON response
+    :param span_bounds: (start_char, end_char) of the span created for each entity, or None if it has not been created
+    :return: the compact results, which can be stored in doc.user_data and serialized with DocBin
+    '''
+    entities = get_response_entities(process, data)
+    template = data if process == 'annotate' else data.get('annotation', {})
+    meta = {k: v for k, v in template.items() if k not in ('@text', 'Resources', 'surfaceForm')}
+    fields = []
+    for ent in entities:
+        for field in ent:
+            if field not in fields:
+                fields.append(field)
+    missing = object()
+    sparse = []
+    text_key = get_surface_form_key(process)
+    columns = {}
+    for field in fields:
+        values = [ent.get(field, missing) for ent in entities]
+        if field == text_key and all(v is not missing and text[int(ent['@offset']):int(ent['@offset']) + len(v)] == v
+                                     for v, ent in zip(values, entities)):
+            # read from the text with the offsets
+            columns[field] = None
+            continue
+        if any(v is missing for v in values):
+            # only for fields present in all the entities
+            columns[field] = [v if v is not missing else None for v in values]
+            sparse.append(field)
+            continue
+        columns[field] = _to_column(values)
+    return {
+        'process': process,
+        'meta': meta,
+        'fields': fields,
+        'sparse': sparse,
+        'columns': columns,
+        'text_lengths': numpy.array([len(ent.get(text_key, '')) for ent in entities], dtype=numpy.int32),
+        'span_starts': numpy.array([b[0] if b else -1 for b in span_bounds], dtype=numpy.int32),
+        'span_ends': numpy.array([b[1] if b else -1 for b in span_bounds], dtype=numpy.int32),
+    }
+
+
+def get_compact_entity(compact: dict, text: str, i: int) -> dict:
+    '''Materializes the JSON of the entity `i` from the compact results'''
+    ent = {}
+    for field in compact['fields']:
+        column = compact['columns'][field]
+        if column is None:
+            offset = int(_from_column(compact['columns']['@offset'], i))
+            ent[field] = text[offset:offset + int(compact['text_lengths'][i])]
+        elif field in compact['sparse'] and column[i] is None:
+            continue
+        else:
+            ent[field] = _from_column(column, i)
+    return ent
+
+
+def expand_response(compact: dict, text: str):
+    '''Materializes the whole JSON response from the compact results'''
+    n_entities = len(compact['span_starts'])
+    entities = [get_compact_entity(compact, text, i) for i in range(n_entities)]
+    data = make_response(compact['process'], text, entities, compact['meta'])
+    if compact['process'] != 'annotate':
+        data['annotation'].update(compact['meta'])
+    return data
+
+
+def get_doc_raw_result(doc: Doc):
+    data = doc.user_data.get(_extension_key())
+    if data is None and COMPACT_KEY in doc.user_data:
+        data = expand_response(doc.user_data[COMPACT_KEY], doc.text)
+    return data
+
+
+def set_doc_raw_result(doc: Doc, value):
+    doc.user_data[_extension_key()] = value
+
+
+def get_span_raw_result(span: Span):
+    user_data = span.doc.user_data
+    data = user_data.get(_extension_key(span.start_char, span.end_char))
+    if data is None and COMPACT_KEY in user_data:
+        compact = user_data[COMPACT_KEY]
+        rows = numpy.nonzero((compact['span_starts'] == span.start_char) & (compact['span_ends'] == span.end_char))[0]
+        if len(rows):
+            # the last entity of the span, as when the raw results are stored for each span
+            data = get_compact_entity(compact, span.doc.text, int(rows[-1]))
+    return data
+
+
+def set_span_raw_result(span: Span, value):
+    span.doc.user_data[_extension_key(span.start_char, span.end_char)] = value
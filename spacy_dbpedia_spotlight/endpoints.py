@@ -0,0 +1,81 @@
+import threading
+import time
+
+# the possible values of `endpoint_selection`
+SELECTION_STRATEGIES = ['round_robin', 'least_outstanding']
+
+
+class EndpointPool(object):
+    '''Distributes the requests across several replicas of DBpedia Spotlight, and keeps track of their health.
+
+    An endpoint is ejected for `ejection_time` seconds after `max_failures` consecutive failures (connection errors,
+    timeouts and temporary error statuses), and then receives requests again.
+    If all the endpoints are ejected, the one that has been ejected first is used anyway.
+    '''
+
+    def __init__(self, endpoints, strategy='round_robin', max_failures=3, ejection_time=30):
+        if not endpoints:
+            raise ValueError('At least one endpoint is required')
+        if strategy not in SELECTION_STRATEGIES:
+            raise ValueError(
+                f'The endpoint selection {strategy} is not supported. Choose one of {SELECTION_STRATEGIES}')
+        self.endpoints = list(endpoints)
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.ejection_time = ejection_time
+        self._lock = threading.Lock()
+        self._next = 0
+        self._outstanding = {endpoint: 0 for endpoint in self.endpoints}
+        self._failures = {endpoint: 0 for endpoint in self.endpoints}
+        self._ejected_until = {endpoint: 0.0 for endpoint in self.endpoints}
+
+    def is_healthy(self, endpoint: str) -> bool:
+        return self._ejected_until[endpoint] <= time.monotonic()
+
+    def acquire(self, exclude=()) -> str:
+        '''Chooses the endpoint for a new request, avoiding the endpoints in `exclude` if possible.
+        Each call must be followed by a call to `release` when the request is completed.
+        '''
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if self._ejected_until[e] <= now and e not in exclude]
+            if not candidates:
+                candidates = [e for e in self.endpoints if self._ejected_until[e] <= now]
+            if not candidates:
+                candidates = [min(self.endpoints, key=self._ejected_until.get)]
+            # round robin, also to break the ties between the least outstanding
+            start = self._next % len(self.endpoints)
+            ordered = sorted(candidates, key=lambda e: (self.endpoints.index(e) - start) % len(self.endpoints))
+            if self.strategy == 'least_outstanding':
+                endpoint = min(ordered, key=self._outstanding.get)
+            else:
+                endpoint = ordered[0]
+            self._next = self.endpoints.index(endpoint) + 1
+            self._outstanding[endpoint] += 1
+            return endpoint
+
+    def release(self, endpoint: str, failed: bool = False):
+        '''Marks the request to the endpoint as completed, successfully or with a failure of the endpoint'''
+        with self._lock:
+            self._outstanding[endpoint] -= 1
+            if not failed:
+                self._failures[endpoint] = 0
+                return
+            self._failures[endpoint] += 1
+            if self._failures[endpoint] >= self.max_failures:
+                self._ejected_until[endpoint] = time.monotonic() + self.ejection_time
+                self._failures[endpoint] = 0
+
+    def has_untried(self, tried) -> bool:
+        '''Whether there is a healthy endpoint not in `tried`'''
+        return any(e not in tried and self.is_healthy(e) for e in self.endpoints)
+
+    def status(self) -> list:
+        '''Returns the current state of each endpoint'''
+        with self._lock:
+            return [{
+                'endpoint': e,
+                'healthy': self.is_healthy(e),
+                'outstanding': self._outstanding[e],
+                'consecutive_failures': self._failures[e],
+            } for e in self.endpoints]
@@ -1,20 +1,63 @@
-import concurrent.futures
-import sys
+import collections
+import functools
+import multiprocessing
+import os
+import threading
+import time
+import weakref
 
-import requests
 import spacy
-from multiprocessing.pool import ThreadPool
-from loguru import logger
-from requests import HTTPError
-from spacy import util
 from spacy.language import Language
 from spacy.tokens import Doc, Span
 
+from .cache import MemoryCache, ResponseCache, make_cache_key
+from .chunking import diff_texts, merge_responses, split_doc
+from .compact import (COMPACT_KEY, compact_response, get_doc_raw_result, get_span_raw_result, set_doc_raw_result,
+                      set_span_raw_result)
+from .endpoints import SELECTION_STRATEGIES, EndpointPool
+from .filters import DEFAULT_LABEL, SCORE_FIELDS, EntityFilter, get_filter_config
+from .hedging import Hedger
+from .local_index import SurfaceFormIndex
+from .response import TokenIndex, Utf16Index, get_response_entities, get_response_text, get_surface_form_key
+from .retry import RETRY_STATUS_CODES, TokenBucket, get_backoff_delay, parse_retry_after
+from .stats import LinkerStats
+from .util import json_loads, logger
+
 DBPEDIA_SPOTLIGHT_DEFAULT_ENDPOINT = 'https://api.dbpedia-spotlight.org'
 
-# span extension attribute for raw json
-Span.set_extension("dbpedia_raw_result", default=None)
-Doc.set_extension("dbpedia_raw_result", default=None)
+# span extension attribute for raw json (stored as it is, or in columns with `compact_raw_results`)
+Span.set_extension("dbpedia_raw_result", getter=get_span_raw_result, setter=set_span_raw_result)
+Doc.set_extension("dbpedia_raw_result", getter=get_doc_raw_result, setter=set_doc_raw_result)
+
+
+class DeadlineExceeded(TimeoutError):
+    '''The document has not been annotated within the `deadline` of the component'''
+
+
+# marks the worker threads of EntityLinker.executor
+_worker_thread = threading.local()
+
+
+def _init_worker_thread():
+    _worker_thread.active = True
+
+
+# the EntityLinker instances of this process, to reset their state in the child processes after a fork
+_instances = weakref.WeakSet()
+
+# the parameters of the EntityFilter of the component, and its value after one of them has been changed
+_FILTER_ATTRIBUTES = frozenset(['process', 'filter_types', 'exclude_types', 'min_similarity_score', 'min_support',
+                                'type_labels'])
+_STALE_FILTER = object()
+
+
+def _reset_after_fork():
+    for linker in list(_instances):
+        linker._init_state()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
 
 @Language.factory('dbpedia_spotlight', default_config={
@@ -28,15 +71,54 @@ Doc.set_extension("dbpedia_raw_result", default=None)
     'policy': None,
     'span_group': 'dbpedia_spotlight',
     'overwrite_ents': True,
+    'filter_types': None,
+    'exclude_types': None,
+    'min_similarity_score': None,
+    'min_support': None,
+    'type_labels': None,
+    'compact_raw_results': False,
+    'backend': 'remote',
+    'local_index_path': None,
     'raise_http_errors': True,
     'verify_ssl': True,
+    'pool_connections': 10,
+    'pool_maxsize': None,
+    'pool_block': False,
+    'keep_alive': True,
+    'max_concurrency': 16,
+    'max_inflight_docs': None,
+    'max_inflight_bytes': None,
+    'concurrency_budget': None,
+    'max_chunk_chars': None,
+    'chunk_overlap': 0,
+    'pack_max_chars': None,
+    'pack_separator': '\n\n',
+    'endpoint_selection': 'round_robin',
+    'endpoint_max_failures': 3,
+    'endpoint_ejection_time': 30,
+    'hedge_after_percentile': None,
+    'hedge_budget': 0.05,
+    'connect_timeout': 10,
+    'read_timeout': 120,
+    'deadline': None,
+    'max_retries': 0,
+    'backoff_factor': 0.5,
+    'backoff_max': 60,
+    'rate_limit': None,
+    'rate_limit_burst': None,
+    'memory_cache_size': 0,
+    'cache_path': None,
+    'cache_max_entries': None,
+    'cache_max_bytes': None,
+    'cache_ttl': None,
+    'collect_stats': False,
     'debug': False
 })
-def dbpedia_spotlight_factory(nlp, name, language_code, dbpedia_rest_endpoint, process, confidence, support, types, sparql, policy, span_group, overwrite_ents, raise_http_errors, verify_ssl, debug):
+def dbpedia_spotlight_factory(nlp, name, language_code, dbpedia_rest_endpoint, process, confidence, support, types, sparql, policy, span_group, overwrite_ents, filter_types, exclude_types, min_similarity_score, min_support, type_labels, compact_raw_results, backend, local_index_path, raise_http_errors, verify_ssl, pool_connections, pool_maxsize, pool_block, keep_alive, max_concurrency, max_inflight_docs, max_inflight_bytes, concurrency_budget, max_chunk_chars, chunk_overlap, pack_max_chars, pack_separator, endpoint_selection, endpoint_max_failures, endpoint_ejection_time, hedge_after_percentile, hedge_budget, connect_timeout, read_timeout, deadline, max_retries, backoff_factor, backoff_max, rate_limit, rate_limit_burst, memory_cache_size, cache_path, cache_max_entries, cache_max_bytes, cache_ttl, collect_stats, debug):
     '''Factory of the pipeline stage `dbpedia_spotlight`.
     Parameters:
     - `language_code`: which language to use for entity linking. Possible values are listed in EntityLinker.supported_languages. If the parameter is left as None, the language code is matched with the nlp object currently used.
-    - `dbpedia_rest_endpoint`: this needs to be configured if you want to use a different REST endpoint from the default `EntityLinker.base_url`. Example: `http://localhost:2222/rest` for a localhost server
+    - `dbpedia_rest_endpoint`: this needs to be configured if you want to use a different REST endpoint from the default `EntityLinker.base_url`. Example: `http://localhost:2222/rest` for a localhost server. It can also be a list of endpoints (replicas of the same model), to distribute the requests among them
     - `process`: (REST API path) which of the processes to use from DBpedia Spotlight (see https://www.dbpedia-spotlight.org/api). The value can be 'annotate', 'spot' or 'candidates'
     - `confidence`: (REST API parameter) confidence score for disambiguation / linking
     - `support`: (REST API parameter) how prominent is this entity in Lucene Model, i.e. number of inlinks in Wikipedia
@@ -45,25 +127,82 @@ def dbpedia_spotlight_factory(nlp, name, language_code, dbpedia_rest_endpoint, p
     - `policy`: (REST API parameter) (whitelist) select all entities that have the same type; (blacklist) - select all entities that have not the same type.
     - `span_group`: which span group to write the entities to. By default the value is `dbpedia_spotlight` which writes to `doc.spans['dbpedia_spotlight']`
     - `overwrite_ents`: if set to False, it won't overwrite `doc.ents` in cases of overlapping spans with current entities, and only produce the results in `doc.spans[span_group]. If it is True, it will move the entities from doc.ents into `doc.spans['ents_original']`
+    - `filter_types`: (client-side) keep only the entities with at least one of these types, e.g. `['DBpedia:Place', 'DBpedia:Person']` (or a string of comma-separated types). The filters are applied to the response before the spans are created, and only with the processes 'annotate' and 'candidates'. Default to None (no filter).
+    - `exclude_types`: (client-side) reject the entities with any of these types. Default to None.
+    - `min_similarity_score`: (client-side) reject the entities with a lower `@similarityScore` (`@finalScore` for the process 'candidates'). Default to None.
+    - `min_support`: (client-side) reject the entities with a lower `@support`. Default to None.
+    - `type_labels`: list of [type, label] pairs, the label of the spans of the entities with that type, e.g. `[['DBpedia:Person', 'PERSON'], ['DBpedia:Place', 'LOC']]`. The first type of the list found in the `@types` of an entity gives its label, otherwise the label is `DBPEDIA_ENT`. Default to None (all the labels are `DBPEDIA_ENT`).
+    - `compact_raw_results`: if set to True, the raw results of DBpedia Spotlight are stored in columns (numpy arrays for the numeric fields) in `doc.user_data`, instead of a dict for the doc and one for each span. `doc._.dbpedia_raw_result` and `span._.dbpedia_raw_result` are then built when they are accessed. Default to False.
+    - `backend`: 'remote' to query the DBpedia Spotlight server, or 'local' to find the entities with the surface form index at `local_index_path`, without any HTTP request (only for the processes 'spot' and 'candidates'). Default to 'remote'.
+    - `local_index_path`: the index file of the 'local' backend, built from a DBpedia Spotlight model dump or a TSV file with `python -m spacy_dbpedia_spotlight build-index`. Default to None.
     - `raise_http_errors`: if set to True, it will raise the HTTPErrors generated by the dbpedia REST API. If False instead, HTTPErrors will be ignored. Default to True.
     - `verify_ssl`: if set to False, it will not verify SSL certificates (strongly discouraged). Default to True for verification.
-    - `debug`: prints several debug information to stdout
+    - `pool_connections`: number of per-host connection pools to keep (one for each distinct endpoint host). Default to 10.
+    - `pool_maxsize`: maximum number of connections kept open to a single host. Default to None, which uses the value of `max_concurrency`.
+    - `pool_block`: if set to True, requests wait for a free connection when `pool_maxsize` connections to a host are busy, instead of opening extra ones that are discarded afterwards. Default to False.
+    - `keep_alive`: if set to False, every request asks the server to close the connection (no connection reuse). Default to True.
+    - `max_concurrency`: maximum number of concurrent requests made by `nlp.pipe`, independently of its `batch_size`. Default to 16.
+    - `max_inflight_docs`: maximum number of documents read ahead from the stream by `nlp.pipe` and waiting for their response (also limited by the `batch_size` of `nlp.pipe`). Default to None (only `batch_size`).
+    - `max_inflight_bytes`: maximum total size (UTF-8 bytes of the texts) of the documents read ahead from the stream by `nlp.pipe`. When it is reached, no more documents are read from the stream until the oldest ones are yielded. Default to None (no limit).
+    - `concurrency_budget`: if set, the maximum number of concurrent requests of all the processes of `nlp.pipe(texts, n_process=...)` together, shared through a semaphore created with the component. Default to None (each process makes up to `max_concurrency` requests).
+    - `max_chunk_chars`: if set, the documents longer than this number of characters are split in chunks (on sentence, line or token boundaries) that are annotated concurrently, and the entities are merged back with the offsets of the whole document. Default to None (no splitting).
+    - `chunk_overlap`: number of characters shared by consecutive chunks, so that the entities on the boundary between two chunks are found. Duplicated entities are removed. Default to 0.
+    - `pack_max_chars`: if set, `nlp.pipe` joins consecutive short documents (separated by `pack_separator`) in a single request of at most this number of characters, and splits the entities back to each document. Default to None (one request per document).
+    - `pack_separator`: the text between the documents joined by `pack_max_chars`, it should prevent DBpedia Spotlight from finding entities across two documents. Default to two line breaks.
+    - `endpoint_selection`: how to choose the endpoint of each request when `dbpedia_rest_endpoint` is a list: 'round_robin' or 'least_outstanding' (the one with fewer requests in flight). Default to 'round_robin'.
+    - `endpoint_max_failures`: number of consecutive failures (connection errors, timeouts, temporary error statuses) after which an endpoint is not used for `endpoint_ejection_time` seconds. The failed requests are sent again to another endpoint. Default to 3.
+    - `endpoint_ejection_time`: number of seconds an endpoint is not used after `endpoint_max_failures` consecutive failures. Default to 30.
+    - `hedge_after_percentile`: if set (e.g. 95), a request that has not completed after this percentile of the latencies of the recent requests is sent again (to another endpoint, if `dbpedia_rest_endpoint` is a list), and the first response is used. This cuts the tail latency, e.g. of `nlp.pipe` that yields the documents in order. Default to None (no hedged requests).
+    - `hedge_budget`: maximum number of hedged requests, as a fraction of the requests. Default to 0.05 (at most 5% more requests).
+    - `connect_timeout`: seconds to wait for the connection to the server. Default to 10. None waits forever.
+    - `read_timeout`: seconds to wait for the server to send data, after the connection. Default to 120. None waits forever.
+    - `deadline`: maximum number of seconds to annotate each document, including retries, waiting for a free worker in `nlp.pipe` and all the chunks of long documents. When it expires, the behaviour depends on `raise_http_errors`: a DeadlineExceeded error is raised, or the document is not updated. Default to None (no deadline).
+    - `max_retries`: number of times a request is retried after a connection error, a timeout or an error status that can be temporary (429, 500, 502, 503, 504). Default to 0 (no retries).
+    - `backoff_factor`: the wait before the retry number `n` (starting from 0) is a random time between 0 and `backoff_factor * 2 ** n` seconds, unless the server asks for a specific time with a `Retry-After` header. Default to 0.5.
+    - `backoff_max`: maximum number of seconds to wait before a retry. Default to 60.
+    - `rate_limit`: maximum average number of requests per second, shared by all the threads and asyncio tasks of the component. Default to None (no limit).
+    - `rate_limit_burst`: number of requests that can be sent at once when the component has been idle, with `rate_limit`. Default to None (the value of `rate_limit`, at least 1).
+    - `memory_cache_size`: number of responses kept in an in-memory LRU cache, in front of the persistent cache. Default to 0 (disabled).
+    - `cache_path`: path of a SQLite file where the responses are cached, keyed by the text, the endpoint, the process and the REST API parameters. Default to None (no cache).
+    - `cache_max_entries`: maximum number of responses in the cache, the least recently used are evicted. Default to None (no limit).
+    - `cache_max_bytes`: maximum total size (compressed) of the responses in the cache, the least recently used are evicted. Default to None (no limit).
+    - `cache_ttl`: number of seconds after which a cached response expires. Default to None (never expires).
+    - `collect_stats`: if set to True, the component collects timings (HTTP requests, queueing in `nlp.pipe`, JSON parsing, span alignment) and counters (requests, errors, retries, cache hits, bytes, entities) in `EntityLinker.stats`. Default to False.
+    - `debug`: logs several debug information with loguru (the sinks and levels are left to the application)
     '''
-    logger.remove()
     if debug:
-        logger.add(sys.stdout, level="DEBUG")
-    else:
-        logger.add(sys.stdout, level="INFO")
-    logger.debug(f'dbpedia_spotlight_factory: {nlp}, language_code: {language_code}, dbpedia_rest_endpoint: {dbpedia_rest_endpoint}, '
-                 f'process: {process}, confidence: {confidence}, support: {support}, types: {types}, '
-                 f'sparql: {sparql}, policy: {policy}, overwrite_ents: {overwrite_ents}, raise_http_errors: {raise_http_errors}, verify_ssl: {verify_ssl}')
+        logger.debug(f'dbpedia_spotlight_factory: {nlp}, language_code: {language_code}, dbpedia_rest_endpoint: {dbpedia_rest_endpoint}, '
+                     f'process: {process}, confidence: {confidence}, support: {support}, types: {types}, '
+                     f'sparql: {sparql}, policy: {policy}, overwrite_ents: {overwrite_ents}, filter_types: {filter_types}, exclude_types: {exclude_types}, min_similarity_score: {min_similarity_score}, min_support: {min_support}, type_labels: {type_labels}, compact_raw_results: {compact_raw_results}, backend: {backend}, local_index_path: {local_index_path}, raise_http_errors: {raise_http_errors}, verify_ssl: {verify_ssl}, '
+                     f'pool_connections: {pool_connections}, pool_maxsize: {pool_maxsize}, pool_block: {pool_block}, keep_alive: {keep_alive}, '
+                     f'max_concurrency: {max_concurrency}, max_inflight_docs: {max_inflight_docs}, max_inflight_bytes: {max_inflight_bytes}, concurrency_budget: {concurrency_budget}, max_chunk_chars: {max_chunk_chars}, chunk_overlap: {chunk_overlap}, '
+                     f'pack_max_chars: {pack_max_chars}, pack_separator: {pack_separator!r}, '
+                     f'endpoint_selection: {endpoint_selection}, endpoint_max_failures: {endpoint_max_failures}, '
+                     f'endpoint_ejection_time: {endpoint_ejection_time}, hedge_after_percentile: {hedge_after_percentile}, hedge_budget: {hedge_budget}, connect_timeout: {connect_timeout}, '
+                     f'read_timeout: {read_timeout}, deadline: {deadline}, max_retries: {max_retries}, backoff_factor: {backoff_factor}, backoff_max: {backoff_max}, '
+                     f'rate_limit: {rate_limit}, rate_limit_burst: {rate_limit_burst}, memory_cache_size: {memory_cache_size}, cache_path: {cache_path}, cache_max_entries: {cache_max_entries}, '
+                     f'cache_max_bytes: {cache_max_bytes}, cache_ttl: {cache_ttl}, collect_stats: {collect_stats}')
     # take the language code from the nlp object
     nlp_lang_code = nlp.meta['lang']
-    logger.debug(f'nlp.meta["lang"]={nlp_lang_code}')
+    if debug:
+        logger.debug(f'nlp.meta["lang"]={nlp_lang_code}')
     # language_code can override the language code from the nlp object
     if not language_code:
         language_code = nlp_lang_code
-    return EntityLinker(language_code, dbpedia_rest_endpoint, process, confidence, support, types, sparql, policy, span_group, overwrite_ents, raise_http_errors, verify_ssl, debug)
+    return EntityLinker(language_code, dbpedia_rest_endpoint, process, confidence, support, types, sparql, policy, span_group, overwrite_ents, raise_http_errors, verify_ssl, debug,
+                        pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block, keep_alive=keep_alive,
+                        max_concurrency=max_concurrency, max_inflight_docs=max_inflight_docs,
+                        max_inflight_bytes=max_inflight_bytes, concurrency_budget=concurrency_budget, max_chunk_chars=max_chunk_chars, chunk_overlap=chunk_overlap,
+                        pack_max_chars=pack_max_chars, pack_separator=pack_separator,
+                        endpoint_selection=endpoint_selection, endpoint_max_failures=endpoint_max_failures,
+                        endpoint_ejection_time=endpoint_ejection_time, hedge_after_percentile=hedge_after_percentile,
+                        hedge_budget=hedge_budget, connect_timeout=connect_timeout,
+                        read_timeout=read_timeout, deadline=deadline, max_retries=max_retries, backoff_factor=backoff_factor, backoff_max=backoff_max,
+                        rate_limit=rate_limit, rate_limit_burst=rate_limit_burst, memory_cache_size=memory_cache_size, cache_path=cache_path, cache_max_entries=cache_max_entries,
+                        cache_max_bytes=cache_max_bytes, cache_ttl=cache_ttl, compact_raw_results=compact_raw_results,
+                        backend=backend, local_index_path=local_index_path, filter_types=filter_types, exclude_types=exclude_types,
+                        min_similarity_score=min_similarity_score, min_support=min_support, type_labels=type_labels,
+                        collect_stats=collect_stats)
 
 
 class EntityLinker(object):
@@ -75,11 +214,31 @@ class EntityLinker(object):
                            'de', 'hu', 'it', 'pt', 'ro', 'ru', 'es', 'sv', 'tr']
     # list of supported processes
     supported_processes = ['annotate', 'spot', 'candidates']
+    # list of supported backends, and the processes available with the local one
+    supported_backends = ['remote', 'local']
+    local_processes = ['spot', 'candidates']
 
     def __init__(self, language_code='en', dbpedia_rest_endpoint=None, process='annotate', confidence=None, support=None,
-                 types=None, sparql=None, policy=None, span_group='dbpedia_spotlight', overwrite_ents=True, raise_http_errors=True, verify_ssl=True, debug=False):
+                 types=None, sparql=None, policy=None, span_group='dbpedia_spotlight', overwrite_ents=True, raise_http_errors=True, verify_ssl=True, debug=False,
+                 pool_connections=10, pool_maxsize=None, pool_block=False, keep_alive=True, max_concurrency=16, concurrency_budget=None,
+                 max_inflight_docs=None, max_inflight_bytes=None,
+                 max_chunk_chars=None, chunk_overlap=0, pack_max_chars=None, pack_separator='\n\n',
+                 endpoint_selection='round_robin', endpoint_max_failures=3, endpoint_ejection_time=30,
+                 hedge_after_percentile=None, hedge_budget=0.05,
+                 connect_timeout=10, read_timeout=120, deadline=None, max_retries=0, backoff_factor=0.5, backoff_max=60, rate_limit=None, rate_limit_burst=None, memory_cache_size=0, cache_path=None, cache_max_entries=None, cache_max_bytes=None, cache_ttl=None, compact_raw_results=False, collect_stats=False,
+                 backend='remote', local_index_path=None, filter_types=None, exclude_types=None, min_similarity_score=None,
+                 min_support=None, type_labels=None):
         # constructor of the pipeline stage
-        if dbpedia_rest_endpoint is None and language_code not in self.supported_languages:
+        if backend not in self.supported_backends:
+            raise ValueError(
+                f'The backend {backend} is not supported. Choose one of {self.supported_backends}')
+        if backend == 'local':
+            if process not in self.local_processes:
+                raise ValueError(
+                    f'The process {process} is not supported by the local backend. Choose one of {self.local_processes}')
+            if not local_index_path:
+                raise ValueError('The local backend requires local_index_path')
+        elif dbpedia_rest_endpoint is None and language_code not in self.supported_languages:
             raise ValueError(
                 f'Linker not available in {language_code}. Choose one of {self.supported_languages}')
         self.language_code = language_code
@@ -87,6 +246,15 @@ class EntityLinker(object):
             raise ValueError(
                 f'The process {process} is not supported. Choose one of {self.supported_processes}')
         self.process = process
+        # also validates the types and the type labels
+        filter_config = get_filter_config(process, filter_types, exclude_types, min_similarity_score, min_support,
+                                          type_labels)
+        if process not in SCORE_FIELDS and filter_config is not None:
+            raise ValueError(
+                f'The entity filters are not available with the process {process}. Choose one of {list(SCORE_FIELDS)}')
+        if endpoint_selection not in SELECTION_STRATEGIES:
+            raise ValueError(
+                f'The endpoint selection {endpoint_selection} is not supported. Choose one of {SELECTION_STRATEGIES}')
         self.confidence = confidence
         self.support = support
         self.types = types
@@ -94,10 +262,310 @@ class EntityLinker(object):
         self.policy = policy
         self.span_group = span_group
         self.overwrite_ents = overwrite_ents
+        self.filter_types = filter_types
+        self.exclude_types = exclude_types
+        self.min_similarity_score = min_similarity_score
+        self.min_support = min_support
+        self.type_labels = type_labels
+        self.compact_raw_results = compact_raw_results
+        self.backend = backend
+        self.local_index_path = local_index_path
         self.raise_http_errors = raise_http_errors
         self.verify_ssl = verify_ssl
         self.debug = debug
         self.dbpedia_rest_endpoint = dbpedia_rest_endpoint
+        if debug:
+            # once here, get_endpoints is called for each request
+            source = 'manually set' if dbpedia_rest_endpoint else 'built for the language'
+            logger.debug(f'api_endpoint has been {source}: {self.get_endpoints()}')
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.max_concurrency = max_concurrency
+        self.concurrency_budget = concurrency_budget
+        self.max_inflight_docs = max_inflight_docs
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_chunk_chars = max_chunk_chars
+        self.chunk_overlap = chunk_overlap
+        self.pack_max_chars = pack_max_chars
+        self.pack_separator = pack_separator
+        self.endpoint_selection = endpoint_selection
+        self.endpoint_max_failures = endpoint_max_failures
+        self.endpoint_ejection_time = endpoint_ejection_time
+        self.hedge_after_percentile = hedge_after_percentile
+        self.hedge_budget = hedge_budget
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.rate_limit = rate_limit
+        self.rate_limit_burst = rate_limit_burst
+        self.memory_cache_size = memory_cache_size
+        self.cache_path = cache_path
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_ttl = cache_ttl
+        self.collect_stats = collect_stats
+        self._stats_callback = None
+        # shared by the processes started after the creation of the component (e.g. nlp.pipe with n_process)
+        self._budget = multiprocessing.BoundedSemaphore(concurrency_budget) if concurrency_budget else None
+        self._init_state()
+        _instances.add(self)
+
+    def _init_state(self):
+        # the objects that belong to a single process: they are created on first use in each process, and are not pickled
+        # the connection pool is shared by all the threads, each thread has its own requests.Session on top of it
+        self._adapter = None
+        self._local = threading.local()
+        # the worker threads used by pipe, created on first use
+        self._executor = None
+        # the filters of the entities, compiled again after a change of their parameters
+        self._entity_filter = self._make_entity_filter()
+        # the threads sending the hedged requests and their latency statistics, created on first use
+        self._hedge_executor = None
+        self._hedger = None
+        # the client-side rate limiter, created on first use
+        self._rate_limiter = None
+        # the health of the endpoints, created on first use and when the endpoints change
+        self._endpoint_pool = None
+        # the persistent cache of the responses, opened on first use
+        self._cache = None
+        self._memory_cache = None
+        # the memory-mapped index of the local backend, opened on first use
+        self._local_index = None
+        # cache key -> Future of the request in flight, to share its response with identical requests
+        self._inflight = {}
+        self._lock = threading.Lock()
+        # asyncio event loop -> _AsyncState, created on first use in each loop
+        self._async_state = weakref.WeakKeyDictionary()
+        # the metrics of this process
+        self._stats = LinkerStats(self._stats_callback) if self.collect_stats or self._stats_callback else None
+
+    def __getstate__(self):
+        state = {k: v for k, v in self.__dict__.items() if not k.startswith('_')}
+        if multiprocessing.context.get_spawning_popen() is not None:
+            # the semaphore can only be shared with the processes being started
+            state['_budget'] = self._budget
+        return state
+
+    def __setstate__(self, state):
+        budget = state.pop('_budget', None)
+        self.__dict__.update(state)
+        # the callback is not pickled, it is set again in each process if needed
+        self._stats_callback = None
+        if budget is None and self.concurrency_budget:
+            budget = multiprocessing.BoundedSemaphore(self.concurrency_budget)
+        self._budget = budget
+        self._init_state()
+        _instances.add(self)
+
+    @property
+    def stats(self) -> LinkerStats:
+        """
+        The metrics collected by the component in this process (see LinkerStats), or None if `collect_stats` is False
+        and there is no `stats_callback`
+        """
+        return self._stats
+
+    @property
+    def stats_callback(self):
+        """
+        A function called with (name, value) for each metric recorded in `stats`, to send them to another metrics system.
+        Setting it also enables the collection of the metrics.
+        """
+        return self._stats_callback
+
+    @stats_callback.setter
+    def stats_callback(self, callback):
+        self._stats_callback = callback
+        if self._stats is None and callback is not None:
+            self._stats = LinkerStats()
+        if self._stats is not None:
+            self._stats.callback = callback
+
+    @property
+    def session(self) -> 'requests.Session':
+        """
+        The requests.Session of the current thread. All the sessions share the same pool of keep-alive connections,
+        which is created on first use with the `pool_*` settings of the component.
+        """
+        import requests
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            with self._lock:
+                if self._adapter is None:
+                    self._adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_connections,
+                                                                  pool_maxsize=self.pool_maxsize or self.max_concurrency,
+                                                                  pool_block=self.pool_block)
+                adapter = self._adapter
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            self._local.session = session
+        return session
+
+    @property
+    def executor(self) -> 'concurrent.futures.ThreadPoolExecutor':
+        """
+        The pool of `max_concurrency` worker threads that perform the requests of `pipe`, created on first use
+        and kept for the whole life of the component.
+        """
+        import concurrent.futures
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix='dbpedia_spotlight',
+                    initializer=_init_worker_thread)
+            return self._executor
+
+    @property
+    def cache(self) -> ResponseCache:
+        """
+        The persistent cache of the responses (with the `hits` and `misses` counters), or None if `cache_path` is not set
+        """
+        if not self.cache_path:
+            return None
+        with self._lock:
+            if self._cache is None:
+                self._cache = ResponseCache(self.cache_path, max_entries=self.cache_max_entries,
+                                            max_bytes=self.cache_max_bytes, ttl=self.cache_ttl)
+            return self._cache
+
+    @property
+    def endpoint_pool(self) -> EndpointPool:
+        """
+        Chooses the endpoint of each request and keeps track of the health of the endpoints (see `EndpointPool.status`)
+        """
+        endpoints = self.get_endpoints()
+        with self._lock:
+            # the endpoints can be changed after the creation of the component (e.g. the language_code)
+            if self._endpoint_pool is None or self._endpoint_pool.endpoints != endpoints:
+                self._endpoint_pool = EndpointPool(endpoints, self.endpoint_selection,
+                                                   self.endpoint_max_failures, self.endpoint_ejection_time)
+            return self._endpoint_pool
+
+    @property
+    def rate_limiter(self) -> TokenBucket:
+        """
+        The rate limiter shared by all the requests, or None if `rate_limit` is not set
+        """
+        if not self.rate_limit:
+            return None
+        with self._lock:
+            if self._rate_limiter is None:
+                self._rate_limiter = TokenBucket(self.rate_limit, self.rate_limit_burst)
+            return self._rate_limiter
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in _FILTER_ATTRIBUTES:
+            # the parameters of the filters can be changed after the creation of the component
+            super().__setattr__('_entity_filter', _STALE_FILTER)
+
+    @property
+    def entity_filter(self) -> EntityFilter:
+        """
+        The client-side filters and labels of the entities (`filter_types`, `exclude_types`, `min_similarity_score`,
+        `min_support` and `type_labels`), or None if none of them is set
+        """
+        entity_filter = self._entity_filter
+        if entity_filter is _STALE_FILTER:
+            with self._lock:
+                if self._entity_filter is _STALE_FILTER:
+                    self._entity_filter = self._make_entity_filter()
+                entity_filter = self._entity_filter
+        return entity_filter
+
+    def _make_entity_filter(self) -> EntityFilter:
+        if get_filter_config(self.process, self.filter_types, self.exclude_types, self.min_similarity_score,
+                             self.min_support, self.type_labels) is None:
+            return None
+        return EntityFilter(self.process, self.filter_types, self.exclude_types, self.min_similarity_score,
+                            self.min_support, self.type_labels)
+
+    @property
+    def hedger(self) -> Hedger:
+        """
+        The recent latencies and the budget of the hedged requests, or None if `hedge_after_percentile` is not set
+        """
+        if not self.hedge_after_percentile:
+            return None
+        with self._lock:
+            if self._hedger is None:
+                self._hedger = Hedger(self.hedge_after_percentile, self.hedge_budget)
+            return self._hedger
+
+    @property
+    def hedge_executor(self) -> 'concurrent.futures.ThreadPoolExecutor':
+        """
+        The threads performing the requests that can be hedged and their duplicates, created on first use
+        """
+        import concurrent.futures
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=2 * self.max_concurrency, thread_name_prefix='dbpedia-spotlight-hedge')
+            return self._hedge_executor
+
+    @property
+    def memory_cache(self) -> MemoryCache:
+        """
+        The in-memory LRU cache of the responses (with the `hits` and `misses` counters), or None if `memory_cache_size` is 0
+        """
+        if not self.memory_cache_size:
+            return None
+        with self._lock:
+            if self._memory_cache is None:
+                self._memory_cache = MemoryCache(self.memory_cache_size)
+            return self._memory_cache
+
+    @property
+    def local_index(self) -> SurfaceFormIndex:
+        """
+        The surface form index of the local backend, or None if the backend is 'remote'
+        """
+        if self.backend != 'local':
+            return None
+        with self._lock:
+            if self._local_index is None:
+                self._local_index = SurfaceFormIndex(self.local_index_path)
+            return self._local_index
+
+    def get_cache_key(self, text: str) -> str:
+        """
+        Returns the key identifying the response for the text with the current endpoint, process and REST API parameters
+        """
+        return make_cache_key(self.get_endpoints(), self.process, text, self.confidence, self.support,
+                              self.types, self.sparql, self.policy)
+
+    def close(self):
+        """
+        Closes the pooled connections, the cache file and stops the worker threads.
+        The component can still be used afterwards, they will be created again.
+        """
+        with self._lock:
+            adapter, self._adapter = self._adapter, None
+            executor, self._executor = self._executor, None
+            hedge_executor, self._hedge_executor = self._hedge_executor, None
+            cache, self._cache = self._cache, None
+            local_index, self._local_index = self._local_index, None
+        self._local = threading.local()
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if hedge_executor is not None:
+            # without waiting for the requests that lost the race
+            hedge_executor.shutdown(wait=False)
+        if adapter is not None:
+            adapter.close()
+        if cache is not None:
+            cache.close()
+        if local_index is not None:
+            local_index.close()
 
     def process_single_doc_after_call(self, doc: Doc, data) -> Doc:
         """
@@ -108,70 +576,84 @@ class EntityLinker(object):
         :param data: The JSON data from the server
         :return: The return value is a Doc object.
         """
+        stats = self._stats
+        if stats is None:
+            return self._add_entities(doc, data)
+        start = time.perf_counter()
+        self._add_entities(doc, data)
+        stats.observe('align', time.perf_counter() - start)
+        n_entities = len(doc.spans[self.span_group]) if data and self.span_group in doc.spans else 0
+        stats.increment('docs')
+        stats.increment('entities', n_entities)
+        stats.observe('entities_per_doc', n_entities)
+        return doc
 
+    def _add_entities(self, doc: Doc, data) -> Doc:
         if not data:
-            logger.log('DEBUG', 'No data returned from DBpedia Spotlight')
+            if self.debug:
+                logger.debug('No data returned from DBpedia Spotlight')
             return doc
 
-        doc._.dbpedia_raw_result = data
+        if not self.compact_raw_results:
+            doc._.dbpedia_raw_result = data
 
         ents_data = []
+        # the bounds of the span of each entity, for the compact raw results
+        span_bounds = []
         # fields have different names depending on the process
-        text_key = '@name'
+        text_key = get_surface_form_key(self.process)
         def get_uri(el): return None
-        # get_offset
         if self.process == 'annotate':
-            def get_ents_list(json): return json.get('Resources', [])
-            text_key = '@surfaceForm'
             def get_uri(el): return el['@URI']
-        elif self.process == 'spot':
-            def get_ents_list(json): return json.get(
-                'annotation', {}).get('surfaceForm', [])
         elif self.process == 'candidates':
-            def get_ents_list(json):
-                surface_form = json.get(
-                    'annotation', {}).get('surfaceForm', [])
-                if isinstance(surface_form, dict):
-                    # if only one candidate
-                    surface_form = [surface_form]
-                return surface_form
-
             def get_uri(
                 el): return f"http://dbpedia.org/resource/{el['resource']['@uri']}"
 
-        for ent in get_ents_list(data):
-            logger.debug(ent)
-            start_ch = int(ent['@offset'])
-            end_ch = int(start_ch + len(ent[text_key]))
+        entity_filter = self.entity_filter
+        label = DEFAULT_LABEL
+        # built once per doc, to find the tokens of each entity with a binary search
+        token_index = TokenIndex(doc)
+        # the offsets of DBpedia Spotlight are in UTF-16 code units of the text of the request
+        offset_index = Utf16Index(get_response_text(self.process, data) or doc.text)
+        for ent in get_response_entities(self.process, data):
+            if entity_filter is not None:
+                label = entity_filter.get_label(ent)
+                if label is None:
+                    # rejected: no span
+                    span_bounds.append(None)
+                    continue
+            start_ch = offset_index.get_char_offset(int(ent['@offset']))
+            end_ch = start_ch + len(ent[text_key])
+            # the entity can be only part of a SpaCy token (e.g. "something@bbc.co.uk"): the span is then expanded
+            # to the whole tokens
+            bounds = token_index.get_token_bounds(start_ch, end_ch)
+            span_bounds.append(bounds)
+            if bounds is None:
+                if self.debug:
+                    logger.debug(f'Entity outside of the tokens of the document: {ent}')
+                continue
             ent_kb_id = get_uri(ent)
-            # TODO look at '@types' and choose most relevant?
+            # the label can be chosen from the '@types' with type_labels
             if ent_kb_id:
-                span = doc.char_span(
-                    start_ch, end_ch, 'DBPEDIA_ENT', ent_kb_id)
+                span = Span(doc, *bounds, label=label, kb_id=ent_kb_id)
+            else:
+                span = Span(doc, *bounds, label=label)
+            if self.compact_raw_results:
+                span_bounds[-1] = (span.start_char, span.end_char)
             else:
-                span = doc.char_span(start_ch, end_ch, 'DBPEDIA_ENT')
-            if not span:
-                # something strange like "something@bbc.co.uk" where the match is only part of a SpaCy token
-                # 1. find the token to split
-                logger.debug(f'{start_ch}, {end_ch}, {ent}')
-                # tokens also wider than start_ch, end_ch
-                tokens_to_split = [t for t in doc if t.idx >=
-                                   start_ch or t.idx+len(t) <= end_ch]
-                span = doc.char_span(min(t.idx for t in tokens_to_split), max(
-                    t.idx + len(t) for t in tokens_to_split))
-                # with doc.retokenize() as retokenizer:
-                #     for t in tokens_to_split:
-                #         retokenizer.split(t, ['a', 't'], [t.head, t.head])
-                # raise ValueError()
-            span._.dbpedia_raw_result = ent
+                span._.dbpedia_raw_result = ent
             ents_data.append(span)
+        if self.compact_raw_results:
+            doc.user_data[COMPACT_KEY] = compact_response(self.process, doc.text, data, span_bounds)
 
         # try to add results to doc.ents
         try:
             doc.ents = list(doc.ents) + ents_data
-            logger.debug('The entities are in doc.ents')
+            if self.debug:
+                logger.debug('The entities are in doc.ents')
         except Exception as e:
-            logger.debug(str(e))
+            if self.debug:
+                logger.debug(str(e))
             if self.overwrite_ents:
                 # overwrite ok
                 doc.spans['ents_original'] = doc.ents
@@ -179,34 +661,64 @@ class EntityLinker(object):
                     doc.ents = ents_data
                 except ValueError:  # if there are overlapping spans in the dbpedia_spotlight entities
                     doc.ents = spacy.util.filter_spans(ents_data)
-                logger.debug(
-                    'doc.ents has been overwritten. The original entities are in doc.spans["ents_original"]')
+                if self.debug:
+                    logger.debug(
+                        'doc.ents has been overwritten. The original entities are in doc.spans["ents_original"]')
             else:
                 # don't overwrite
-                logger.debug(
-                    'doc.ents not overwritten. You can find the dbpedia ents in doc.spans["dbpedia_spotlight"]')
+                if self.debug:
+                    logger.debug(
+                        'doc.ents not overwritten. You can find the dbpedia ents in doc.spans["dbpedia_spotlight"]')
         # doc.spans['dbpedia_raw_result'] = data
         doc.spans[self.span_group] = ents_data
         return doc
 
-    def make_request(self, doc: Doc):
+    def make_request(self, doc, endpoint=None, timeout=None):
         """
-        It takes a Doc object as input, and returns a response object from the DBpedia Spotlight API
+        It takes a Doc object (or a text) as input, and returns a response object from the DBpedia Spotlight API
 
         :param doc: the text to be annotated
-        :type doc: Doc
+        :type doc: Doc or str
+        :param endpoint: the endpoint to use, by default the first one (see get_endpoints)
+        :param timeout: the (connect, read) timeouts, by default `connect_timeout` and `read_timeout`
         :return: The response as a requests.Response instance.
         """
+        text = doc if isinstance(doc, str) else doc.text
+        if endpoint is None:
+            endpoint = self.get_endpoint()
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        # TODO: application/ld+json would be more detailed? https://github.com/digitalbazaar/pyld
+        return self.session.post(
+            f'{endpoint}/{self.process}', headers={'accept': 'application/json'}, verify=self.verify_ssl,
+            data=self.get_request_params(text), timeout=timeout)
+
+    def get_endpoints(self) -> list:
+        """
+        Returns the list of base URLs of the REST API to use, without the process path (e.g. ['http://localhost:2222/rest'])
+        """
         if self.dbpedia_rest_endpoint:
             # override the default endpoint, e.g., 'http://localhost:2222/rest'
-            endpoint = self.dbpedia_rest_endpoint
-            logger.debug(f'api_endpoint has been manually set to {endpoint}')
+            endpoints = self.dbpedia_rest_endpoint
+            if isinstance(endpoints, str):
+                endpoints = [endpoints]
         else:
             # use the default endpoint for the language selected
-            endpoint = f'{self.base_url}/{self.language_code}'
-            logger.debug(f'api_endpoint has been built as {endpoint}')
+            endpoints = [f'{self.base_url}/{self.language_code}']
+        return list(endpoints)
+
+    def get_endpoint(self) -> str:
+        """
+        Returns the base URL of the REST API to use, without the process path (e.g. 'http://localhost:2222/rest').
+        If several endpoints are configured, this is the first one.
+        """
+        return self.get_endpoints()[0]
 
-        params = {'text': doc.text}
+    def get_request_params(self, text: str) -> dict:
+        """
+        Returns the form parameters of the request for the text, with the REST API parameters that have been set
+        """
+        params = {'text': text}
         if self.confidence != None:
             params['confidence'] = self.confidence
         if self.support != None:
@@ -217,46 +729,406 @@ class EntityLinker(object):
             params['sparql'] = self.sparql
         if self.policy != None:
             params['policy'] = self.policy
+        return params
 
-        # TODO: application/ld+json would be more detailed? https://github.com/digitalbazaar/pyld
-        return requests.post(
-            f'{endpoint}/{self.process}', headers={'accept': 'application/json'}, verify=self.verify_ssl, data=params)
+    def get_chunks(self, doc: Doc) -> list:
+        """
+        Returns the list of (start_char, end_char) of the chunks that are sent separately to DBpedia Spotlight:
+        a single chunk with the whole text, unless the document is longer than `max_chunk_chars`
+        """
+        if not self.max_chunk_chars or len(doc.text) <= self.max_chunk_chars:
+            return [(0, len(doc.text))]
+        return split_doc(doc, self.max_chunk_chars, self.chunk_overlap)
+
+    def get_deadline(self) -> float:
+        """
+        Returns the time (as time.monotonic) by which a document started now must be annotated, or None if there is no `deadline`
+        """
+        return time.monotonic() + self.deadline if self.deadline else None
+
+    def get_remote_response(self, doc: Doc, deadline: float = None):
+        """
+        Returns the JSON response of DBpedia Spotlight for the document (see get_text_response).
+        If the document is longer than `max_chunk_chars`, the chunks are annotated concurrently and their responses are
+        merged, as if the whole text was sent.
+
+        :param doc: the document to be annotated
+        :type doc: Doc
+        :param deadline: the time (as time.monotonic) by which the response is needed, by default `deadline` seconds from now
+        :return: the JSON response or None in case of error and self.raise_http_errors is False
+        """
+        if self.backend == 'local':
+            return self.get_local_response(doc)
+        if deadline is None:
+            deadline = self.get_deadline()
+        chunks = self.get_chunks(doc)
+        if len(chunks) == 1:
+            return self.get_text_response(doc.text, deadline)
+        results = self._get_texts_responses([doc.text[start:end] for start, end in chunks], deadline)
+        return merge_responses(self.process, doc.text, [
+            (data, 0, end - start, start) for data, (start, end) in zip(results, chunks)])
+
+    def _get_texts_responses(self, texts: list, deadline: float) -> list:
+        # the responses for several texts, requested concurrently
+        if len(texts) == 1 or getattr(_worker_thread, 'active', False):
+            # if already in a worker thread of pipe, waiting for other workers could block all of them
+            return [self.get_text_response(text, deadline) for text in texts]
+        executor = self.executor
+        futures = [self._submit_text(executor, text, deadline) for text in texts]
+        return [self._wait_response(future, deadline) for future in futures]
+
+    def reannotate(self, doc: Doc, previous, deadline: float = None) -> Doc:
+        """
+        Annotates a new version of a document already annotated, requesting only the paragraphs and sentences that
+        have changed: the entities of the unchanged regions are taken from the previous result, moved to their new offsets.
+        The changed regions are annotated without the rest of the document as context, as with `max_chunk_chars`.
+
+        :param doc: the new version of the document
+        :type doc: Doc
+        :param previous: the previous version of the document annotated by this component, or its raw result
+        (`doc._.dbpedia_raw_result`, e.g. from a cache). If it has no result, the whole document is annotated.
+        :param deadline: the time (as time.monotonic) by which the response is needed, by default `deadline` seconds from now
+        :return: the document with the entities, or not updated in case of error and self.raise_http_errors is False
+        """
+        old_text, old_data = self._get_previous_result(previous)
+        if old_data is None or self.backend == 'local':
+            return self(doc)
+        if deadline is None:
+            deadline = self.get_deadline()
+        reused, changed = self._diff_previous(old_text, old_data, doc.text)
+        results = self._get_texts_responses([doc.text[start:end] for start, end in changed], deadline) if changed else []
+        return self.process_single_doc_after_call(doc, self._merge_reannotation(doc.text, reused, changed, results))
+
+    def _get_previous_result(self, previous):
+        # the text and the raw result of the previous version of a document
+        if isinstance(previous, Doc):
+            return previous.text, previous._.dbpedia_raw_result
+        if previous is None:
+            return None, None
+        template = previous if self.process == 'annotate' else previous.get('annotation', {})
+        text = template.get('@text')
+        # without the text, the offsets of the entities can't be compared with the new version
+        return text, previous if text is not None else None
 
-    def get_remote_response(self, doc: Doc):
+    def _diff_previous(self, old_text: str, old_data, new_text: str):
+        # the parts of the previous response to keep, and the (start_char, end_char) of the regions to request
+        reused = []
+        changed = []
+        for old_start, old_end, new_start, new_end, equal in diff_texts(old_text, new_text):
+            if equal:
+                reused.append((old_data, old_start, old_end, new_start))
+            elif new_text[new_start:new_end].strip():
+                changed.append((new_start, new_end))
+        return reused, changed
+
+    def _merge_reannotation(self, text: str, reused: list, changed: list, results: list):
+        # None if a request has failed (ignored with raise_http_errors False): the document is not updated
+        return merge_responses(self.process, text, reused + [
+            (data, 0, end - start, start) for data, (start, end) in zip(results, changed)])
+
+    def get_local_response(self, doc: Doc):
+        """
+        Returns the response of the local backend for the document, in the same format of the DBpedia Spotlight server:
+        the surface forms of the index found in the tokens of the document, with the most frequent candidate resource
+
+        :param doc: the document to be annotated
+        :type doc: Doc
+        :return: the JSON response
+        """
+        return self.local_index.get_response(doc, self.process)
+
+    def _submit_text(self, executor, text: str, deadline: float) -> 'concurrent.futures.Future':
+        # the request for the text in a worker thread, measuring the time it waits for a free worker
+        stats = self._stats
+        if stats is None:
+            return executor.submit(self.get_text_response, text, deadline)
+        return executor.submit(self._get_queued_text_response, stats, time.perf_counter(), text, deadline)
+
+    def _get_queued_text_response(self, stats, submitted: float, text: str, deadline: float):
+        stats.observe('queue', time.perf_counter() - submitted)
+        return self.get_text_response(text, deadline)
+
+    def _wait_response(self, future: 'concurrent.futures.Future', deadline: float):
+        import concurrent.futures
+        # the result of a request running in another thread, or the handling of DeadlineExceeded
+        try:
+            return future.result(timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+        except DeadlineExceeded:
+            # already handled by the thread of the request
+            raise
+        except concurrent.futures.TimeoutError:
+            return self._handle_request_error(DeadlineExceeded('Deadline exceeded'), bad_response=False)
+
+    def get_text_response(self, text: str, deadline: float = None):
         """
         Wraps a remote call to the DBpedia Spotlight API, handles the possible errors and returns the JSON response:
-        - calls make_request to perform the actual request
+        - looks for the response in the in-memory cache
+        - if an identical request is already in flight (e.g. the same text in another thread of pipe), waits for its response instead of sending a new one
+        - otherwise looks for the response in the persistent cache, and calls make_request to perform the actual request
         - hecks the response object and acts accordingly to the status code and the decided behaviour (self.raise_http_errors)
         - returns the JSON response
 
-        :param doc: the document to be annotated
-        :type doc: Doc
+        :param text: the text to be annotated
+        :type text: str
+        :param deadline: the time (as time.monotonic) by which the response is needed, or None
         :return: the JSON response or None in case of error and self.raise_http_errors is False
         """
+        import concurrent.futures
+        cache_key = self.get_cache_key(text)
+        memory_cache = self.memory_cache
+        if memory_cache is not None:
+            data = memory_cache.get(cache_key)
+            if data is not None:
+                if self._stats is not None:
+                    self._stats.increment('cache_hits')
+                return data
+        with self._lock:
+            inflight = self._inflight.get(cache_key)
+            if inflight is None:
+                self._inflight[cache_key] = future = concurrent.futures.Future()
+        if inflight is not None:
+            if self._stats is not None:
+                self._stats.increment('coalesced')
+            return self._wait_response(inflight, deadline)
         try:
-            response = self.make_request(doc)
-            response.raise_for_status()
-        except HTTPError as e:
+            data = self._fetch_response(text, cache_key, deadline)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[cache_key]
+
+    def _fetch_response(self, text: str, cache_key: str, deadline: float):
+        import requests
+        # the persistent cache, then the actual request
+        data = self._get_cached_response(cache_key)
+        if data is not None:
+            return data
+        stats = self._stats
+        attempts = _RequestAttempts(self, deadline, requests.HTTPError, (requests.ConnectionError, requests.Timeout))
+        while True:
+            rate_limiter = self.rate_limiter
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            budget = self._budget
+            if budget is not None and not budget.acquire(timeout=attempts.get_remaining()):
+                return attempts.expired()
+            timeout = attempts.get_timeout()
+            if timeout is None:
+                if budget is not None:
+                    budget.release()
+                return attempts.expired()
+            endpoint = attempts.acquire_endpoint()
+            # True if the request is still running after its hedge has won: its slots are released when it completes
+            detached = False
+            try:
+                start = time.perf_counter() if stats is not None else 0
+                try:
+                    response, detached = self._make_hedged_request(text, endpoint, timeout, budget)
+                finally:
+                    if budget is not None and not detached:
+                        budget.release()
+                    self._observe_request(start)
+                if stats is not None:
+                    self._count_bytes(stats, response.request.body, response.content)
+                response.raise_for_status()
+            except BaseException as e:
+                delay = attempts.failed(e, release=not detached)
+                if delay is None:
+                    return None
+                if delay:
+                    time.sleep(delay)
+                continue
+            attempts.succeeded(release=not detached)
+            return self._save_response(cache_key, response.content)
+
+    def _get_cached_response(self, cache_key: str):
+        # the response in the persistent cache, also kept in the in-memory cache
+        cache = self.cache
+        if cache is None:
+            return None
+        data = cache.get(cache_key)
+        if data is not None:
+            if self._stats is not None:
+                self._stats.increment('cache_hits')
+            if self.memory_cache is not None:
+                self.memory_cache.set(cache_key, data)
+        return data
+
+    def _save_response(self, cache_key: str, content: bytes):
+        # decodes the body of a successful response and caches it
+        stats = self._stats
+        start = time.perf_counter() if stats is not None else 0
+        data = json_loads(content)
+        if stats is not None:
+            stats.observe('parse', time.perf_counter() - start)
+        if self.debug:
+            logger.debug(f'Received data: {data}')
+        if self.cache is not None:
+            self.cache.set(cache_key, data)
+        if self.memory_cache is not None:
+            self.memory_cache.set(cache_key, data)
+        return data
+
+    def _observe_request(self, start: float):
+        if self._stats is not None:
+            self._stats.increment('requests')
+            self._stats.observe('request', time.perf_counter() - start)
+
+    def _make_hedged_request(self, text: str, endpoint: str, timeout: tuple, budget=None):
+        # make_request, sending a duplicate if it is slower than usual (with hedge_after_percentile): the first
+        # successful response is returned, the other request completes in the background and is discarded.
+        # Returns (response, detached): detached is True if the first request is still running, then its endpoint and
+        # its slot of the concurrency `budget` are released when it completes instead of by the caller
+        import concurrent.futures
+        hedger = self.hedger
+        if hedger is None:
+            return self.make_request(text, endpoint, timeout), False
+        delay = self._get_hedge_delay(hedger)
+        if delay is None:
+            return self._make_timed_request(hedger, text, endpoint, timeout), False
+        executor = self.hedge_executor
+        primary = executor.submit(self._make_timed_request, hedger, text, endpoint, timeout)
+        try:
+            return primary.result(timeout=delay), False
+        except concurrent.futures.TimeoutError:
+            pass
+        if not self._try_hedge(hedger, budget):
+            return primary.result(), False
+        hedge = executor.submit(self._make_hedge_request, hedger, text, endpoint, timeout)
+        if budget is not None:
+            hedge.add_done_callback(lambda _: budget.release())
+        pending = {primary, hedge}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result().ok:
+                    if future is hedge:
+                        self._count_hedge_win()
+                        primary.add_done_callback(functools.partial(
+                            self._release_request, self.endpoint_pool, endpoint, budget))
+                        return future.result(), True
+                    return future.result(), False
+        # both failed: handled as a failure of the first request
+        return primary.result(), False
+
+    @staticmethod
+    def _release_request(endpoint_pool: EndpointPool, endpoint: str, budget, future):
+        # the slots of a request that has lost the race with its hedge, released once it has completed
+        if budget is not None:
+            budget.release()
+        endpoint_pool.release(endpoint, failed=_is_failure(None if future.exception() else future.result()))
+
+    def _get_hedge_delay(self, hedger: Hedger) -> float:
+        # the seconds after which a new request is hedged, or None
+        hedger.add_request()
+        return hedger.get_delay()
+
+    def _try_hedge(self, hedger: Hedger, budget) -> bool:
+        # the hedge takes a slot of the concurrency budget too, it is not sent if there is none free
+        if budget is not None and not budget.acquire(block=False):
+            return False
+        if not hedger.try_hedge():
+            if budget is not None:
+                budget.release()
+            return False
+        return True
+
+    def _count_hedge_win(self):
+        if self._stats is not None:
+            self._stats.increment('hedge_wins')
+
+    def _acquire_hedge_endpoint(self, endpoint: str) -> str:
+        # the endpoint of the duplicate of a slow request to `endpoint`, another one if possible
+        if self._stats is not None:
+            self._stats.increment('hedges')
+            self._stats.increment('requests')
+        return self.endpoint_pool.acquire(exclude=[endpoint])
+
+    def _make_timed_request(self, hedger: Hedger, text: str, endpoint: str, timeout: tuple):
+        start = time.perf_counter()
+        response = self.make_request(text, endpoint, timeout)
+        if response.ok:
+            hedger.observe(time.perf_counter() - start)
+        return response
+
+    def _make_hedge_request(self, hedger: Hedger, text: str, endpoint: str, timeout: tuple):
+        # the duplicate of a slow request
+        rate_limiter = self.rate_limiter
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        endpoint_pool = self.endpoint_pool
+        hedge_endpoint = self._acquire_hedge_endpoint(endpoint)
+        response = None
+        try:
+            response = self._make_timed_request(hedger, text, hedge_endpoint, timeout)
+            return response
+        finally:
+            endpoint_pool.release(hedge_endpoint, failed=_is_failure(response))
+
+    @staticmethod
+    def _count_bytes(stats, body, content):
+        stats.increment('bytes_sent', len(body) if body else 0)
+        stats.increment('bytes_received', len(content))
+
+    def _get_timeout(self, deadline: float):
+        # the (connect, read) timeouts of the next attempt, shortened to the time left before the deadline,
+        # or None if the deadline has expired
+        timeout = (self.connect_timeout, self.read_timeout)
+        if deadline is None:
+            return timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+
+    def _get_retry_delay(self, attempt: int, response=None, retryable=False, deadline=None):
+        """
+        Returns the seconds to wait before retrying a failed request, or None if it should not be retried
+
+        :param attempt: the number of retries already done
+        :param response: the response with an error status code, if the server answered
+        :param retryable: whether the error can be temporary (connection errors, timeouts and some error statuses)
+        :param deadline: the time (as time.monotonic) by which the response is needed, or None
+        """
+        if attempt >= self.max_retries or not retryable:
+            return None
+        retry_after = None
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        delay = get_backoff_delay(attempt, self.backoff_factor, self.backoff_max, retry_after)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            # no time left for a retry
+            return None
+        return delay
+
+    def _handle_request_error(self, e: Exception, bad_response: bool):
+        """
+        Logs the error of a request and re-raises it if self.raise_http_errors is True, otherwise returns None
+
+        :param e: the exception raised by the request
+        :param bad_response: True if the server answered with an error status code, False if the request failed
+        """
+        if isinstance(e, DeadlineExceeded):
+            logger.warning(
+                f"""The response did not arrive within the deadline of {self.deadline} seconds. Document not updated.""")
+        elif bad_response:
             # due to too many requests to the endpoint - this happens sometimes with the default public endpoint
             logger.warning(
                 f"""Bad response from server, probably too many requests. Consider using your own endpoint. Document not updated.
                 {e}""")
-            logger.debug(str(e))
-            if self.raise_http_errors:
-                raise e
-            return None
-        except Exception as e:  # other erros
+        else:
             logger.error(
                 f"""Endpoint unreachable, please check your connection. Document not updated.
                 {e}""")
+        if self.debug:
             logger.debug(str(e))
-            if self.raise_http_errors:
-                raise e
-            return None
-
-        data = response.json()
-        logger.debug(f'Received data: {data}')
-        return data
+        if self.raise_http_errors:
+            raise e
+        return None
 
     def __call__(self, doc):
         """
@@ -273,20 +1145,526 @@ class EntityLinker(object):
 
     def pipe(self, stream, batch_size=128):
         """
-        It takes a stream of documents, and for each batch of documents, it makes a request to the API
-        for each document in the batch, and then yields the processed results of each document
+        It takes a stream of documents, submits the request for each document to the worker threads
+        (at most `max_concurrency` requests at the same time), and yields the processed documents in the same order.
+        New documents are read from the stream as soon as the first pending one is yielded,
+        so the work flows continuously without waiting for a whole batch to complete.
+        The documents read ahead are limited by `batch_size`, `max_inflight_docs` and `max_inflight_bytes`: when the limit
+        is reached, the stream is not read until the consumer takes the oldest document (backpressure).
+        If `pack_max_chars` is set, consecutive short documents are sent together in a single request.
+        Identical texts read ahead share the request of the first one, without taking another worker thread.
 
         :param stream: the stream of documents to be processed
-        :param batch_size: The number of documents to send to the API in a single request, defaults to
-        128 (optional)
-        """
-        for docs in util.minibatch(stream, size=batch_size):
-            with ThreadPool(batch_size) as pool:
-                print('batch_size', batch_size)
-                # using pool.imap to preserve order and avoid blocking
-                for data, doc in zip(pool.imap(self.get_remote_response, docs), docs):
-                    self.process_single_doc_after_call(doc, data)
-                    yield doc
+        :param batch_size: The maximum number of documents read ahead from the stream and waiting for their
+        response, defaults to 128 (optional)
+        """
+        if self.backend == 'local':
+            # no requests to wait for
+            for doc in stream:
+                yield self.process_single_doc_after_call(doc, self.get_local_response(doc))
+            return
+        executor = self.executor
+        pending = collections.deque()
+        # the total size of the pending documents, with max_inflight_bytes
+        pending_bytes = 0
+        # the short documents waiting to be sent together
+        pack = []
+        pack_chars = 0
+        # cache key -> [Future, number of pending documents using it], for the identical texts read ahead
+        shared = {}
+        try:
+            for doc in stream:
+                # the deadline of each document starts when it is submitted
+                deadline = self.get_deadline()
+                chunks = self.get_chunks(doc)
+                if self.pack_max_chars and len(chunks) == 1 and 0 < len(doc.text) <= self.pack_max_chars:
+                    if pack and pack_chars + len(self.pack_separator) + len(doc.text) > self.pack_max_chars:
+                        self._submit_pack(executor, pack)
+                        pack_chars = 0
+                    # the parts are added when the pack is submitted
+                    parts = []
+                    keys = []
+                    pack.append((doc, parts, deadline))
+                    pack_chars += len(doc.text) + (len(self.pack_separator) if pack_chars else 0)
+                else:
+                    # the chunks of long documents are separate tasks, so they are annotated concurrently
+                    keys = [self.get_cache_key(doc.text[start:end]) for start, end in chunks]
+                    parts = [(self._submit_shared(executor, shared, key, doc.text[start:end], deadline),
+                              0, end - start, start) for key, (start, end) in zip(keys, chunks)]
+                size = self._get_inflight_size(doc)
+                pending.append((doc, parts, deadline, size, keys))
+                pending_bytes += size
+                while self._is_window_full(len(pending), pending_bytes, batch_size):
+                    if not pending[0][1]:
+                        self._submit_pack(executor, pack)
+                        pack_chars = 0
+                    doc, parts, deadline, size, keys = pending.popleft()
+                    pending_bytes -= size
+                    self._release_shared(shared, keys)
+                    yield self._process_pending(doc, parts, deadline)
+            if pack:
+                self._submit_pack(executor, pack)
+            while pending:
+                doc, parts, deadline, _, keys = pending.popleft()
+                self._release_shared(shared, keys)
+                yield self._process_pending(doc, parts, deadline)
+        finally:
+            # the generator has been closed or an error has been raised: don't send the remaining requests
+            for _, parts, _, _, _ in pending:
+                for future, *_ in parts:
+                    future.cancel()
+
+    def _submit_shared(self, executor, shared: dict, cache_key: str, text: str,
+                       deadline: float) -> 'concurrent.futures.Future':
+        # the request of a text read ahead by pipe: an identical text already pending shares its Future, so that
+        # a burst of duplicates takes a single worker thread
+        entry = shared.get(cache_key)
+        if entry is None:
+            entry = shared[cache_key] = [self._submit_text(executor, text, deadline), 0]
+        elif self._stats is not None:
+            self._stats.increment('coalesced')
+        entry[1] += 1
+        return entry[0]
+
+    @staticmethod
+    def _release_shared(shared: dict, keys: list):
+        # the document is yielded: its Futures are not shared with the next documents
+        for cache_key in keys:
+            entry = shared[cache_key]
+            entry[1] -= 1
+            if not entry[1]:
+                del shared[cache_key]
+
+    def _get_inflight_size(self, doc: Doc) -> int:
+        # the size of a document read ahead by pipe, only computed with max_inflight_bytes
+        return len(doc.text.encode('utf-8')) if self.max_inflight_bytes else 0
+
+    def _is_window_full(self, n_docs: int, n_bytes: int, batch_size: int) -> bool:
+        # whether pipe must yield the oldest pending document before reading the next one from the stream
+        max_docs = min(batch_size, self.max_inflight_docs) if self.max_inflight_docs else batch_size
+        return n_docs >= max_docs or (self.max_inflight_bytes is not None and n_bytes > self.max_inflight_bytes)
+
+    def _submit_pack(self, executor, pack: list):
+        # sends the texts of several short documents in a single request, each document takes its own part of the response
+        texts = [doc.text for doc, _, _ in pack]
+        # the request is needed by the oldest document of the pack
+        future = self._submit_text(executor, self.pack_separator.join(texts), pack[0][2])
+        start = 0
+        for (_, parts, _), text in zip(pack, texts):
+            parts.append((future, start, start + len(text), 0))
+            start += len(text) + len(self.pack_separator)
+        pack.clear()
+
+    def _process_pending(self, doc: Doc, parts: list, deadline: float) -> Doc:
+        # waits for the responses of the parts of the document, then adds the entities
+        if len(parts) == 1 and parts[0][1:] == (0, len(doc.text), 0):
+            data = self._wait_response(parts[0][0], deadline)
+        else:
+            data = merge_responses(self.process, doc.text, [
+                (self._wait_response(future, deadline), *part) for future, *part in parts])
+        return self.process_single_doc_after_call(doc, data)
+
+    def _get_async_state(self):
+        """
+        Returns the state of the asyncio API for the running event loop: the httpx.AsyncClient, the asyncio.Semaphore
+        bounding the concurrent requests and the requests in flight
+        """
+        import asyncio
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError(
+                'The asyncio API requires httpx. Install it with `pip install spacy-dbpedia-spotlight[async]`')
+        loop = asyncio.get_running_loop()
+        state = self._async_state.get(loop)
+        if state is None:
+            max_connections = self.pool_maxsize or self.max_concurrency
+            limits = httpx.Limits(max_connections=max_connections,
+                                  max_keepalive_connections=max_connections if self.keep_alive else 0)
+            client = httpx.AsyncClient(verify=self.verify_ssl, limits=limits,
+                                       headers={'accept': 'application/json'}, timeout=None)
+            state = _AsyncState(client, asyncio.Semaphore(self.max_concurrency))
+            self._async_state[loop] = state
+        return state
+
+    async def aget_remote_response(self, doc: Doc, deadline: float = None):
+        """
+        The asyncio version of get_remote_response
+
+        :param doc: the document to be annotated
+        :type doc: Doc
+        :param deadline: the time (as time.monotonic) by which the response is needed, by default `deadline` seconds from now
+        :return: the JSON response or None in case of error and self.raise_http_errors is False
+        """
+        import asyncio
+        if self.backend == 'local':
+            return self.get_local_response(doc)
+        if deadline is None:
+            deadline = self.get_deadline()
+        if deadline is None:
+            return await self._aget_chunks_response(doc, None)
+        try:
+            return await asyncio.wait_for(self._aget_chunks_response(doc, deadline),
+                                          max(0, deadline - time.monotonic()))
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError:
+            return self._handle_request_error(DeadlineExceeded('Deadline exceeded'), bad_response=False)
+
+    async def _aget_chunks_response(self, doc: Doc, deadline: float):
+        import asyncio
+        chunks = self.get_chunks(doc)
+        if len(chunks) == 1:
+            return await self.aget_text_response(doc.text, deadline)
+        results = await asyncio.gather(*[self.aget_text_response(doc.text[start:end], deadline)
+                                         for start, end in chunks])
+        return merge_responses(self.process, doc.text, [
+            (data, 0, end - start, start) for data, (start, end) in zip(results, chunks)])
+
+    async def areannotate(self, doc: Doc, previous, deadline: float = None) -> Doc:
+        """
+        The asyncio version of reannotate
+
+        :param doc: the new version of the document
+        :type doc: Doc
+        :param previous: the previous version of the document annotated by this component, or its raw result
+        :param deadline: the time (as time.monotonic) by which the response is needed, by default `deadline` seconds from now
+        :return: the document with the entities, or not updated in case of error and self.raise_http_errors is False
+        """
+        import asyncio
+        old_text, old_data = self._get_previous_result(previous)
+        if old_data is None or self.backend == 'local':
+            return await self.acall(doc)
+        if deadline is None:
+            deadline = self.get_deadline()
+        reused, changed = self._diff_previous(old_text, old_data, doc.text)
+        results = await asyncio.gather(*[self.aget_text_response(doc.text[start:end], deadline)
+                                         for start, end in changed])
+        return self.process_single_doc_after_call(doc, self._merge_reannotation(doc.text, reused, changed, results))
+
+    async def aget_text_response(self, text: str, deadline: float = None):
+        """
+        The asyncio version of get_text_response: at most `max_concurrency` requests are in flight at the same time
+        in the running event loop, and identical requests in flight are sent only once
+
+        :param text: the text to be annotated
+        :type text: str
+        :param deadline: the time (as time.monotonic) by which the response is needed, or None
+        :return: the JSON response or None in case of error and self.raise_http_errors is False
+        """
+        import asyncio
+        cache_key = self.get_cache_key(text)
+        memory_cache = self.memory_cache
+        if memory_cache is not None:
+            data = memory_cache.get(cache_key)
+            if data is not None:
+                if self._stats is not None:
+                    self._stats.increment('cache_hits')
+                return data
+        state = self._get_async_state()
+        task = state.inflight.get(cache_key)
+        if task is not None and self._stats is not None:
+            self._stats.increment('coalesced')
+        if task is None:
+            task = state.inflight[cache_key] = asyncio.ensure_future(
+                self._afetch_response(text, cache_key, state, deadline))
+
+            def done(task):
+                del state.inflight[cache_key]
+                if not task.cancelled():
+                    # mark the exception as retrieved, in case all the waiters have been cancelled
+                    task.exception()
+            task.add_done_callback(done)
+        # shielded: cancelling a waiter (e.g. at its deadline) must not cancel the request shared with the others
+        return await asyncio.shield(task)
+
+    async def _afetch_response(self, text: str, cache_key: str, state, deadline: float):
+        # the asyncio version of _fetch_response, sharing its decisions through _RequestAttempts
+        import asyncio
+        import httpx
+        data = self._get_cached_response(cache_key)
+        if data is not None:
+            return data
+        stats = self._stats
+        attempts = _RequestAttempts(self, deadline, httpx.HTTPStatusError, (httpx.TransportError,))
+        while True:
+            rate_limiter = self.rate_limiter
+            if rate_limiter is not None:
+                await asyncio.sleep(rate_limiter.reserve())
+            # the semaphore is not held while waiting for a retry
+            async with state.semaphore:
+                budget = self._budget
+                if budget is not None and not await attempts.aacquire_budget(budget):
+                    return attempts.expired()
+                timeout = attempts.get_timeout()
+                if timeout is None:
+                    if budget is not None:
+                        budget.release()
+                    return attempts.expired()
+                endpoint = attempts.acquire_endpoint()
+                try:
+                    start = time.perf_counter() if stats is not None else 0
+                    try:
+                        response = await self._apost_hedged(state, text, endpoint, timeout, budget)
+                    finally:
+                        if budget is not None:
+                            budget.release()
+                        self._observe_request(start)
+                    if stats is not None:
+                        self._count_bytes(stats, response.request.content, response.content)
+                    response.raise_for_status()
+                except BaseException as e:  # also cancellation, re-raised by failed
+                    delay = attempts.failed(e)
+                    if delay is None:
+                        return None
+                else:
+                    attempts.succeeded()
+                    return self._save_response(cache_key, response.content)
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def _apost_hedged(self, state, text: str, endpoint: str, timeout: tuple, budget=None):
+        # the asyncio version of _make_hedged_request: the request that loses the race is cancelled, and returns once it
+        # has stopped, so that the caller releases the endpoint and the budget slot of the first request after it
+        import asyncio
+        hedger = self.hedger
+        if hedger is None:
+            return await self._apost(state, text, endpoint, timeout)
+        delay = self._get_hedge_delay(hedger)
+        if delay is None:
+            return await self._apost(state, text, endpoint, timeout, hedger)
+        primary = asyncio.ensure_future(self._apost(state, text, endpoint, timeout, hedger))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._try_hedge(hedger, budget):
+                return await primary
+            hedge = asyncio.ensure_future(self._apost_hedge(state, text, endpoint, timeout, hedger))
+            if budget is not None:
+                # also if the task is cancelled before it starts
+                hedge.add_done_callback(lambda _: budget.release())
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().is_success:
+                        if task is hedge:
+                            self._count_hedge_win()
+                        return task.result()
+            # both failed: handled as a failure of the first request
+            return primary.result()
+        finally:
+            losers = [task for task in (primary, hedge) if task is not None and not task.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.wait(losers)
+
+    async def _apost(self, state, text: str, endpoint: str, timeout: tuple, hedger: Hedger = None):
+        import httpx
+        start = time.perf_counter()
+        response = await state.client.post(
+            f'{endpoint}/{self.process}', data=self.get_request_params(text),
+            timeout=httpx.Timeout(None, connect=timeout[0], read=timeout[1]))
+        if hedger is not None and response.is_success:
+            hedger.observe(time.perf_counter() - start)
+        return response
+
+    async def _apost_hedge(self, state, text: str, endpoint: str, timeout: tuple, hedger: Hedger):
+        import asyncio
+        rate_limiter = self.rate_limiter
+        if rate_limiter is not None:
+            await asyncio.sleep(rate_limiter.reserve())
+        endpoint_pool = self.endpoint_pool
+        hedge_endpoint = self._acquire_hedge_endpoint(endpoint)
+        response = None
+        try:
+            response = await self._apost(state, text, hedge_endpoint, timeout, hedger)
+            return response
+        finally:
+            endpoint_pool.release(hedge_endpoint, failed=_is_failure(response))
+
+    async def acall(self, doc: Doc) -> Doc:
+        """
+        The asyncio version of __call__, to be awaited from a running event loop
+
+        :param doc: the document to be processed
+        :return: The document is being returned.
+        """
+        data = await self.aget_remote_response(doc)
+        self.process_single_doc_after_call(doc, data)
+        return doc
+
+    async def apipe(self, stream, batch_size=128):
+        """
+        The asyncio version of pipe: an async generator yielding the processed documents in the same order as the stream.
+        All the requests run on the event loop thread, at most `max_concurrency` at the same time.
+
+        :param stream: the stream of documents to be processed, can be an iterable or an async iterable
+        :param batch_size: The maximum number of documents read ahead from the stream and waiting for their
+        response, defaults to 128 (optional)
+        """
+        import asyncio
+        pending = collections.deque()
+        pending_bytes = 0
+
+        def submit(doc):
+            nonlocal pending_bytes
+            size = self._get_inflight_size(doc)
+            pending.append((doc, asyncio.ensure_future(self.aget_remote_response(doc)), size))
+            pending_bytes += size
+
+        async def next_ready():
+            nonlocal pending_bytes
+            doc, task, size = pending.popleft()
+            pending_bytes -= size
+            self.process_single_doc_after_call(doc, await task)
+            return doc
+
+        try:
+            if hasattr(stream, '__aiter__'):
+                async for doc in stream:
+                    submit(doc)
+                    while self._is_window_full(len(pending), pending_bytes, batch_size):
+                        yield await next_ready()
+            else:
+                for doc in stream:
+                    submit(doc)
+                    while self._is_window_full(len(pending), pending_bytes, batch_size):
+                        yield await next_ready()
+            while pending:
+                yield await next_ready()
+        finally:
+            for _, task, _ in pending:
+                task.cancel()
+
+    async def aclose(self):
+        """
+        Closes the connections of the asyncio API opened in the running event loop
+        """
+        import asyncio
+        state = self._async_state.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            for task in list(state.inflight.values()):
+                task.cancel()
+            await state.client.aclose()
+
+
+def _is_failure(response) -> bool:
+    # whether a response (of requests or httpx) counts as a failure of its endpoint, None if the request has failed
+    return response is None or response.status_code in RETRY_STATUS_CODES
+
+
+class _RequestAttempts(object):
+    '''The attempts to get the response of a request, with the decisions shared by the threaded and the asyncio APIs:
+    the endpoint of each attempt, the classification of the errors, the failover to another endpoint, the retries with
+    backoff and the deadline. Only the transport (the requests or httpx call, blocking or awaited) differs.
+
+    :param linker: the EntityLinker
+    :param deadline: the time (as time.monotonic) by which the response is needed, or None
+    :param http_error: the exception class of the error status codes of the transport
+    :param transport_errors: the exception classes of the connection errors and timeouts of the transport
+    '''
+
+    def __init__(self, linker: EntityLinker, deadline: float, http_error, transport_errors: tuple):
+        self.linker = linker
+        self.deadline = deadline
+        self.http_error = http_error
+        self.transport_errors = transport_errors
+        self.endpoint_pool = linker.endpoint_pool
+        # the retries already done, and the endpoints tried since the last one
+        self.attempt = 0
+        self.tried = []
+        self.endpoint = None
+
+    def get_remaining(self) -> float:
+        '''The seconds left before the deadline, or None if there is none'''
+        return None if self.deadline is None else max(0, self.deadline - time.monotonic())
+
+    def get_timeout(self) -> tuple:
+        '''The (connect, read) timeouts of the next attempt, or None if the deadline has expired'''
+        return self.linker._get_timeout(self.deadline)
+
+    def expired(self):
+        '''Handles the expiration of the deadline: raises DeadlineExceeded, or returns None'''
+        return self.linker._handle_request_error(DeadlineExceeded('Deadline exceeded'), bad_response=False)
+
+    async def aacquire_budget(self, budget) -> bool:
+        '''Takes a slot of the concurrency `budget` without blocking the event loop (the semaphore is shared with other
+        processes, it can't be awaited), False if the deadline expires first'''
+        import asyncio
+        while not budget.acquire(block=False):
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                return False
+            await asyncio.sleep(0.005)
+        return True
+
+    def acquire_endpoint(self) -> str:
+        '''The endpoint of the next attempt, preferably one not tried yet'''
+        self.endpoint = self.endpoint_pool.acquire(exclude=self.tried)
+        return self.endpoint
+
+    def succeeded(self, release: bool = True):
+        if release:
+            self.endpoint_pool.release(self.endpoint)
+
+    def failed(self, e: BaseException, release: bool = True) -> float:
+        '''Called when the attempt has failed with the exception `e`, releases its endpoint (unless `release` is False)
+
+        :return: the seconds to wait before the next attempt (0 for a failover to another endpoint), or None if the
+        request has failed: then the error has been handled by _handle_request_error (raised, or logged if
+        raise_http_errors is False). Other exceptions than Exception (e.g. cancellation) are raised again.
+        '''
+        linker = self.linker
+        stats = linker._stats
+        response = None
+        if isinstance(e, self.http_error):
+            bad_response, response = True, e.response
+            retryable = response is not None and response.status_code in RETRY_STATUS_CODES
+        elif isinstance(e, self.transport_errors):
+            bad_response, retryable = False, True
+        else:
+            # other errors, and cancellation
+            if release:
+                self.endpoint_pool.release(self.endpoint)
+            if not isinstance(e, Exception):
+                raise e
+            return linker._handle_request_error(e, bad_response=False)
+        if release:
+            self.endpoint_pool.release(self.endpoint, failed=retryable)
+        if stats is not None:
+            stats.increment('errors')
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            # the timeout has been shortened by the deadline
+            return self.expired()
+        self.tried.append(self.endpoint)
+        if retryable and self.endpoint_pool.has_untried(self.tried):
+            # failover to another endpoint
+            if linker.debug:
+                logger.debug(f'Request to {self.endpoint} failed, trying another endpoint')
+            if stats is not None:
+                stats.increment('failovers')
+            return 0
+        delay = linker._get_retry_delay(self.attempt, response, retryable, self.deadline)
+        if delay is None:
+            return linker._handle_request_error(e, bad_response)
+        if linker.debug:
+            logger.debug(f'Request failed, retry {self.attempt + 1}/{linker.max_retries} in {delay:.2f} seconds')
+        if stats is not None:
+            stats.increment('retries')
+        self.attempt += 1
+        self.tried = []
+        return delay
+
+
+class _AsyncState(object):
+    '''The objects used by the asyncio API of an EntityLinker in one event loop'''
+
+    def __init__(self, client, semaphore):
+        self.client = client
+        self.semaphore = semaphore
+        # cache key -> asyncio.Task of the request in flight
+        self.inflight = {}
 
 
 def create(language_code, nlp=None):
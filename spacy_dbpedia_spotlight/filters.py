@@ -0,0 +1,101 @@
+# the field with the score of the entities, depending on the process (`spot` has no scores nor types)
+SCORE_FIELDS = {'annotate': '@similarityScore', 'candidates': '@finalScore'}
+DEFAULT_LABEL = 'DBPEDIA_ENT'
+
+
+def _get_annotate_fields(ent):
+    return ent
+
+
+def _get_candidates_fields(ent):
+    # the selected resource of the surface form
+    return ent.get('resource') or {}
+
+
+class EntityFilter(object):
+    '''Client-side filters and labels of the entities of a DBpedia Spotlight response, compiled once from the
+    configuration of the component and applied to each entity before its span is created.
+
+    :param process: the DBpedia Spotlight process ('annotate' or 'candidates', the entities of 'spot' have no types nor scores)
+    :param filter_types: keep only the entities with at least one of these types (e.g. `['DBpedia:Place']`, or a string of
+    comma-separated types like `@types`)
+    :param exclude_types: reject the entities with any of these types (list or comma-separated string)
+    :param min_similarity_score: reject the entities with a lower score (`@similarityScore`, or `@finalScore` for 'candidates')
+    :param min_support: reject the entities with a lower `@support`
+    :param type_labels: list of [type, label] pairs, the label of the spans of the entities with that type (e.g.
+    `[['DBpedia:Person', 'PERSON']]`), the first type found in order gives the label, otherwise it is `DBPEDIA_ENT`
+    '''
+
+    def __init__(self, process, filter_types=None, exclude_types=None, min_similarity_score=None, min_support=None,
+                 type_labels=None):
+        if process not in SCORE_FIELDS:
+            raise ValueError(f'The entity filters are not available with the process {process}, its entities have no '
+                             f'types nor scores. Choose one of {list(SCORE_FIELDS)}')
+        self.config = get_filter_config(process, filter_types, exclude_types, min_similarity_score, min_support,
+                                        type_labels)
+        self.filter_types = frozenset(parse_types(filter_types))
+        self.exclude_types = frozenset(parse_types(exclude_types))
+        self.min_similarity_score = min_similarity_score
+        self.min_support = min_support
+        self.type_labels = list(parse_type_labels(type_labels))
+        self._score_field = SCORE_FIELDS[process]
+        self._get_fields = _get_annotate_fields if process == 'annotate' else _get_candidates_fields
+        # the types are parsed only if they are used
+        self._use_types = bool(self.filter_types or self.exclude_types or self.type_labels)
+
+    def get_label(self, ent) -> str:
+        '''Returns the label of the span of the entity (the JSON of an entity of the response), or None if it is rejected'''
+        fields = self._get_fields(ent)
+        if self.min_support is not None and int(fields.get('@support', 0)) < self.min_support:
+            return None
+        if self.min_similarity_score is not None and float(fields.get(self._score_field, 0)) < self.min_similarity_score:
+            return None
+        if not self._use_types:
+            return DEFAULT_LABEL
+        types = fields.get('@types')
+        types = set(types.split(',')) if types else set()
+        if self.filter_types and self.filter_types.isdisjoint(types):
+            return None
+        if self.exclude_types and not self.exclude_types.isdisjoint(types):
+            return None
+        for type_, label in self.type_labels:
+            if type_ in types:
+                return label
+        return DEFAULT_LABEL
+
+
+def parse_types(types) -> tuple:
+    '''The types of `filter_types` or `exclude_types`: a list, or a string of comma-separated types'''
+    if not types:
+        return ()
+    if isinstance(types, str):
+        return tuple(type_.strip() for type_ in types.split(',') if type_.strip())
+    if not isinstance(types, (list, tuple, set, frozenset)) or not all(isinstance(type_, str) for type_ in types):
+        raise ValueError(f'The types must be a list of strings, not {types!r}')
+    return tuple(types)
+
+
+def parse_type_labels(type_labels) -> tuple:
+    '''The (type, label) pairs of `type_labels`, a list of [type, label] pairs.
+    A dict is rejected: the keys of a dict in the config of spaCy can't contain ':', like the DBpedia types.
+    '''
+    if not type_labels:
+        return ()
+    if isinstance(type_labels, dict) or not all(
+            isinstance(pair, (list, tuple)) and len(pair) == 2 and all(isinstance(v, str) for v in pair)
+            for pair in type_labels):
+        raise ValueError(f'type_labels must be a list of [type, label] pairs (e.g. [["DBpedia:Person", "PERSON"]]), '
+                         f'not {type_labels!r}')
+    return tuple((type_, label) for type_, label in type_labels)
+
+
+def get_filter_config(process, filter_types=None, exclude_types=None, min_similarity_score=None, min_support=None,
+                      type_labels=None):
+    '''The configuration of an EntityFilter, to know whether it has to be compiled again. None if there are no filters.
+    Raises ValueError if the types or the type labels are not valid.
+    '''
+    filter_types, exclude_types = parse_types(filter_types), parse_types(exclude_types)
+    type_labels = parse_type_labels(type_labels)
+    if not (filter_types or exclude_types or type_labels) and min_similarity_score is None and min_support is None:
+        return None
+    return process, filter_types, exclude_types, min_similarity_score, min_support, type_labels
@@ -0,0 +1,60 @@
+import collections
+import threading
+
+
+class Hedger(object):
+    '''Decides when a request is slow enough to send a duplicate of it (a hedged request), and limits the duplicates.
+
+    The latencies of the last `window` successful requests are kept in a ring buffer: a request is hedged when it
+    has not completed after the `percentile` of these latencies (once there are at least `min_samples` of them).
+    The hedged requests are limited by `budget`, the maximum fraction of extra requests: each request earns `budget`
+    tokens (up to `max_tokens`, so that the hedges can't burst after a long quiet period) and each hedge takes one.
+    '''
+
+    def __init__(self, percentile: float, budget: float, window: int = 1000, min_samples: int = 20,
+                 max_tokens: float = 10):
+        if not 0 < percentile < 100:
+            raise ValueError(f'The hedging percentile must be between 0 and 100, not {percentile}')
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.max_tokens = max_tokens
+        self._latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        # the hedging delay, computed again after `_refresh_every` new latencies
+        self._delay = None
+        self._refresh_every = max(1, window // 50)
+        self._since_refresh = 0
+
+    def observe(self, latency: float):
+        '''Records the latency of a successful request'''
+        with self._lock:
+            self._latencies.append(latency)
+            self._since_refresh += 1
+            if self._since_refresh >= self._refresh_every:
+                self._delay = None
+
+    def get_delay(self) -> float:
+        '''Returns the seconds after which a request is hedged, or None if there are not enough latencies yet'''
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            if self._delay is None:
+                latencies = sorted(self._latencies)
+                self._delay = latencies[min(len(latencies) - 1, int(self.percentile / 100 * len(latencies)))]
+                self._since_refresh = 0
+            return self._delay
+
+    def add_request(self):
+        '''Earns the budget of a new request'''
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.budget)
+
+    def try_hedge(self) -> bool:
+        '''Takes the budget for a hedged request, returns False if there is not enough'''
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
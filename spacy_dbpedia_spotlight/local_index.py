@@ -0,0 +1,382 @@
+import collections
+import json
+import mmap
+import os
+import shutil
+import struct
+import zlib
+
+import numpy
+from spacy.tokens import Doc
+
+from .response import Utf16Index, make_response
+
+# the first bytes of an index file
+MAGIC = b'SDSIDX2\0'
+DBPEDIA_RESOURCE_PREFIX = 'http://dbpedia.org/resource/'
+
+
+def normalize_surface_form(text: str) -> str:
+    '''The key of a surface form in the index: the whitespace between the words is a single space'''
+    return ' '.join(text.split())
+
+
+def read_tsv(path, min_count=1):
+    '''Reads the rows (surface form, URI, count, types) of a TSV file in the format of the `pairCounts` file of the
+    DBpedia Spotlight models: `surface form <TAB> URI <TAB> count`, with an optional 4th column of comma-separated types.
+    '''
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 3:
+                continue
+            count = int(fields[2])
+            if count < min_count:
+                continue
+            yield fields[0], fields[1], count, fields[3] if len(fields) > 3 else ''
+
+
+def build_index(rows, path):
+    '''Writes the index of the rows (surface form, URI, count, types) to the file `path`, and returns the number of
+    surface forms. The counts of duplicated (surface form, URI) pairs are summed, and the types of a URI are the non-empty
+    ones of its rows (they are the same in the `pairCounts` files).
+
+    The rows are sorted and grouped in a temporary SQLite database next to the index, so the memory use doesn't depend
+    on their number. The file contains arrays that are memory-mapped by SurfaceFormIndex: the surface forms (UTF-8,
+    sorted by bytes) with the hash tables of the surface forms and of their prefixes of whole words, the range of
+    candidates of each surface form (sorted by decreasing count), and the URIs with their types.
+    '''
+    import sqlite3
+    import tempfile
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path)), prefix='.build-index-') as directory:
+        db = sqlite3.connect(os.path.join(directory, 'rows.db'))
+        try:
+            db.execute('PRAGMA journal_mode = OFF')
+            db.execute('PRAGMA synchronous = OFF')
+            db.execute('CREATE TABLE rows (key TEXT, uri TEXT, count INTEGER, types TEXT)')
+            db.executemany('INSERT INTO rows VALUES (?, ?, ?, ?)', _normalize_rows(rows))
+            # the IDs of the URIs follow their first row
+            db.execute('CREATE TABLE uris (id INTEGER PRIMARY KEY, uri TEXT UNIQUE, types TEXT)')
+            db.execute('INSERT INTO uris (uri, types) SELECT uri, MAX(types) FROM rows GROUP BY uri ORDER BY MIN(rowid)')
+            sections, max_key_bytes = _write_sections(db, directory)
+        finally:
+            db.close()
+        n_keys = sections['key_hashes'].length
+        meta = {'n_keys': n_keys, 'max_key_bytes': max_key_bytes, 'sections': {}}
+        # the header is written first, with the positions of the sections
+        header_size = 4096
+        position = header_size
+        for name, section in sections.items():
+            meta['sections'][name] = {'offset': position, 'length': section.length, 'dtype': section.dtype.str}
+            position += _aligned(section.length * section.dtype.itemsize)
+        header = json.dumps(meta).encode('utf-8')
+        if len(MAGIC) + 8 + len(header) > header_size:
+            raise ValueError('The header of the index is too large')
+        with open(path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+            for name, section in sections.items():
+                f.seek(meta['sections'][name]['offset'])
+                section.copy_to(f)
+            f.truncate(position)
+    return n_keys
+
+
+def _normalize_rows(rows):
+    for surface_form, uri, count, types in rows:
+        key = normalize_surface_form(surface_form)
+        if key:
+            yield key, uri, count, types
+
+
+def _write_sections(db, directory):
+    # streams the sorted surface forms, candidates and URIs of the database to the files of the sections, returns the
+    # sections and the size of the longest surface form
+    sections = collections.OrderedDict()
+
+    def add(name, dtype):
+        sections[name] = _Section(os.path.join(directory, name), dtype)
+        return sections[name]
+
+    key_offsets, key_blob = add('key_offsets', numpy.uint64), add('key_blob', numpy.uint8)
+    key_hashes = add('key_hashes', numpy.uint32)
+    candidate_starts = add('candidate_starts', numpy.uint64)
+    candidate_uris = add('candidate_uris', numpy.uint32)
+    candidate_counts = add('candidate_counts', numpy.uint64)
+    prefix_hashes = _Section(os.path.join(directory, 'prefix_hashes'), numpy.uint32)
+    max_key_bytes = n_candidates = 0
+    previous = None
+    key_offsets.append(0)
+    pairs = db.execute('SELECT rows.key, uris.id - 1, SUM(rows.count) AS total FROM rows JOIN uris USING (uri) '
+                       'GROUP BY rows.key, uris.id ORDER BY rows.key, total DESC, uris.id')
+    for key, uri_id, count in pairs:
+        if key != previous:
+            candidate_starts.append(n_candidates)
+            previous = key
+            key = key.encode('utf-8')
+            key_blob.append_bytes(key)
+            key_offsets.append(key_blob.length)
+            key_hashes.append(_hash(key))
+            max_key_bytes = max(max_key_bytes, len(key))
+            # the prefixes of whole words, to stop extending a match that no surface form continues
+            space = key.find(b' ')
+            while space != -1:
+                prefix_hashes.append(_hash(key[:space]))
+                space = key.find(b' ', space + 1)
+        candidate_uris.append(uri_id)
+        candidate_counts.append(count)
+        n_candidates += 1
+    candidate_starts.append(n_candidates)
+    uri_offsets, uri_blob = add('uri_offsets', numpy.uint64), add('uri_blob', numpy.uint8)
+    type_offsets, type_blob = add('type_offsets', numpy.uint64), add('type_blob', numpy.uint8)
+    uri_offsets.append(0)
+    type_offsets.append(0)
+    for uri, types in db.execute('SELECT uri, types FROM uris ORDER BY id'):
+        uri_blob.append_bytes(uri.encode('utf-8'))
+        uri_offsets.append(uri_blob.length)
+        type_blob.append_bytes(types.encode('utf-8'))
+        type_offsets.append(type_blob.length)
+    hashes = key_hashes.read()
+    add('key_table', numpy.uint32).write_array(
+        _build_hash_table(hashes, numpy.arange(1, len(hashes) + 1, dtype=numpy.uint32)))
+    hashes = numpy.unique(prefix_hashes.read())
+    add('prefix_table', numpy.uint32).write_array(_build_hash_table(hashes, hashes))
+    return sections, max_key_bytes
+
+
+def _hash(key: bytes) -> int:
+    # stable across processes (unlike hash()), and never 0, the free slots of the hash tables
+    return zlib.crc32(key) or 1
+
+
+def _build_hash_table(hashes, values):
+    '''A hash table with linear probing, at most half full: the value of each hash is in the first free slot from
+    `hash & (size - 1)`, the free slots are 0. The entries are inserted together, one probe at a time.
+    '''
+    size = 8
+    while size < 2 * len(hashes):
+        size *= 2
+    table = numpy.zeros(size, dtype=numpy.uint32)
+    slots = hashes.astype(numpy.int64) & (size - 1)
+    pending = numpy.arange(len(hashes))
+    while len(pending):
+        # the first of the entries probing the same free slot takes it, the others probe the next slot
+        free = pending[table[slots[pending]] == 0]
+        _, first = numpy.unique(slots[free], return_index=True)
+        table[slots[free[first]]] = values[free[first]]
+        pending = pending[table[slots[pending]] != values[pending]]
+        slots[pending] = (slots[pending] + 1) & (size - 1)
+    return table
+
+
+def _aligned(size):
+    return (size + 7) // 8 * 8
+
+
+class _Section(object):
+    # an array of the index being built, appended to a temporary file by chunks
+    chunk_size = 65536
+
+    def __init__(self, path, dtype):
+        self.path = path
+        self.dtype = numpy.dtype(dtype)
+        self.length = 0
+        self._file = open(path, 'wb')
+        self._buffer = []
+
+    def append(self, value):
+        self._buffer.append(value)
+        self.length += 1
+        if len(self._buffer) >= self.chunk_size:
+            self._flush()
+
+    def append_bytes(self, data: bytes):
+        # for the uint8 sections
+        self._file.write(data)
+        self.length += len(data)
+
+    def write_array(self, array):
+        self._file.write(array.astype(self.dtype).tobytes())
+        self.length += len(array)
+
+    def _flush(self):
+        if self._buffer:
+            self._file.write(numpy.array(self._buffer, dtype=self.dtype).tobytes())
+            self._buffer = []
+
+    def read(self):
+        # the whole array, once it is complete
+        self._flush()
+        self._file.close()
+        return numpy.fromfile(self.path, dtype=self.dtype)
+
+    def copy_to(self, f):
+        self._flush()
+        self._file.close()
+        with open(self.path, 'rb') as section:
+            shutil.copyfileobj(section, f)
+
+
+class _Strings(object):
+    # a read-only sequence of the bytes strings stored in the index
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[int(self.offsets[i]):int(self.offsets[i + 1])].tobytes()
+
+
+class SurfaceFormIndex(object):
+    '''Memory-mapped index of surface forms and their candidate DBpedia resources, built with `build_index`
+    (or `python -m spacy_dbpedia_spotlight build-index`). The file is shared by all the processes that open it.
+
+    It finds the surface forms in a Doc with a greedy longest match over its tokens: from each token, the match is
+    extended token by token, looking up each text in the hash table of the surface forms, as long as the words so far
+    begin a surface form (the hash table of the prefixes of whole words of the surface forms).
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not an index of spacy-dbpedia-spotlight, or it has been built by an older '
+                             f'version: build it again with `python -m spacy_dbpedia_spotlight build-index`')
+        header_length, = struct.unpack_from('<Q', self._mmap, len(MAGIC))
+        start = len(MAGIC) + 8
+        meta = json.loads(self._mmap[start:start + header_length])
+        self.max_key_bytes = meta['max_key_bytes']
+        arrays = {}
+        for name, section in meta['sections'].items():
+            arrays[name] = numpy.frombuffer(self._mmap, dtype=numpy.dtype(section['dtype']), count=section['length'],
+                                            offset=section['offset'])
+        self._keys = _Strings(arrays['key_offsets'], arrays['key_blob'])
+        self._uris = _Strings(arrays['uri_offsets'], arrays['uri_blob'])
+        self._types = _Strings(arrays['type_offsets'], arrays['type_blob'])
+        self._key_hashes = arrays['key_hashes']
+        self._key_table = arrays['key_table']
+        self._prefix_table = arrays['prefix_table']
+        self._candidate_starts = arrays['candidate_starts']
+        self._candidate_uris = arrays['candidate_uris']
+        self._candidate_counts = arrays['candidate_counts']
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _find(self, key: bytes) -> int:
+        # the position of the key in the index, or -1
+        key_hash = _hash(key)
+        table = self._key_table
+        mask = len(table) - 1
+        slot = key_hash & mask
+        while True:
+            position = int(table[slot]) - 1
+            if position < 0:
+                return -1
+            if self._key_hashes[position] == key_hash and self._keys[position] == key:
+                return position
+            slot = (slot + 1) & mask
+
+    def _is_prefix(self, key: bytes) -> bool:
+        # whether some surface forms begin with the words of the key (rarely true for other keys with the same hash)
+        key_hash = _hash(key)
+        table = self._prefix_table
+        mask = len(table) - 1
+        slot = key_hash & mask
+        while True:
+            value = table[slot]
+            if value == key_hash:
+                return True
+            if not value:
+                return False
+            slot = (slot + 1) & mask
+
+    def lookup(self, surface_form: str) -> list:
+        '''Returns the candidates of the surface form as a list of (URI, count, types), by decreasing count'''
+        position = self._find(normalize_surface_form(surface_form).encode('utf-8'))
+        if position < 0:
+            return []
+        return self._get_candidates(position)
+
+    def _get_candidates(self, i):
+        start, end = int(self._candidate_starts[i]), int(self._candidate_starts[i + 1])
+        return [(self._uris[int(u)].decode('utf-8'), int(c), self._types[int(u)].decode('utf-8'))
+                for u, c in zip(self._candidate_uris[start:end], self._candidate_counts[start:end])]
+
+    def match(self, doc: Doc) -> list:
+        '''Returns the surface forms of the index found in the doc, as a list of (start_char, end_char, key position),
+        without overlaps and preferring the longest ones
+        '''
+        matches = []
+        text = doc.text
+        n_tokens = len(doc)
+        starts = [t.idx for t in doc]
+        ends = [t.idx + len(t) for t in doc]
+        is_space = [t.is_space for t in doc]
+        # whether the token ends a word: the next one is after whitespace
+        word_ends = [bool(t.whitespace_) or i + 1 < n_tokens and is_space[i + 1] for i, t in enumerate(doc)]
+        i = 0
+        while i < n_tokens:
+            if is_space[i]:
+                i += 1
+                continue
+            start_char = starts[i]
+            best = None
+            j = i
+            while j < n_tokens:
+                end_char = ends[j]
+                key = normalize_surface_form(text[start_char:end_char]).encode('utf-8')
+                if len(key) > self.max_key_bytes:
+                    break
+                # a match doesn't end with whitespace
+                position = -1 if is_space[j] else self._find(key)
+                if position >= 0:
+                    best = (j, end_char, position)
+                # prefix pruning: stop at the end of a word when no surface form begins with these words
+                if word_ends[j] and not self._is_prefix(key):
+                    break
+                j += 1
+            if best is None:
+                i += 1
+                continue
+            matches.append((start_char, best[1], best[2]))
+            i = best[0] + 1
+        return matches
+
+    def get_response(self, doc: Doc, process: str):
+        '''Returns the surface forms found in the doc in the same JSON format of the `spot` or `candidates` processes
+        of DBpedia Spotlight. The candidate with the highest count is the resource of each surface form.
+        '''
+        if process not in ('spot', 'candidates'):
+            raise ValueError(f'The local index supports the processes spot and candidates, not {process}')
+        surface_forms = []
+        # the offsets are in UTF-16 code units like those of the server
+        offset_index = Utf16Index(doc.text)
+        for start_char, end_char, position in self.match(doc):
+            surface_form = {'@name': doc.text[start_char:end_char],
+                            '@offset': str(offset_index.get_utf16_offset(start_char))}
+            if process == 'candidates':
+                candidates = self._get_candidates(position)
+                uri, count, types = candidates[0]
+                total = sum(c for _, c, _ in candidates)
+                name = uri[len(DBPEDIA_RESOURCE_PREFIX):] if uri.startswith(DBPEDIA_RESOURCE_PREFIX) else uri
+                surface_form['resource'] = {
+                    '@label': name.replace('_', ' '),
+                    '@uri': name,
+                    '@support': str(count),
+                    '@priorScore': repr(count / total),
+                    # without the context, the final score is the prior
+                    '@finalScore': repr(count / total),
+                    '@types': types,
+                }
+            surface_forms.append(surface_form)
+        return make_response(process, doc.text, surface_forms)
+
+    def close(self):
+        self._keys = self._uris = self._types = None
+        self._key_hashes = self._key_table = self._prefix_table = None
+        self._candidate_starts = self._candidate_uris = self._candidate_counts = None
+        self._mmap.close()
@@ -0,0 +1,94 @@
+import bisect
+import re
+
+from spacy.tokens import Doc
+
+# the characters outside of the Basic Multilingual Plane (e.g. emoji), two UTF-16 code units each
+ASTRAL_CHARS = re.compile('[\U00010000-\U0010FFFF]')
+
+
+def get_response_entities(process: str, data) -> list:
+    '''Returns the list of entities in the JSON response of DBpedia Spotlight for the process'''
+    if process == 'annotate':
+        return data.get('Resources', [])
+    surface_form = data.get('annotation', {}).get('surfaceForm', [])
+    if isinstance(surface_form, dict):
+        # if only one surface form
+        surface_form = [surface_form]
+    return surface_form
+
+
+def get_response_text(process: str, data) -> str:
+    '''Returns the text of the request, as returned in the JSON response of DBpedia Spotlight for the process'''
+    return (data if process == 'annotate' else data.get('annotation', {})).get('@text')
+
+
+def utf16_offset(text: str, offset: int) -> int:
+    '''Converts a character offset of the text to UTF-16 code units, the unit of the offsets of DBpedia Spotlight
+    (Java strings): they differ after the characters outside of the Basic Multilingual Plane, e.g. emoji
+    '''
+    prefix = text[:offset]
+    return offset if prefix.isascii() else len(prefix.encode('utf-16-le')) // 2
+
+
+def get_surface_form_key(process: str) -> str:
+    '''Returns the field of the entities containing the surface form, which depends on the process'''
+    return '@surfaceForm' if process == 'annotate' else '@name'
+
+
+def make_response(process: str, text: str, entities: list, template=None):
+    '''Builds a JSON response in the format of DBpedia Spotlight for the text, containing the entities.
+    For `annotate`, the other top-level fields (`@confidence`, `@support`, ...) are copied from the `template` response.
+    '''
+    if process == 'annotate':
+        data = {k: v for k, v in (template or {}).items() if k != 'Resources'}
+        data['@text'] = text
+        if entities:
+            data['Resources'] = entities
+        return data
+    annotation = {'@text': text}
+    if entities:
+        annotation['surfaceForm'] = entities
+    return {'annotation': annotation}
+
+
+class TokenIndex(object):
+    '''Maps character offsets to the tokens of a document with a binary search over the token boundaries'''
+
+    def __init__(self, doc: Doc):
+        self.token_starts = [t.idx for t in doc]
+        self.token_ends = [t.idx + len(t) for t in doc]
+
+    def get_token_bounds(self, start_char: int, end_char: int):
+        '''Returns the (start, end) token indices of the smallest span containing the characters [start_char, end_char),
+        expanded to whole tokens if the offsets are inside a token, or None if no token overlaps them
+        '''
+        # the first token ending after start_char, and the last one starting before end_char
+        start = bisect.bisect_right(self.token_ends, start_char)
+        end = bisect.bisect_left(self.token_starts, end_char)
+        if start >= end:
+            return None
+        return start, end
+
+
+class Utf16Index(object):
+    '''Converts between the UTF-16 offsets of DBpedia Spotlight (Java strings) and the character offsets of a text, with
+    a binary search over the characters outside of the Basic Multilingual Plane, the only ones where they differ
+    '''
+
+    def __init__(self, text: str):
+        # the character offset of each of these characters, and its UTF-16 offset
+        self.astral_chars = [] if text.isascii() else [match.start() for match in ASTRAL_CHARS.finditer(text)]
+        self.astral_offsets = [offset + i for i, offset in enumerate(self.astral_chars)]
+
+    def get_char_offset(self, offset: int) -> int:
+        '''Returns the character offset of the UTF-16 `offset`'''
+        if not self.astral_offsets:
+            return offset
+        return offset - bisect.bisect_left(self.astral_offsets, offset)
+
+    def get_utf16_offset(self, char_offset: int) -> int:
+        '''Returns the UTF-16 offset of the character offset `char_offset`'''
+        if not self.astral_chars:
+            return char_offset
+        return char_offset + bisect.bisect_left(self.astral_chars, char_offset)
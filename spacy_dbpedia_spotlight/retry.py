@@ -0,0 +1,65 @@
+import email.utils
+import random
+import threading
+import time
+
+# HTTP status codes worth retrying: too many requests and temporary server errors
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+
+def parse_retry_after(value) -> float:
+    '''Returns the number of seconds to wait from the value of a `Retry-After` header (seconds or HTTP date), or None'''
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+def get_backoff_delay(attempt: int, backoff_factor: float, backoff_max: float, retry_after=None) -> float:
+    '''Returns the seconds to wait before the retry number `attempt` (starting from 0).
+    This is the value of the `Retry-After` header if the server sent it, otherwise a random delay between 0 and
+    `backoff_factor * 2 ** attempt` (exponential backoff with full jitter), and never more than `backoff_max`.
+    '''
+    if retry_after is not None:
+        return min(retry_after, backoff_max)
+    return random.uniform(0, min(backoff_max, backoff_factor * 2 ** attempt))
+
+
+class TokenBucket(object):
+    '''Client-side rate limiter allowing on average `rate` requests per second, and bursts of up to `burst` requests.
+    It is shared by all the threads (and the asyncio tasks) of a component.
+    '''
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst if burst else max(1.0, rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        '''Takes a token and returns the seconds to wait before it is available (0 if it is available now)'''
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # the tokens can go below zero: the requests queue up for the next tokens
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        '''Blocks until a token is available'''
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
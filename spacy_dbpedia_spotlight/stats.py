@@ -0,0 +1,112 @@
+import bisect
+import threading
+
+# the upper bounds of the buckets of the timing histograms, in seconds (from 0.1 ms to about 100 s)
+TIME_BUCKETS = [0.0001 * 2 ** i for i in range(21)]
+# the upper bounds of the buckets of the histogram of entities per document
+COUNT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+class Histogram(object):
+    '''Counts the observed values in fixed buckets, and keeps their count, sum, minimum and maximum.
+    The percentiles are estimated with the upper bound of the bucket containing them.
+    '''
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # the last bucket counts the values above the largest bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q: float):
+        '''Returns an upper bound of the `q` percentile (0-100) of the observed values, or None if there are none'''
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+
+class LinkerStats(object):
+    '''Performance metrics of an EntityLinker, collected with `collect_stats=True`.
+
+    Timings (histograms, in seconds):
+    - `request`: each HTTP request, until the whole response is received
+    - `queue`: the time a request of `nlp.pipe` waits for a free worker thread
+    - `parse`: decoding the JSON responses
+    - `align`: adding the entities of a response to the document
+    - `entities_per_doc`: histogram of the number of entities added to each document
+
+    Counters: `requests` (HTTP requests sent), `errors` (failed HTTP requests), `retries`, `failovers` (requests sent
+    again to another endpoint), `hedges` (duplicates of slow requests, with `hedge_after_percentile`), `hedge_wins`
+    (hedges that answered first), `cache_hits` (responses from the memory or persistent cache), `coalesced` (identical
+    requests in flight sent only once), `bytes_sent`, `bytes_received`, `docs`, `entities`.
+
+    If `callback` is set, it is called with (name, value) for each timing and counter increment, e.g.
+    `('request', 0.12)` or `('bytes_received', 5120)`, from the thread that recorded it.
+    '''
+    PHASES = ('request', 'queue', 'parse', 'align')
+    COUNTERS = ('requests', 'errors', 'retries', 'failovers', 'hedges', 'hedge_wins', 'cache_hits', 'coalesced',
+                'bytes_sent', 'bytes_received', 'docs', 'entities')
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''Sets all the metrics to zero'''
+        with self._lock:
+            self.histograms = {phase: Histogram(TIME_BUCKETS) for phase in self.PHASES}
+            self.histograms['entities_per_doc'] = Histogram(COUNT_BUCKETS)
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def observe(self, name: str, value):
+        '''Records a value in the histogram `name`'''
+        with self._lock:
+            self.histograms[name].observe(value)
+        if self.callback is not None:
+            self.callback(name, value)
+
+    def increment(self, name: str, value=1):
+        '''Increments the counter `name`'''
+        with self._lock:
+            self.counters[name] += value
+        if self.callback is not None:
+            self.callback(name, value)
+
+    def snapshot(self) -> dict:
+        '''Returns the current counters, and a summary (count, sum, mean, min, max, p50, p90, p99) of each histogram'''
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {name: histogram.summary() for name, histogram in self.histograms.items()},
+            }
@@ -1,7 +1,52 @@
-try:  # Python 3.8
-    import importlib.metadata as importlib_metadata
-except ImportError:
-    import importlib_metadata  # noqa: F401
+import functools
+import json
 
 
-pkg_meta = importlib_metadata.metadata(__name__.split(".")[0])
+@functools.lru_cache(maxsize=None)
+def get_pkg_meta():
+    '''The metadata of the installed package, read on first use (it scans the installed distributions)'''
+    try:  # Python 3.8
+        import importlib.metadata as importlib_metadata
+    except ImportError:
+        import importlib_metadata
+    return importlib_metadata.metadata(__name__.split(".")[0])
+
+
+def __getattr__(name):
+    # `pkg_meta` is computed when it is accessed, not at import time
+    if name == 'pkg_meta':
+        return get_pkg_meta()
+    if name == 'orjson':
+        return get_orjson()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+class _LazyLogger(object):
+    '''The loguru logger, imported when the first message is logged'''
+
+    def __getattr__(self, name):
+        from loguru import logger
+        return getattr(logger, name)
+
+
+logger = _LazyLogger()
+
+
+def get_orjson():
+    '''The orjson module, or None if it is not installed, imported on first use'''
+    global orjson
+    if 'orjson' not in globals():
+        try:
+            import orjson as module
+        except ImportError:  # optional, `pip install spacy-dbpedia-spotlight[fast]`
+            module = None
+        orjson = module
+    return orjson
+
+
+def json_loads(data):
+    '''Decodes a JSON document (str or bytes) with orjson if it is installed, otherwise with the standard library'''
+    fast = get_orjson()
+    if fast is not None:
+        return fast.loads(data)
+    return json.loads(data)
@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sys
+
+import pytest
+import spacy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+from stub_server import StubSpotlightServer  # noqa: E402
+
+# texts with two entities each for the stub server
+SHORT_TEXT = 'Google LLC is an American multinational technology company.'
+OTHER_TEXT = 'Today I will contact Boris Johnson in Texas.'
+
+
+@pytest.fixture
+def stub_server():
+    '''A local DBpedia Spotlight stub, see benchmarks/stub_server.py'''
+    with StubSpotlightServer() as server:
+        yield server
+
+
+@pytest.fixture
+def make_nlp():
+    '''A function creating a blank English pipeline with the component, for an endpoint and the other parameters of
+    its config'''
+    def make(endpoint, **config):
+        nlp = spacy.blank('en')
+        nlp.add_pipe('dbpedia_spotlight', config={'dbpedia_rest_endpoint': endpoint, **config})
+        return nlp
+    return make
+
+
+def run_async(linker, *awaitables):
+    '''Runs awaitables of the asyncio API of the linker (e.g. `linker.acall(doc)`) together in a new event loop, then
+    closes the asyncio client of the linker. Returns the result of the awaitable, or the list of results if several'''
+    async def run():
+        try:
+            results = await asyncio.gather(*awaitables)
+        finally:
+            await linker.aclose()
+        return results[0] if len(awaitables) == 1 else results
+    return asyncio.run(run())
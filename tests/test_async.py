@@ -0,0 +1,62 @@
+import httpx
+import pytest
+
+from conftest import OTHER_TEXT, SHORT_TEXT, run_async
+from stub_server import StubSpotlightServer
+
+
+def test_acall(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    docs = run_async(linker, *[linker.acall(nlp.make_doc(text)) for text in [SHORT_TEXT, OTHER_TEXT]])
+    assert [ent.text for ent in docs[0].ents] == ['Google LLC', 'American']
+    assert [ent.kb_id_ for ent in docs[1].ents] == [
+        'http://dbpedia.org/resource/Boris_Johnson', 'http://dbpedia.org/resource/Texas']
+
+
+def test_apipe_order(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, max_concurrency=5)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    texts = [f'{text} ({i})' for i in range(100) for text in [SHORT_TEXT, OTHER_TEXT]]
+
+    async def produce():
+        for text in texts:
+            yield nlp.make_doc(text)
+
+    async def run():
+        results = [doc async for doc in linker.apipe(nlp.make_doc(text) for text in texts)]
+        results_async = [doc async for doc in linker.apipe(produce(), batch_size=16)]
+        return results, results_async
+
+    for docs in run_async(linker, run()):
+        assert [doc.text for doc in docs] == texts
+        assert all(len(doc.ents) == 2 for doc in docs)
+    assert stub_server.request_count == 2 * len(texts)
+    # all the requests reuse the same few connections
+    assert stub_server.connection_count <= 5
+
+
+def test_async_http_errors(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    with pytest.raises(httpx.HTTPStatusError):
+        run_async(linker, linker.acall(nlp.make_doc('')))
+    linker.raise_http_errors = False
+    doc = run_async(linker, linker.acall(nlp.make_doc('')))
+    assert not doc.ents
+
+
+def test_async_failover_like_sync(make_nlp):
+    # the threaded and the asyncio APIs share the decisions on the failed requests
+    with StubSpotlightServer() as dead:
+        dead_url = dead.url
+    with StubSpotlightServer() as server:
+        results = []
+        for use_async in [False, True]:
+            nlp = make_nlp([dead_url, server.url], max_retries=1, backoff_factor=0.01, collect_stats=True)
+            linker = nlp.get_pipe('dbpedia_spotlight')
+            doc = run_async(linker, linker.acall(nlp.make_doc(SHORT_TEXT))) if use_async else nlp(SHORT_TEXT)
+            counters = linker.stats.snapshot()['counters']
+            results.append((len(doc.ents), counters.get('errors'), counters.get('failovers'), counters.get('retries', 0),
+                            [s['outstanding'] for s in linker.endpoint_pool.status()]))
+        assert results[0] == results[1] == (2, 1, 1, 0, [0, 0])
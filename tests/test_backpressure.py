@@ -0,0 +1,55 @@
+from conftest import SHORT_TEXT, run_async
+
+
+def counting_stream(nlp, n, read):
+    for i in range(n):
+        read.append(i)
+        yield nlp.make_doc(f'{i}. {SHORT_TEXT}')
+
+
+def max_read_ahead(docs, read):
+    # how many documents had been read from the stream when each document was yielded
+    return max(len(read) - i for i, _ in enumerate(docs))
+
+
+def test_max_inflight_docs(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, max_inflight_docs=3)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    read = []
+    docs = linker.pipe(counting_stream(nlp, 20, read), batch_size=128)
+    assert max_read_ahead(docs, read) <= 3
+    assert len(read) == 20
+
+
+def test_max_inflight_bytes(stub_server, make_nlp):
+    doc_bytes = len(f'10. {SHORT_TEXT}'.encode('utf-8'))
+    nlp = make_nlp(stub_server.url, max_inflight_bytes=doc_bytes * 4)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    read = []
+    docs = list(linker.pipe(counting_stream(nlp, 20, read), batch_size=128))
+    assert all(len(doc.ents) == 2 for doc in docs)
+    read = []
+    # the document that goes over the limit is the last one read
+    assert max_read_ahead(linker.pipe(counting_stream(nlp, 20, read), batch_size=128), read) <= 5
+
+
+def test_document_larger_than_max_bytes(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, max_inflight_bytes=10)
+    docs = list(nlp.pipe([SHORT_TEXT, 'Joe Biden visited Texas.', SHORT_TEXT]))
+    assert [len(doc.ents) for doc in docs] == [2, 2, 2]
+
+
+def test_apipe_max_inflight_docs(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, max_inflight_docs=2)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    read = []
+
+    async def run():
+        ahead = []
+        i = 0
+        async for doc in linker.apipe(counting_stream(nlp, 10, read)):
+            ahead.append(len(read) - i)
+            i += 1
+        return ahead
+
+    assert max(run_async(linker, run())) <= 2
@@ -0,0 +1,34 @@
+import json
+
+import spacy
+
+from conftest import SHORT_TEXT
+import run as benchmarks
+from stub_server import StubSpotlightServer
+
+
+def test_stub_replays_recordings():
+    recorded = {'@text': SHORT_TEXT, 'Resources': [{'@URI': 'http://dbpedia.org/resource/Alphabet_Inc.', '@support': '1',
+                                              '@types': '', '@surfaceForm': 'Google LLC', '@offset': '0',
+                                              '@similarityScore': '0.9', '@percentageOfSecondRank': '0.1'}]}
+    with StubSpotlightServer(recordings={('annotate', SHORT_TEXT): recorded}) as server:
+        nlp = spacy.blank('en')
+        nlp.add_pipe('dbpedia_spotlight', config={'dbpedia_rest_endpoint': server.url})
+        assert [ent.kb_id_ for ent in nlp(SHORT_TEXT).ents] == ['http://dbpedia.org/resource/Alphabet_Inc.']
+        # not recorded: generated
+        assert len(nlp('Joe Biden visited Texas.').ents) == 2
+
+
+def test_run_and_compare(tmp_path):
+    output = tmp_path / 'results.json'
+    args = ['--n-docs', '4', '--doc-sizes', '100', '--batch-sizes', '2', '--processes', 'annotate,candidates',
+            '--latency', '0', '--latency-jitter', '0', '--output', str(output)]
+    assert benchmarks.main(args) == 0
+    results = json.loads(output.read_text())
+    assert [(r['process'], r['scenario']) for r in results['results']] == [
+        ('annotate', 'call'), ('annotate', 'pipe'), ('candidates', 'call'), ('candidates', 'pipe')]
+    assert all(r['docs_per_s'] > 0 and r['requests'] == 4 and r['peak_memory_bytes'] > 0 for r in results['results'])
+    # a baseline 10 times faster
+    for r in results['results']:
+        r['docs_per_s'] *= 10
+    assert benchmarks.compare(json.loads(output.read_text()), results, 0.2)
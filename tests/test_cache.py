@@ -0,0 +1,88 @@
+import time
+
+from conftest import OTHER_TEXT, SHORT_TEXT
+from spacy_dbpedia_spotlight.cache import ResponseCache
+
+
+def test_cache_rerun(stub_server, tmp_path, make_nlp):
+    cache_path = tmp_path / 'cache.sqlite'
+    nlp = make_nlp(stub_server.url, cache_path=str(cache_path))
+    docs = list(nlp.pipe([SHORT_TEXT, OTHER_TEXT, SHORT_TEXT]))
+    # the third document may be sent before the first response is cached
+    assert stub_server.request_count in (2, 3)
+    nlp.get_pipe('dbpedia_spotlight').close()
+
+    # a new run with the same file doesn't send any request
+    nlp = make_nlp(stub_server.url, cache_path=str(cache_path))
+    count = stub_server.request_count
+    cached_docs = list(nlp.pipe([SHORT_TEXT, OTHER_TEXT])) + [nlp(SHORT_TEXT)]
+    assert stub_server.request_count == count
+    cache = nlp.get_pipe('dbpedia_spotlight').cache
+    assert (cache.hits, cache.misses) == (3, 0)
+    for doc, cached_doc in zip(docs, cached_docs):
+        assert [(ent.text, ent.kb_id_) for ent in doc.ents] == [(ent.text, ent.kb_id_) for ent in cached_doc.ents]
+        assert doc._.dbpedia_raw_result == cached_doc._.dbpedia_raw_result
+
+
+def test_cache_key_parameters(stub_server, tmp_path, make_nlp):
+    nlp = make_nlp(stub_server.url, cache_path=str(tmp_path / 'cache.sqlite'))
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    nlp(SHORT_TEXT)
+    linker.confidence = 0.8
+    nlp(SHORT_TEXT)
+    linker.process = 'spot'
+    nlp(SHORT_TEXT)
+    assert stub_server.request_count == 3
+    assert (linker.cache.hits, linker.cache.misses) == (0, 3)
+
+
+def test_cache_errors_not_stored(stub_server, tmp_path, make_nlp):
+    nlp = make_nlp(stub_server.url, cache_path=str(tmp_path / 'cache.sqlite'), raise_http_errors=False)
+    nlp('')
+    nlp('')
+    assert stub_server.request_count == 2
+    assert len(nlp.get_pipe('dbpedia_spotlight').cache) == 0
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_entries=2)
+    cache.set('a', {'value': 'a'})
+    cache.set('b', {'value': 'b'})
+    time.sleep(0.01)
+    assert cache.get('a') == {'value': 'a'}
+    cache.set('c', {'value': 'c'})
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == {'value': 'a'}
+    assert cache.get('c') == {'value': 'c'}
+
+
+def test_size_limit(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_bytes=200)
+    for i in range(20):
+        cache.set(str(i), {'text': str(i) * 50})
+    assert 0 < len(cache) < 20
+    assert cache.get('19') is not None
+    assert cache.get('0') is None
+
+
+def test_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=0.05)
+    cache.set('a', {'value': 'a'})
+    assert cache.get('a') == {'value': 'a'}
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_ttl_size_limit(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_bytes=100, ttl=0.05)
+    cache.set('a', {'text': 'a' * 50})
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    # the expired entry no longer counts in the size of the cache
+    assert (cache._count, cache._size) == (0, 0)
+    cache.set('b', {'text': 'b' * 50})
+    cache.set('c', {'text': 'c' * 50})
+    assert cache.get('b') == {'text': 'b' * 50}
+    assert cache.get('c') == {'text': 'c' * 50}
@@ -0,0 +1,95 @@
+import spacy
+
+from conftest import run_async
+from spacy_dbpedia_spotlight.chunking import split_doc
+from stub_server import StubSpotlightServer
+
+paragraph = ('US President Joe Biden has issued an order targeting homemade guns. '
+             'Hours after the address, a gunman killed one person in Bryan, Texas. '
+             'Google LLC is an American multinational technology company.\n\n')
+long_text = ''.join(f'{i}. {paragraph}' for i in range(30))
+
+
+def ents_of(doc):
+    return [(ent.start_char, ent.end_char, ent.kb_id_) for ent in doc.ents]
+
+
+def test_split_doc():
+    nlp = spacy.blank('en')
+    doc = nlp.make_doc(long_text)
+    chunks = split_doc(doc, 500)
+    assert len(chunks) > 1
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(long_text)
+    token_starts = {t.idx for t in doc}
+    for (start, end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert end - start <= 500
+        assert end == next_start
+        # paragraph boundaries are preferred
+        assert doc.text[end - 1] == '\n'
+        assert next_start in token_starts
+    # with sentence annotations, the chunks end on sentence boundaries
+    nlp.add_pipe('sentencizer')
+    doc = nlp(long_text)
+    sent_starts = {sent.start_char for sent in doc.sents}
+    for start, end in split_doc(doc, 100):
+        assert end - start <= 100
+        assert start in sent_starts
+
+
+def test_split_doc_overlap():
+    doc = spacy.blank('en').make_doc('word ' * 200)
+    chunks = split_doc(doc, 100, overlap=20)
+    for (start, end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert end - 20 <= next_start < end
+    assert chunks[-1][1] == len(doc.text)
+
+
+def test_chunked_annotation(stub_server, make_nlp):
+    expected = ents_of(make_nlp(stub_server.url)(long_text))
+    assert stub_server.request_count == 1
+    nlp = make_nlp(stub_server.url, max_chunk_chars=1000)
+    doc = nlp(long_text)
+    assert ents_of(doc) == expected
+    assert doc._.dbpedia_raw_result['@text'] == long_text
+    assert stub_server.request_count > 5
+    # pipe and the asyncio API give the same results
+    for doc in nlp.pipe([long_text, paragraph, long_text]):
+        assert ents_of(doc) == ents_of(make_nlp(stub_server.url)(doc.text))
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    assert ents_of(run_async(linker, linker.acall(nlp.make_doc(long_text)))) == expected
+
+
+def test_chunk_overlap_deduplicates(stub_server, make_nlp):
+    text = 'Meeting Joe Biden and Boris Johnson today. ' * 20
+    expected = ents_of(make_nlp(stub_server.url)(text))
+    for process in ['annotate', 'spot', 'candidates']:
+        # the budget cuts across the entities, the overlap finds them in the next chunk
+        nlp = make_nlp(stub_server.url, max_chunk_chars=37, chunk_overlap=20, process=process)
+        doc = nlp(text)
+        assert [ent[:2] for ent in ents_of(doc)] == [ent[:2] for ent in expected]
+
+
+def test_failed_chunk_fails_the_document(make_nlp):
+    with StubSpotlightServer(fail_first=1) as server:
+        nlp = make_nlp(server.url, max_chunk_chars=2000, raise_http_errors=False)
+        doc = nlp(long_text)
+        assert server.request_count == 4
+        # the other chunks are not enough to annotate the document
+        assert not doc.ents
+        assert doc._.dbpedia_raw_result is None
+        assert len(nlp(long_text).ents) == 150
+    with StubSpotlightServer(fail_first=1) as server:
+        nlp = make_nlp(server.url, max_chunk_chars=2000, raise_http_errors=False, max_concurrency=1)
+        docs = list(nlp.pipe([long_text, 'Then. ' + long_text]))
+        assert not docs[0].ents
+        assert len(docs[1].ents) == 150
+
+
+def test_chunked_utf16_offsets(make_nlp):
+    text = ''.join(f'{i}. \U0001F600 {paragraph}' for i in range(10))
+    with StubSpotlightServer(utf16_offsets=True) as server:
+        expected = make_nlp(server.url)(text)._.dbpedia_raw_result
+        doc = make_nlp(server.url, max_chunk_chars=500)(text)
+        assert server.request_count > 3
+        assert doc._.dbpedia_raw_result == expected
+        assert [ent.text for ent in doc.ents] == ['US', 'Joe Biden', 'Texas', 'Google LLC', 'American'] * 10
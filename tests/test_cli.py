@@ -0,0 +1,113 @@
+import json
+
+import spacy
+from loguru import logger
+from spacy.tokens import DocBin
+
+from conftest import SHORT_TEXT
+from spacy_dbpedia_spotlight import cli
+
+texts = [f'{i}. {SHORT_TEXT}' for i in range(5)]
+
+
+def write_input(tmp_path):
+    path = tmp_path / 'corpus.jsonl'
+    path.write_text(''.join(json.dumps({'id': f'doc{i}', 'text': text}) + '\n' for i, text in enumerate(texts)))
+    return str(path)
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_annotate_jsonl_resume(stub_server, tmp_path):
+    input_path = write_input(tmp_path)
+    output_path = str(tmp_path / 'out.jsonl')
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    args = ['annotate', input_path, output_path, '--endpoint', stub_server.url, '--checkpoint', checkpoint,
+            '--flush-every', '1']
+    cli.main(args + ['--limit', '2'])
+    assert [r['id'] for r in read_jsonl(output_path)] == ['doc0', 'doc1']
+    # resumed: the first two documents are skipped
+    cli.main(args)
+    records = read_jsonl(output_path)
+    assert [r['id'] for r in records] == [f'doc{i}' for i in range(5)]
+    assert [e['text'] for e in records[0]['entities']] == ['Google LLC', 'American']
+    assert records[0]['entities'][0]['kb_id'] == 'http://dbpedia.org/resource/Google'
+    assert stub_server.request_count == 5
+
+
+def test_annotate_resume_after_kill(stub_server, tmp_path):
+    input_path = write_input(tmp_path)
+    output_path = tmp_path / 'out.jsonl'
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    args = ['annotate', input_path, str(output_path), '--endpoint', stub_server.url, '--checkpoint', checkpoint,
+            '--flush-every', '2']
+    cli.main(args + ['--limit', '2'])
+    # killed after the last checkpoint: a record written but not checkpointed, and a truncated one
+    with open(output_path, 'a') as f:
+        f.write(json.dumps({'id': 'doc2', 'entities': []}) + '\n{"id": "doc3", "ent')
+    cli.main(args)
+    assert [r['id'] for r in read_jsonl(output_path)] == [f'doc{i}' for i in range(5)]
+    assert stub_server.request_count == 5
+
+
+def test_annotate_skips_blank_texts(stub_server, tmp_path):
+    text_path = tmp_path / 'corpus.txt'
+    text_path.write_text(texts[0] + '\n\n   \n' + texts[1] + '\n')
+    jsonl_path = tmp_path / 'corpus.jsonl'
+    jsonl_path.write_text(''.join(json.dumps({'id': f'doc{i}', 'text': text}) + '\n'
+                                  for i, text in enumerate([texts[0], '', ' \n ', texts[1]])))
+    text_output, jsonl_output = str(tmp_path / 'text.jsonl'), str(tmp_path / 'out.jsonl')
+    cli.main(['annotate', str(text_path), text_output, '--endpoint', stub_server.url])
+    cli.main(['annotate', str(jsonl_path), jsonl_output, '--endpoint', stub_server.url])
+    assert [r['id'] for r in read_jsonl(text_output)] == ['0', '3']
+    assert [r['id'] for r in read_jsonl(jsonl_output)] == ['doc0', 'doc3']
+    assert stub_server.request_count == 4
+
+
+def test_read_records_without_text(tmp_path):
+    path = tmp_path / 'corpus.jsonl'
+    records = [{'id': 'a', 'text': texts[0]}, {'id': 'b'}, {'id': 'c', 'text': None}, {'id': 'd', 'text': 3}, ['e'],
+               {'id': 'f', 'text': texts[1]}]
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+    messages = []
+    handler_id = logger.add(messages.append, level='WARNING', format='{message}')
+    try:
+        assert [doc_id for _, doc_id, _ in cli.read_records(str(path), 'jsonl')] == ['a', 'f']
+    finally:
+        logger.remove(handler_id)
+    assert [m.strip() for m in messages] == [f'Skipping the line {i}: no text in "text"' for i in range(2, 6)]
+
+
+def test_annotate_docbin(stub_server, tmp_path):
+    text_path = tmp_path / 'corpus.txt'
+    text_path.write_text('\n'.join(texts) + '\n')
+    output_path = tmp_path / 'shards'
+    cli.main(['annotate', str(text_path), str(output_path), '--endpoint', stub_server.url, '--shard-size', '2'])
+    shards = sorted(output_path.glob('*.spacy'))
+    assert len(shards) == 3
+    nlp = spacy.blank('en')
+    docs = [doc for shard in shards for doc in DocBin().from_disk(shard).get_docs(nlp.vocab)]
+    assert [doc.user_data['id'] for doc in docs] == ['0', '1', '2', '3', '4']
+    assert all(len(doc.ents) == 2 for doc in docs)
+
+
+def test_annotate_docbin_resume_after_kill(stub_server, tmp_path):
+    text_path = tmp_path / 'corpus.txt'
+    text_path.write_text('\n'.join(texts) + '\n')
+    output_path = tmp_path / 'shards'
+    checkpoint = tmp_path / 'checkpoint.json'
+    args = ['annotate', str(text_path), str(output_path), '--endpoint', stub_server.url, '--shard-size', '2',
+            '--checkpoint', str(checkpoint)]
+    cli.main(args + ['--limit', '2'])
+    saved = checkpoint.read_text()
+    # killed after writing the next shard, before saving the checkpoint
+    cli.main(args + ['--limit', '2'])
+    checkpoint.write_text(saved)
+    cli.main(args)
+    shards = sorted(output_path.glob('*.spacy'))
+    nlp = spacy.blank('en')
+    docs = [doc for shard in shards for doc in DocBin().from_disk(shard).get_docs(nlp.vocab)]
+    assert [doc.user_data['id'] for doc in docs] == ['0', '1', '2', '3', '4']
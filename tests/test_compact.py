@@ -0,0 +1,51 @@
+import pytest
+from spacy.tokens import DocBin
+
+from spacy_dbpedia_spotlight.compact import COMPACT_KEY
+
+text = 'Google LLC is an American multinational technology company. Barack Obama visited Berlin.'
+
+
+def get_docs(make_nlp, endpoint, process, compact_raw_results):
+    nlp = make_nlp(endpoint, process=process, compact_raw_results=compact_raw_results)
+    return nlp, list(nlp.pipe([text, 'Nothing to see here.']))
+
+
+@pytest.mark.parametrize('process', ['annotate', 'spot', 'candidates'])
+def test_compact_same_results(stub_server, make_nlp, process):
+    _, expected = get_docs(make_nlp, stub_server.url, process, False)
+    _, docs = get_docs(make_nlp, stub_server.url, process, True)
+    for expected_doc, doc in zip(expected, docs):
+        assert [(e.start_char, e.end_char, e.kb_id_) for e in doc.ents] == [
+            (e.start_char, e.end_char, e.kb_id_) for e in expected_doc.ents]
+        assert [e._.dbpedia_raw_result for e in doc.ents] == [e._.dbpedia_raw_result for e in expected_doc.ents]
+        if expected_doc.ents:
+            assert COMPACT_KEY in doc.user_data
+            assert doc._.dbpedia_raw_result == expected_doc._.dbpedia_raw_result
+
+
+def test_compact_columns(stub_server, make_nlp):
+    _, docs = get_docs(make_nlp, stub_server.url, 'annotate', True)
+    compact = docs[0].user_data[COMPACT_KEY]
+    assert compact['columns']['@offset'].dtype.kind == 'i'
+    assert compact['columns']['@similarityScore'].dtype.kind == 'f'
+    # read from the text
+    assert compact['columns']['@surfaceForm'] is None
+    # no dict stored for the spans
+    assert not any(key[0] == '._.' for key in docs[0].user_data)
+
+
+def test_compact_docbin(stub_server, make_nlp):
+    nlp, docs = get_docs(make_nlp, stub_server.url, 'annotate', True)
+    expected = [ent._.dbpedia_raw_result for ent in docs[0].ents]
+    doc_bin = DocBin(docs=docs, store_user_data=True)
+    restored = list(DocBin().from_bytes(doc_bin.to_bytes()).get_docs(nlp.vocab))
+    assert [ent._.dbpedia_raw_result for ent in restored[0].ents] == expected
+    assert restored[0]._.dbpedia_raw_result == docs[0]._.dbpedia_raw_result
+
+
+def test_setter(stub_server, make_nlp):
+    _, docs = get_docs(make_nlp, stub_server.url, 'annotate', True)
+    span = docs[0].ents[0]
+    span._.dbpedia_raw_result = {'@URI': 'custom'}
+    assert docs[0].ents[0]._.dbpedia_raw_result == {'@URI': 'custom'}
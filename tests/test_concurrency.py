@@ -0,0 +1,53 @@
+import threading
+
+from conftest import OTHER_TEXT, SHORT_TEXT
+
+
+def test_pipe_order(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, max_concurrency=4)
+    texts = [SHORT_TEXT, OTHER_TEXT] * 50
+    docs = list(nlp.pipe(texts, batch_size=7))
+    assert [doc.text for doc in docs] == texts
+    for doc in docs:
+        if doc.text == SHORT_TEXT:
+            assert [ent.text for ent in doc.ents] == ['Google LLC', 'American']
+        else:
+            assert [ent.text for ent in doc.ents] == ['Boris Johnson', 'Texas']
+
+
+def test_pipe_bounded_concurrency(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, max_concurrency=3)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    active = []
+    max_active = []
+    lock = threading.Lock()
+    get_text_response = linker.get_text_response
+
+    def counting_get_text_response(text, deadline=None):
+        with lock:
+            active.append(text)
+            max_active.append(len(active))
+        try:
+            return get_text_response(text, deadline)
+        finally:
+            with lock:
+                active.remove(text)
+
+    linker.get_text_response = counting_get_text_response
+    docs = list(nlp.pipe([f'{SHORT_TEXT} {i}' for i in range(60)], batch_size=128))
+    assert len(docs) == 60
+    assert max(max_active) <= 3
+    # the executor is reused across calls
+    executor = linker.executor
+    list(nlp.pipe([SHORT_TEXT] * 5))
+    assert linker.executor is executor
+
+
+def test_pipe_early_stop(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, max_concurrency=2)
+    docs = nlp.pipe([SHORT_TEXT] * 100, batch_size=10)
+    first = next(docs)
+    assert first.ents
+    docs.close()
+    nlp.get_pipe('dbpedia_spotlight').close()
+    assert stub_server.request_count < 100
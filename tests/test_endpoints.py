@@ -0,0 +1,62 @@
+import pytest
+
+from conftest import SHORT_TEXT
+from spacy_dbpedia_spotlight.endpoints import EndpointPool
+from stub_server import StubSpotlightServer
+
+texts = [f'{i}. {SHORT_TEXT}' for i in range(30)]
+
+
+def test_round_robin(make_nlp):
+    with StubSpotlightServer() as a, StubSpotlightServer() as b:
+        nlp = make_nlp([a.url, b.url])
+        for text in texts[:10]:
+            assert len(nlp(text).ents) == 2
+        assert a.request_count == b.request_count == 5
+        docs = list(nlp.pipe(texts, batch_size=8))
+        assert all(len(doc.ents) == 2 for doc in docs)
+        assert a.request_count + b.request_count == 40
+        assert min(a.request_count, b.request_count) >= 15
+
+
+def test_failover_and_ejection(make_nlp):
+    with StubSpotlightServer() as dead:
+        dead_url = dead.url
+    with StubSpotlightServer() as a, StubSpotlightServer(fail_first=1000, error_status=503) as broken:
+        nlp = make_nlp([dead_url, broken.url, a.url], endpoint_max_failures=2, endpoint_ejection_time=60)
+        linker = nlp.get_pipe('dbpedia_spotlight')
+        # the failed requests are sent to the next endpoint, even without retries
+        docs = list(nlp.pipe(texts, batch_size=4))
+        assert all(len(doc.ents) == 2 for doc in docs)
+        assert a.request_count == len(texts)
+        # after 2 failures the broken endpoints are not used anymore
+        assert broken.request_count <= 2 + linker.max_concurrency
+        status = {s['endpoint']: s for s in linker.endpoint_pool.status()}
+        assert not status[dead_url]['healthy']
+        assert not status[broken.url]['healthy']
+        assert status[a.url]['healthy']
+        assert all(s['outstanding'] == 0 for s in status.values())
+
+
+def test_all_endpoints_down(make_nlp):
+    with StubSpotlightServer(fail_first=1000, error_status=503) as a, \
+            StubSpotlightServer(fail_first=1000, error_status=503) as b:
+        nlp = make_nlp([a.url, b.url], raise_http_errors=False)
+        assert not nlp(texts[0]).ents
+        assert a.request_count == b.request_count == 1
+
+
+def test_least_outstanding():
+    pool = EndpointPool(['a', 'b', 'c'], strategy='least_outstanding')
+    assert [pool.acquire() for _ in range(3)] == ['a', 'b', 'c']
+    pool.release('b')
+    assert pool.acquire() == 'b'
+    pool.release('a')
+    pool.release('c')
+    assert pool.acquire() == 'c'
+    assert pool.acquire() == 'a'
+
+
+def test_invalid_selection(make_nlp):
+    with pytest.raises(ValueError):
+        make_nlp('http://localhost:2222/rest', endpoint_selection='random')
@@ -0,0 +1,69 @@
+import pytest
+import spacy
+
+from spacy_dbpedia_spotlight.filters import EntityFilter
+
+text = 'Joe Biden visited Texas and the White House with Google.'
+
+
+def entities(doc):
+    return [(span.text, span.label_) for span in doc.spans['dbpedia_spotlight']]
+
+
+@pytest.mark.parametrize('process', ['annotate', 'candidates'])
+def test_filter_types(stub_server, make_nlp, process):
+    nlp = make_nlp(stub_server.url, process=process, filter_types=['DBpedia:Place', 'DBpedia:Company'])
+    assert entities(nlp(text)) == [('Texas', 'DBPEDIA_ENT'), ('Google', 'DBPEDIA_ENT')]
+    nlp = make_nlp(stub_server.url, process=process, exclude_types=['DBpedia:Person'])
+    assert [e for e, _ in entities(nlp(text))] == ['Texas', 'White House', 'Google']
+    # comma-separated, like the @types of the response
+    nlp = make_nlp(stub_server.url, process=process, filter_types='DBpedia:Place, DBpedia:Company')
+    assert [e for e, _ in entities(nlp(text))] == ['Texas', 'Google']
+    with pytest.raises(ValueError):
+        make_nlp(stub_server.url, exclude_types=5)
+
+
+def test_type_labels(stub_server, make_nlp, tmp_path):
+    nlp = make_nlp(stub_server.url, type_labels=[['DBpedia:Person', 'PERSON'], ['DBpedia:Place', 'LOC'],
+                                                 ['DBpedia:Organisation', 'ORG']])
+    doc = nlp(text)
+    expected = [('Joe Biden', 'PERSON'), ('Texas', 'LOC'), ('White House', 'DBPEDIA_ENT'), ('Google', 'ORG')]
+    assert entities(doc) == expected
+    assert [ent.label_ for ent in doc.ents] == ['PERSON', 'LOC', 'DBPEDIA_ENT', 'ORG']
+    # the types survive the config of the saved pipeline
+    nlp.to_disk(tmp_path / 'nlp')
+    assert entities(spacy.load(tmp_path / 'nlp')(text)) == expected
+    # the ':' of the types can't be in the keys of the config
+    with pytest.raises(ValueError):
+        make_nlp(stub_server.url, type_labels={'DBpedia:Person': 'PERSON'})
+
+
+def test_scores(stub_server, make_nlp):
+    # the stub support is 1000 + 17 * len(resource): Joe_Biden 1153, Texas 1085
+    nlp = make_nlp(stub_server.url, min_support=1100)
+    assert [e for e, _ in entities(nlp('Joe Biden visited Texas.'))] == ['Joe Biden']
+    nlp = make_nlp(stub_server.url, min_similarity_score=0.99)
+    assert len(entities(nlp(text))) == 4
+    # compiled once, and again when it is changed after the creation of the component
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    assert linker.entity_filter is linker.entity_filter
+    linker.min_similarity_score = 1.0
+    assert linker.entity_filter.min_similarity_score == 1.0
+    doc = nlp(text)
+    assert entities(doc) == []
+    # the raw result of the document is the whole response
+    assert len(doc._.dbpedia_raw_result['Resources']) == 4
+
+
+def test_compact_raw_results(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, filter_types=['DBpedia:Place'], compact_raw_results=True)
+    doc = nlp(text)
+    assert entities(doc) == [('Texas', 'DBPEDIA_ENT')]
+    assert doc.spans['dbpedia_spotlight'][0]._.dbpedia_raw_result['@URI'] == 'http://dbpedia.org/resource/Texas'
+
+
+def test_spot_has_no_filters(stub_server, make_nlp):
+    with pytest.raises(ValueError):
+        make_nlp(stub_server.url, process='spot', filter_types=['DBpedia:Place'])
+    with pytest.raises(ValueError):
+        EntityFilter('spot', min_support=1)
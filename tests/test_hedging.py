@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from conftest import OTHER_TEXT, SHORT_TEXT, run_async
+from spacy_dbpedia_spotlight.hedging import Hedger
+from stub_server import StubSpotlightServer
+
+
+def test_hedger():
+    hedger = Hedger(90, 0.5, window=100, min_samples=10)
+    for i in range(9):
+        hedger.observe(i / 100)
+    assert hedger.get_delay() is None
+    for i in range(9, 100):
+        hedger.observe(i / 100)
+    assert hedger.get_delay() == 0.9
+    # the oldest latencies are dropped
+    for _ in range(100):
+        hedger.observe(0.01)
+    assert hedger.get_delay() == 0.01
+    # half a hedge per request
+    assert not hedger.try_hedge()
+    hedger.add_request()
+    hedger.add_request()
+    assert hedger.try_hedge()
+    assert not hedger.try_hedge()
+    with pytest.raises(ValueError):
+        Hedger(100, 0.1)
+
+
+@pytest.fixture
+def servers():
+    with StubSpotlightServer(latency=0.5) as slow, StubSpotlightServer() as fast:
+        yield slow, fast
+
+
+def wait_until(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.01)
+
+
+def make_linker(make_nlp, servers, hedge_budget, **config):
+    slow, fast = servers
+    nlp = make_nlp([slow.url, fast.url], hedge_after_percentile=95, hedge_budget=hedge_budget, collect_stats=True,
+                   **config)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    # recent latencies of 20 ms
+    for _ in range(100):
+        linker.hedger.observe(0.02)
+    return nlp, linker
+
+
+def test_hedged_request(servers, make_nlp):
+    nlp, linker = make_linker(make_nlp, servers, 1)
+    # the first request goes to the slow endpoint, the duplicate to the fast one, and its response is used
+    doc = nlp(SHORT_TEXT)
+    assert [ent.text for ent in doc.ents] == ['Google LLC', 'American']
+    counters = linker.stats.snapshot()['counters']
+    assert counters['hedges'] == 1
+    assert counters['hedge_wins'] == 1
+    assert counters['requests'] == 2
+
+
+def test_hedge_slots(servers, make_nlp):
+    nlp, linker = make_linker(make_nlp, servers, 1, concurrency_budget=2)
+    assert len(nlp(SHORT_TEXT).ents) == 2
+    # the request to the slow endpoint is still running: it keeps its endpoint and its budget slot until it completes
+    assert [e['outstanding'] for e in linker.endpoint_pool.status()] == [1, 0]
+    wait_until(lambda: [e['outstanding'] for e in linker.endpoint_pool.status()] == [0, 0])
+    # both slots are free again: the next request to the slow endpoint is hedged
+    assert len(nlp(OTHER_TEXT).ents) == 2
+    assert linker.stats.snapshot()['counters']['hedges'] == 2
+
+
+def test_hedge_concurrency_budget(servers, make_nlp):
+    # the hedge needs a free slot of the concurrency budget
+    nlp, linker = make_linker(make_nlp, servers, 1, concurrency_budget=1, deadline=5)
+    assert len(nlp(SHORT_TEXT).ents) == 2
+    assert linker.stats.snapshot()['counters']['hedges'] == 0
+    assert len(run_async(linker, linker.acall(nlp.make_doc(SHORT_TEXT))).ents) == 2
+    assert linker.stats.snapshot()['counters']['hedges'] == 0
+    # the slot has been released: the next request gets it before its deadline
+    assert len(nlp(OTHER_TEXT).ents) == 2
+
+
+def test_hedge_budget(servers, make_nlp):
+    nlp, linker = make_linker(make_nlp, servers, 0)
+    start = time.perf_counter()
+    assert len(nlp(SHORT_TEXT).ents) == 2
+    assert time.perf_counter() - start >= 0.5
+    assert linker.stats.snapshot()['counters']['hedges'] == 0
+
+
+def test_async_hedged_request(servers, make_nlp):
+    nlp, linker = make_linker(make_nlp, servers, 1)
+    doc = run_async(linker, linker.acall(nlp.make_doc(SHORT_TEXT)))
+    assert len(doc.ents) == 2
+    assert linker.stats.snapshot()['counters']['hedge_wins'] == 1
+    # the cancelled request has stopped
+    assert [e['outstanding'] for e in linker.endpoint_pool.status()] == [0, 0]
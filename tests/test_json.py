@@ -0,0 +1,18 @@
+import json
+
+import pytest
+
+from spacy_dbpedia_spotlight import util
+
+payload = json.dumps({'@text': 'Città', 'Resources': [{'@URI': 'http://dbpedia.org/resource/Città', '@offset': '0'}]},
+                     ensure_ascii=False)
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_json_loads(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(util, 'orjson', None)
+    elif util.orjson is None:
+        pytest.skip('orjson not installed')
+    assert util.json_loads(payload) == json.loads(payload)
+    assert util.json_loads(payload.encode('utf-8')) == json.loads(payload)
@@ -0,0 +1,90 @@
+import pytest
+
+from spacy_dbpedia_spotlight import cli
+from spacy_dbpedia_spotlight.local_index import SurfaceFormIndex
+
+PAIR_COUNTS = [
+    ('New York', 'http://dbpedia.org/resource/New_York_City', 900, 'DBpedia:Place,DBpedia:City'),
+    ('New York', 'http://dbpedia.org/resource/New_York_(state)', 100, 'DBpedia:Place'),
+    ('New York Times', 'http://dbpedia.org/resource/The_New_York_Times', 50, 'DBpedia:Newspaper'),
+    ('New', 'http://dbpedia.org/resource/New', 1, ''),
+    ('Washington, D.C.', 'http://dbpedia.org/resource/Washington,_D.C.', 20, 'DBpedia:Place'),
+    ('Google', 'http://dbpedia.org/resource/Google', 3, 'DBpedia:Company'),
+    ('Google', 'http://dbpedia.org/resource/Google', 4, 'DBpedia:Company'),
+    ('rare', 'http://dbpedia.org/resource/Rare', 1, ''),
+]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    tsv_path = tmp_path / 'pairCounts'
+    tsv_path.write_text(''.join('\t'.join(str(v) for v in row) + '\n' for row in PAIR_COUNTS))
+    path = str(tmp_path / 'index.bin')
+    cli.main(['build-index', str(tsv_path), path, '--min-count', '2'])
+    return path
+
+
+def make_local_nlp(make_nlp, index_path, process='candidates'):
+    return make_nlp(None, backend='local', local_index_path=index_path, process=process)
+
+
+def test_lookup(index_path):
+    index = SurfaceFormIndex(index_path)
+    # the pairs below --min-count are not in the index, the duplicated pairs are summed
+    assert len(index) == 4
+    assert [uri for uri, _, _ in index.lookup('New  York')] == [
+        'http://dbpedia.org/resource/New_York_City', 'http://dbpedia.org/resource/New_York_(state)']
+    assert index.lookup('Google') == [('http://dbpedia.org/resource/Google', 7, 'DBpedia:Company')]
+    assert index.lookup('rare') == []
+    index.close()
+
+
+def test_longest_match(index_path, make_nlp):
+    nlp = make_local_nlp(make_nlp, index_path)
+    doc = nlp('The New York Times wrote about New York and Washington, D.C. and Google.')
+    ents = doc.spans['dbpedia_spotlight']
+    assert [(e.text, e.kb_id_) for e in ents] == [
+        ('New York Times', 'http://dbpedia.org/resource/The_New_York_Times'),
+        ('New York', 'http://dbpedia.org/resource/New_York_City'),
+        ('Washington, D.C.', 'http://dbpedia.org/resource/Washington,_D.C.'),
+        ('Google', 'http://dbpedia.org/resource/Google'),
+    ]
+    assert [e.label_ for e in doc.ents] == ['DBPEDIA_ENT'] * 4
+    raw = ents[1]._.dbpedia_raw_result
+    assert raw['@name'] == 'New York'
+    assert raw['@offset'] == str(ents[1].start_char)
+    assert raw['resource']['@uri'] == 'New_York_City'
+    assert raw['resource']['@support'] == '900'
+    assert float(raw['resource']['@priorScore']) == 0.9
+    assert doc._.dbpedia_raw_result['annotation']['@text'] == doc.text
+
+
+def test_spot_and_pipe(index_path, make_nlp):
+    nlp = make_local_nlp(make_nlp, index_path, 'spot')
+    texts = ['Google in New York.', 'Nothing here.', 'Newer things.']
+    docs = list(nlp.pipe(texts, batch_size=2))
+    assert [[e.text for e in doc.spans['dbpedia_spotlight']] for doc in docs] == [['Google', 'New York'], [], []]
+    assert docs[0].spans['dbpedia_spotlight'][0].kb_id_ == ''
+
+
+def test_utf16_offsets(index_path, make_nlp):
+    nlp = make_local_nlp(make_nlp, index_path)
+    doc = nlp('\U0001F600 Google and \U0001F600\U0001F600 New York  was there.')
+    ents = doc.spans['dbpedia_spotlight']
+    assert [(e.text, e.start_char) for e in ents] == [('Google', 2), ('New York', 16)]
+    # in UTF-16 code units like the offsets of the server, and without the whitespace after the surface form
+    assert [e._.dbpedia_raw_result['@offset'] for e in ents] == ['3', '19']
+    assert ents[1]._.dbpedia_raw_result['@name'] == 'New York'
+
+
+def test_unsupported_config(index_path, make_nlp):
+    with pytest.raises(ValueError):
+        make_local_nlp(make_nlp, index_path, 'annotate')
+    with pytest.raises(ValueError):
+        make_local_nlp(make_nlp, None)
+    with open(index_path, 'rb') as f:
+        content = f.read()
+    with open(index_path, 'wb') as f:
+        f.write(b'NOTINDEX' + content[8:])
+    with pytest.raises(ValueError):
+        SurfaceFormIndex(index_path)
@@ -0,0 +1,52 @@
+import time
+
+from conftest import OTHER_TEXT, SHORT_TEXT, run_async
+from stub_server import StubSpotlightServer
+
+
+def test_memory_cache(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, memory_cache_size=1)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    for _ in range(3):
+        doc = nlp(SHORT_TEXT)
+        assert [ent.text for ent in doc.ents] == ['Google LLC', 'American']
+    assert stub_server.request_count == 1
+    # capacity of 1: the first text is evicted
+    nlp(OTHER_TEXT)
+    nlp(SHORT_TEXT)
+    assert stub_server.request_count == 3
+    assert (linker.memory_cache.hits, linker.memory_cache.misses) == (2, 3)
+
+
+def test_coalesce_pipe(make_nlp):
+    with StubSpotlightServer(latency=0.2) as server:
+        nlp = make_nlp(server.url, max_concurrency=8)
+        texts = [SHORT_TEXT] * 20 + [OTHER_TEXT] * 20
+        docs = list(nlp.pipe(texts, batch_size=64))
+        assert [doc.text for doc in docs] == texts
+        assert all(len(doc.ents) == 2 for doc in docs)
+        # the identical texts read ahead are sent once
+        assert server.request_count == 2
+
+
+def test_coalesce_pipe_keeps_workers(make_nlp):
+    with StubSpotlightServer(latency=1) as server:
+        nlp = make_nlp(server.url, max_concurrency=2, collect_stats=True)
+        linker = nlp.get_pipe('dbpedia_spotlight')
+        start = time.perf_counter()
+        # the duplicates don't take the worker threads: the last text is sent at the same time as the first one,
+        # instead of after it (2 s)
+        docs = list(nlp.pipe([SHORT_TEXT] * 30 + [OTHER_TEXT], batch_size=64))
+        assert time.perf_counter() - start < 1.8
+        assert all(len(doc.ents) == 2 for doc in docs)
+        assert server.request_count == 2
+        assert linker.stats.snapshot()['counters']['coalesced'] == 29
+
+
+def test_coalesce_async(make_nlp):
+    with StubSpotlightServer(latency=0.1) as server:
+        nlp = make_nlp(server.url, max_concurrency=8)
+        linker = nlp.get_pipe('dbpedia_spotlight')
+        docs = run_async(linker, *[linker.acall(nlp.make_doc(text)) for text in [SHORT_TEXT] * 30])
+        assert all(len(doc.ents) == 2 for doc in docs)
+        assert server.request_count == 1
@@ -0,0 +1,42 @@
+import os
+import pickle
+import time
+
+import pytest
+
+from conftest import SHORT_TEXT
+from stub_server import StubSpotlightServer
+
+texts = [f'{i}. {SHORT_TEXT}' for i in range(8)]
+
+
+def test_pickle(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, concurrency_budget=4, memory_cache_size=10)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    # creates the state that can't be pickled
+    assert len(nlp(texts[0]).ents) == 2
+    restored = pickle.loads(pickle.dumps(linker))
+    assert restored.get_endpoints() == linker.get_endpoints()
+    assert restored._budget is not None and restored._budget is not linker._budget
+    assert restored.memory_cache is not linker.memory_cache
+    assert len(restored(nlp.make_doc(texts[1])).ents) == 2
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_pipe_n_process(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, concurrency_budget=2)
+    # the parent has already created its sessions and worker threads
+    assert len(list(nlp.pipe(texts[:2]))) == 2
+    docs = list(nlp.pipe(texts, n_process=2, batch_size=2))
+    assert [doc.text for doc in docs] == texts
+    assert all(len(doc.ents) == 2 for doc in docs)
+
+
+def test_concurrency_budget(make_nlp):
+    with StubSpotlightServer(latency=0.1) as server:
+        nlp = make_nlp(server.url, concurrency_budget=1, max_concurrency=4)
+        start = time.perf_counter()
+        docs = list(nlp.pipe(texts[:4]))
+        # one request at a time, even with 4 worker threads
+        assert time.perf_counter() - start >= 0.4
+        assert all(len(doc.ents) == 2 for doc in docs)
@@ -0,0 +1,53 @@
+from stub_server import StubSpotlightServer
+
+texts = [
+    'Google LLC is an American multinational technology company.',
+    'Today I will contact Boris Johnson in Texas.',
+    'Nothing to see here.',
+    'Joe Biden visited the White House and South Carolina.',
+]
+stream = [f'{i}: {text}' for i in range(50) for text in texts]
+
+
+def annotations(docs):
+    return [[(ent.start_char, ent.end_char, ent.kb_id_, ent._.dbpedia_raw_result) for ent in doc.ents] for doc in docs]
+
+
+def test_packing(stub_server, make_nlp):
+    for process in ['annotate', 'spot', 'candidates']:
+        expected = annotations(make_nlp(stub_server.url, process=process).pipe(stream))
+        count = stub_server.request_count
+        nlp = make_nlp(stub_server.url, process=process, pack_max_chars=1000)
+        docs = list(nlp.pipe(stream, batch_size=30))
+        assert [doc.text for doc in docs] == stream
+        assert annotations(docs) == expected
+        assert stub_server.request_count - count < len(stream) / 10
+        for doc in docs:
+            assert doc._.dbpedia_raw_result['@text' if process == 'annotate' else 'annotation']
+
+
+def test_packing_with_long_and_empty_docs(stub_server, make_nlp):
+    long_text = ' '.join(stream[:40])
+    mixed = stream[:10] + [long_text] + stream[10:20]
+    expected = annotations(make_nlp(stub_server.url).pipe(mixed))
+    nlp = make_nlp(stub_server.url, pack_max_chars=500, max_chunk_chars=800)
+    assert annotations(nlp.pipe(mixed, batch_size=4)) == expected
+    # empty documents are not packed, the error is raised as without packing
+    nlp.get_pipe('dbpedia_spotlight').raise_http_errors = False
+    docs = list(nlp.pipe(stream[:3] + [''] + stream[3:6]))
+    assert not docs[3].ents
+    assert annotations(docs[:3] + docs[4:]) == annotations(make_nlp(stub_server.url).pipe(stream[:6]))
+
+
+def test_packing_utf16_offsets(make_nlp):
+    # the offsets of the real server are in UTF-16 code units: each emoji counts twice
+    tweets = [f'{i} \U0001F600\U0001F44D Joe Biden visited Texas \U0001F1FA\U0001F1F8 with Google.' for i in range(20)]
+    with StubSpotlightServer(utf16_offsets=True) as server:
+        for process in ['annotate', 'candidates']:
+            expected = annotations(make_nlp(server.url, process=process).pipe(tweets))
+            count = server.request_count
+            docs = list(make_nlp(server.url, process=process, pack_max_chars=1000).pipe(tweets, batch_size=30))
+            assert server.request_count - count == 1
+            assert annotations(docs) == expected
+            # on the right characters, not only the same as without packing
+            assert all([ent.text for ent in doc.ents] == ['Joe Biden', 'Texas', 'Google'] for doc in docs)
@@ -0,0 +1,74 @@
+import pytest
+
+from conftest import run_async
+from spacy_dbpedia_spotlight.chunking import diff_texts
+
+OLD_TEXT = ('Google LLC is an American multinational technology company.\n\n'
+            'Joe Biden met Boris Johnson at the White House. Nothing interesting happens in this sentence.\n\n'
+            'The Justice Department asked Congress about Texas.')
+NEW_TEXT = ('Breaking news. Google LLC is an American multinational technology company.\n\n'
+            'Joe Biden met Boris Johnson at the White House. Biden then visited South Carolina.\n\n'
+            'The Justice Department asked Congress about Texas.')
+
+
+@pytest.fixture(params=['annotate', 'candidates'])
+def nlp(request, stub_server, make_nlp):
+    return make_nlp(stub_server.url, process=request.param)
+
+
+def record_texts(linker):
+    texts = []
+    get_text_response = linker.get_text_response
+
+    def recording(text, deadline=None):
+        texts.append(text)
+        return get_text_response(text, deadline)
+    linker.get_text_response = recording
+    return texts
+
+
+def entities(doc):
+    return [(e.start_char, e.end_char, e.text, e.kb_id_) for e in doc.spans['dbpedia_spotlight']]
+
+
+def test_diff_texts():
+    regions = diff_texts(OLD_TEXT, NEW_TEXT)
+    assert [NEW_TEXT[new_start:new_end] for _, _, new_start, new_end, equal in regions if not equal] == [
+        'Breaking news. ', 'Biden then visited South Carolina.\n\n']
+    # the regions cover both texts
+    assert ''.join(OLD_TEXT[old_start:old_end] for old_start, old_end, *_ in regions) == OLD_TEXT
+    assert ''.join(NEW_TEXT[new_start:new_end] for _, _, new_start, new_end, _ in regions) == NEW_TEXT
+
+
+def test_reannotate(nlp):
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    previous = nlp(OLD_TEXT)
+    texts = record_texts(linker)
+    doc = linker.reannotate(nlp.make_doc(NEW_TEXT), previous)
+    # only the changed sentences are requested
+    assert texts == ['Breaking news. ', 'Biden then visited South Carolina.\n\n']
+    assert entities(doc) == entities(nlp(NEW_TEXT))
+    assert doc._.dbpedia_raw_result == nlp(NEW_TEXT)._.dbpedia_raw_result
+
+
+def test_reannotate_from_raw_result(nlp):
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    previous = nlp(OLD_TEXT)._.dbpedia_raw_result
+    texts = record_texts(linker)
+    doc = linker.reannotate(nlp.make_doc(OLD_TEXT.replace('Texas', 'Texas and South Carolina')), previous)
+    assert texts == ['The Justice Department asked Congress about Texas and South Carolina.']
+    assert [e.text for e in doc.spans['dbpedia_spotlight']][-2:] == ['Texas', 'South Carolina']
+    # unchanged text: no requests
+    doc = linker.reannotate(nlp.make_doc(OLD_TEXT), previous)
+    assert len(texts) == 1
+    assert entities(doc) == entities(nlp(OLD_TEXT))
+    # no previous result: the whole document is annotated
+    linker.reannotate(nlp.make_doc(OLD_TEXT), None)
+    assert texts[-1] == OLD_TEXT
+
+
+def test_areannotate(nlp):
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    previous = nlp(OLD_TEXT)
+    doc = run_async(linker, linker.areannotate(nlp.make_doc(NEW_TEXT), previous))
+    assert entities(doc) == entities(nlp(NEW_TEXT))
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+from requests import HTTPError
+
+from conftest import SHORT_TEXT, run_async
+from spacy_dbpedia_spotlight.retry import TokenBucket, get_backoff_delay, parse_retry_after
+from stub_server import StubSpotlightServer
+
+
+def test_retry_after_errors(make_nlp):
+    with StubSpotlightServer(fail_first=2, error_status=503) as server:
+        nlp = make_nlp(server.url, max_retries=3, backoff_factor=0.01)
+        doc = nlp(SHORT_TEXT)
+        assert len(doc.ents) == 2
+        assert server.request_count == 3
+
+
+def test_async_retry(make_nlp):
+    with StubSpotlightServer(fail_first=2, error_status=502) as server:
+        nlp = make_nlp(server.url, max_retries=2, backoff_factor=0.01, rate_limit=100)
+        linker = nlp.get_pipe('dbpedia_spotlight')
+        assert len(run_async(linker, linker.acall(nlp.make_doc(SHORT_TEXT))).ents) == 2
+        assert server.request_count == 3
+
+
+def test_retry_gives_up(make_nlp):
+    with StubSpotlightServer(fail_first=10, error_status=503) as server:
+        nlp = make_nlp(server.url, max_retries=2, backoff_factor=0.01)
+        with pytest.raises(HTTPError):
+            nlp(SHORT_TEXT)
+        assert server.request_count == 3
+
+
+def test_no_retry_on_client_errors(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, max_retries=3, backoff_factor=0.01)
+    with pytest.raises(HTTPError):
+        nlp('')
+    assert stub_server.request_count == 1
+
+
+def test_retry_after_header(make_nlp):
+    with StubSpotlightServer(fail_first=1, error_status=429, retry_after=0.3) as server:
+        nlp = make_nlp(server.url, max_retries=1, backoff_factor=0)
+        start = time.perf_counter()
+        assert nlp(SHORT_TEXT).ents
+        assert time.perf_counter() - start >= 0.3
+
+
+def test_retry_connection_errors(make_nlp):
+    with StubSpotlightServer() as server:
+        url = server.url
+    nlp = make_nlp(url, max_retries=2, backoff_factor=0.01, raise_http_errors=False)
+    assert not nlp(SHORT_TEXT).ents
+
+
+def test_rate_limit(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, rate_limit=20, rate_limit_burst=1, max_concurrency=8)
+    start = time.perf_counter()
+    docs = list(nlp.pipe([f'{SHORT_TEXT} {i}' for i in range(11)]))
+    assert all(doc.ents for doc in docs)
+    # the first token is available immediately, then one every 50 ms
+    assert time.perf_counter() - start >= 0.45
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_backoff():
+    for attempt in range(10):
+        assert 0 <= get_backoff_delay(attempt, 0.5, 4) <= min(4, 0.5 * 2 ** attempt)
+    assert get_backoff_delay(0, 0.5, 4, retry_after=2) == 2
+    assert get_backoff_delay(0, 0.5, 4, retry_after=20) == 4
+    assert parse_retry_after('3') == 3
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert parse_retry_after('soon') is None
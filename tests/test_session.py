@@ -0,0 +1,52 @@
+from loguru import logger
+
+from conftest import SHORT_TEXT
+
+texts = [f'{i}. {SHORT_TEXT}' for i in range(20)]
+
+
+def test_call_reuses_connection(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url)
+    for text in texts:
+        doc = nlp(text)
+        assert [ent.kb_id_ for ent in doc.ents] == [
+            'http://dbpedia.org/resource/Google', 'http://dbpedia.org/resource/United_States']
+    assert stub_server.request_count == len(texts)
+    assert stub_server.connection_count == 1
+
+
+def test_pipe_reuses_connections(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, pool_maxsize=4, pool_block=True)
+    for _ in range(3):
+        docs = list(nlp.pipe(texts, batch_size=8))
+        assert all(len(doc.ents) == 2 for doc in docs)
+    assert stub_server.request_count == 3 * len(texts)
+    assert stub_server.connection_count <= 4
+
+
+def test_no_keep_alive(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, keep_alive=False)
+    for text in texts[:5]:
+        nlp(text)
+    assert stub_server.connection_count == 5
+
+
+def test_close(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url)
+    nlp(texts[0])
+    nlp.get_pipe('dbpedia_spotlight').close()
+    doc = nlp(texts[0])
+    assert len(doc.ents) == 2
+    assert stub_server.connection_count == 2
+
+
+def test_debug_endpoint_logged_once(stub_server, make_nlp):
+    messages = []
+    handler_id = logger.add(messages.append, level='DEBUG', format='{message}')
+    try:
+        nlp = make_nlp(stub_server.url, debug=True)
+        for text in texts[:3]:
+            nlp(text)
+    finally:
+        logger.remove(handler_id)
+    assert len([m for m in messages if 'api_endpoint' in m]) == 1
@@ -0,0 +1,57 @@
+import spacy
+
+from spacy_dbpedia_spotlight.response import TokenIndex, Utf16Index
+from stub_server import StubSpotlightServer
+
+
+def make_data(text, surface_forms):
+    resources = [{'@URI': f'http://dbpedia.org/resource/{sf}', '@surfaceForm': sf, '@offset': str(text.index(sf))}
+                 for sf in surface_forms]
+    return {'@text': text, 'Resources': resources}
+
+
+def test_token_index():
+    nlp = spacy.blank('en')
+    doc = nlp.make_doc('Write to someone@bbc.co.uk about Google LLC.')
+    index = TokenIndex(doc)
+    # aligned with the tokens
+    assert index.get_token_bounds(33, 43) == (4, 6)
+    # inside a token: expanded to the whole token
+    start = doc.text.index('bbc')
+    span = doc[slice(*index.get_token_bounds(start, start + 3))]
+    assert span.text == 'someone@bbc.co.uk'
+    # across a token boundary
+    assert doc[slice(*index.get_token_bounds(35, 42))].text == 'Google LLC'
+    assert index.get_token_bounds(len(doc.text), len(doc.text) + 3) is None
+
+
+def test_spans_with_label_and_kb_id(make_nlp):
+    nlp = make_nlp('http://localhost:1/rest')
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    text = 'Write to someone@bbc.co.uk about Google LLC.'
+    doc = linker.process_single_doc_after_call(nlp.make_doc(text), make_data(text, ['bbc', 'Google LLC']))
+    assert [(ent.text, ent.label_, ent.kb_id_) for ent in doc.ents] == [
+        ('someone@bbc.co.uk', 'DBPEDIA_ENT', 'http://dbpedia.org/resource/bbc'),
+        ('Google LLC', 'DBPEDIA_ENT', 'http://dbpedia.org/resource/Google LLC'),
+    ]
+    assert doc.ents[0]._.dbpedia_raw_result['@surfaceForm'] == 'bbc'
+
+
+def test_utf16_index():
+    text = 'a😀b👍 c'
+    index = Utf16Index(text)
+    for char_offset in range(len(text) + 1):
+        offset = len(text[:char_offset].encode('utf-16-le')) // 2
+        assert index.get_char_offset(offset) == char_offset
+        assert index.get_utf16_offset(char_offset) == offset
+    assert Utf16Index('abc').get_char_offset(2) == 2
+    assert Utf16Index('abc').get_utf16_offset(2) == 2
+
+
+def test_spans_after_emoji(make_nlp):
+    # the offsets of the server are in UTF-16 code units
+    with StubSpotlightServer(utf16_offsets=True) as server:
+        nlp = make_nlp(server.url)
+        doc = nlp('0 😀👍 Joe Biden visited Texas with Google.')
+        assert [ent.text for ent in doc.ents] == ['Joe Biden', 'Texas', 'Google']
+        assert [ent.start_char for ent in doc.ents] == [5, 23, 34]
@@ -0,0 +1,28 @@
+import spacy
+from loguru import logger
+
+import bench_startup
+import spacy_dbpedia_spotlight
+
+
+def test_import_is_lazy():
+    result = bench_startup.measure_once()
+    # loaded on first use
+    for module in ['asyncio', 'concurrent', 'loguru', 'sqlite3', 'httpx', 'orjson']:
+        assert module not in result['modules']
+    assert spacy_dbpedia_spotlight.__version__ == spacy_dbpedia_spotlight.util.pkg_meta['version']
+
+
+def test_factory_keeps_logging_config():
+    messages = []
+    handler_id = logger.add(messages.append, level='INFO', format='{message}')
+    try:
+        nlp = spacy.blank('en')
+        nlp.add_pipe('dbpedia_spotlight', config={'debug': True})
+        logger.info('still here')
+        assert [m.strip() for m in messages] == ['still here']
+        nlp.add_pipe('dbpedia_spotlight', name='quiet', config={'debug': False})
+        nlp.get_pipe('quiet').get_endpoints()
+        assert len(messages) == 1
+    finally:
+        logger.remove(handler_id)
@@ -0,0 +1,52 @@
+from conftest import SHORT_TEXT
+from spacy_dbpedia_spotlight.stats import TIME_BUCKETS, Histogram
+from stub_server import StubSpotlightServer
+
+texts = [f'{i}. {SHORT_TEXT}' for i in range(6)]
+
+
+def test_histogram():
+    histogram = Histogram(TIME_BUCKETS)
+    for value in [0.001] * 98 + [0.5, 2.0]:
+        histogram.observe(value)
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert summary['max'] == 2.0
+    assert 0.001 <= summary['p50'] < 0.002
+    assert 0.5 <= summary['p99'] <= 2.0
+
+
+def test_disabled_by_default(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    list(nlp.pipe(texts))
+    assert linker.stats is None
+
+
+def test_collect_stats(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, collect_stats=True, memory_cache_size=10)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+    list(nlp.pipe(texts + texts[:2]))
+    stats = linker.stats.snapshot()
+    counters = stats['counters']
+    assert counters['requests'] == 6
+    assert counters['docs'] == 8
+    assert counters['entities'] == 16
+    assert counters['cache_hits'] + counters['coalesced'] == 2
+    assert counters['bytes_sent'] > 0 and counters['bytes_received'] > 0
+    for phase in ['request', 'queue', 'parse', 'align']:
+        assert stats['histograms'][phase]['count'] > 0
+    assert stats['histograms']['entities_per_doc']['p50'] == 2
+
+
+def test_errors_and_retries_with_callback(make_nlp):
+    with StubSpotlightServer(fail_first=2, error_status=503) as server:
+        nlp = make_nlp(server.url, max_retries=2, backoff_factor=0.01)
+        linker = nlp.get_pipe('dbpedia_spotlight')
+        events = []
+        linker.stats_callback = lambda name, value: events.append((name, value))
+        nlp(texts[0])
+        counters = linker.stats.snapshot()['counters']
+        assert (counters['requests'], counters['errors'], counters['retries']) == (3, 2, 2)
+        assert ('retries', 1) in events
+        assert [name for name, _ in events].count('request') == 3
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+from conftest import OTHER_TEXT, SHORT_TEXT, run_async
+from spacy_dbpedia_spotlight.entity_linker import DeadlineExceeded
+from stub_server import StubSpotlightServer
+
+
+def test_read_timeout(make_nlp):
+    with StubSpotlightServer(latency=5) as server:
+        nlp = make_nlp(server.url, read_timeout=0.2)
+        start = time.perf_counter()
+        with pytest.raises(requests.Timeout):
+            nlp(SHORT_TEXT)
+        # cut long before the 5 s of the server
+        assert time.perf_counter() - start < 3
+
+
+def test_deadline_raises(make_nlp):
+    with StubSpotlightServer(latency=5) as server:
+        nlp = make_nlp(server.url, deadline=0.3)
+        start = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            nlp(SHORT_TEXT)
+        # cut long before the 5 s of the server
+        assert time.perf_counter() - start < 3
+
+
+def test_deadline_stops_retries(make_nlp):
+    with StubSpotlightServer(fail_first=100, error_status=503) as server:
+        nlp = make_nlp(server.url, deadline=0.5, max_retries=100, backoff_factor=0.05, backoff_max=0.05,
+                      raise_http_errors=False)
+        start = time.perf_counter()
+        doc = nlp(SHORT_TEXT)
+        assert time.perf_counter() - start < 3
+        assert not doc.ents
+        assert 1 < server.request_count < 100
+
+
+def test_pipe_deadline_skips_slow_documents(make_nlp):
+    with StubSpotlightServer(latency=5) as server:
+        nlp = make_nlp(server.url, deadline=0.2, raise_http_errors=False)
+        start = time.perf_counter()
+        docs = list(nlp.pipe([f'{i}. {SHORT_TEXT}' for i in range(4)]))
+        assert time.perf_counter() - start < 3
+        assert all(not doc.ents for doc in docs)
+        # each document is given up at its deadline, without a retry
+        assert server.request_count == 4
+
+
+def test_deadline_not_reached(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url, deadline=5)
+    docs = list(nlp.pipe([f'{i}. {SHORT_TEXT}' for i in range(4)]))
+    assert all(len(doc.ents) == 2 for doc in docs)
+
+
+def test_async_deadline(make_nlp):
+    with StubSpotlightServer(latency=5) as server:
+        nlp = make_nlp(server.url, deadline=0.3)
+        linker = nlp.get_pipe('dbpedia_spotlight')
+        start = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            run_async(linker, linker.acall(nlp.make_doc(SHORT_TEXT)))
+        # cut long before the 5 s of the server
+        assert time.perf_counter() - start < 3
+
+
+def test_async_deadline_waiting_for_budget(make_nlp):
+    with StubSpotlightServer(latency=2) as server:
+        nlp = make_nlp(server.url, concurrency_budget=1)
+        linker = nlp.get_pipe('dbpedia_spotlight')
+
+        async def run():
+            # the first request takes the only slot of the budget for 2 s
+            first = asyncio.ensure_future(linker.aget_text_response(SHORT_TEXT))
+            await asyncio.sleep(0.2)
+            start = time.perf_counter()
+            with pytest.raises(DeadlineExceeded):
+                await linker.aget_text_response(OTHER_TEXT, deadline=time.monotonic() + 0.3)
+            elapsed = time.perf_counter() - start
+            await first
+            return elapsed
+
+        # given up at its deadline while waiting for the slot, without sending its request
+        assert run_async(linker, run()) < 1.5
+        assert server.request_count == 1
+
+
+def test_async_cancelled_waiter_keeps_shared_request(stub_server, make_nlp):
+    nlp = make_nlp(stub_server.url)
+    linker = nlp.get_pipe('dbpedia_spotlight')
+
+    async def run():
+        first = asyncio.ensure_future(linker.aget_text_response(SHORT_TEXT))
+        second = asyncio.ensure_future(linker.aget_text_response(SHORT_TEXT))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert len(run_async(linker, run())['Resources']) == 2
+    assert stub_server.request_count == 1